@@ -0,0 +1,124 @@
+"""
+MOODI Benchmark - Async endpoint concurrency
+Drives the FastAPI app in-process against a fake upstream with fixed latency
+and reports how many upstream completions are in flight at once.
+
+With the blocking client the peak stays at 1 regardless of client
+concurrency; with the async engine it should track the concurrency level.
+
+Run with: python benchmarks/bench_async_endpoints.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from openai import AsyncOpenAI
+
+from moodi_engine import set_async_client
+from fastapi_endpoint import app
+
+UPSTREAM_LATENCY_S = 0.2
+CONCURRENCY_LEVELS = [1, 8, 32, 128]
+REQUESTS_PER_LEVEL = 256
+
+FAKE_REFLECTION = {
+    "reflection_text": "A calm evening walk by the sea sounds grounding.",
+    "action_suggestion": "Take three slow breaths before bed.",
+    "share_caption": "Sea air, calm mind.",
+    "soundtrack_hint": "ambient waves",
+    "tags": ["calm", "evening", "sea"],
+    "safety_flag": "ok"
+}
+
+SAMPLE_PAYLOAD = {
+    "mood_emoji": "😌",
+    "mood_color": "#7FD1AE",
+    "intensity_0_10": 4,
+    "context_text": "petite promenade au bord de mer",
+    "media_present": True,
+    "time_bucket": "evening",
+    "geo_hint": "Casablanca",
+    "user_locale": "fr",
+    "user_age_bucket": "adult"
+}
+
+
+class FakeUpstream:
+    """Chat-completions stand-in that sleeps and counts requests in flight"""
+
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency_s)
+        finally:
+            self.in_flight -= 1
+        return httpx.Response(200, json={
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "gpt-4.1-mini",
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": json.dumps(FAKE_REFLECTION)}
+            }]
+        })
+
+
+async def run_level(concurrency: int) -> dict:
+    upstream = FakeUpstream(UPSTREAM_LATENCY_S)
+    client = AsyncOpenAI(
+        api_key="bench",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(upstream.handler))
+    )
+    set_async_client(client)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        async def one():
+            async with semaphore:
+                response = await http.post("/api/reflection", json=SAMPLE_PAYLOAD)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(REQUESTS_PER_LEVEL)))
+        elapsed = time.perf_counter() - started
+
+    await client.close()
+    return {
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "throughput_rps": REQUESTS_PER_LEVEL / elapsed,
+        "peak_in_flight": upstream.peak_in_flight
+    }
+
+
+async def main():
+    print("=" * 80)
+    print(f"Async endpoint benchmark ({REQUESTS_PER_LEVEL} requests/level, "
+          f"upstream latency {UPSTREAM_LATENCY_S * 1000:.0f} ms)")
+    print("=" * 80)
+    print(f"{'concurrency':>12} {'elapsed (s)':>12} {'req/s':>10} {'peak in-flight':>15}")
+
+    for level in CONCURRENCY_LEVELS:
+        stats = await run_level(level)
+        print(f"{stats['concurrency']:>12} {stats['elapsed_s']:>12.2f} "
+              f"{stats['throughput_rps']:>10.1f} {stats['peak_in_flight']:>15}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+"""
+MOODI Benchmark - Reflection backfill
+Runs the backfill job runner over synthetic mood rows with the local
+file-based batch backend and an in-memory sink (no network, no database).
+
+Run with: python benchmarks/bench_backfill.py [rows]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moodi_backfill import BackfillRunner, LocalBatchBackend, MemoryReflectionSink
+
+EMOJIS = ["😌", "😣", "😊", "😢", "😴", "🤩"]
+TIME_BUCKETS = ["morning", "afternoon", "evening", "late-night"]
+LOCALES = ["ar", "ar-darija", "fr", "en"]
+
+
+def synthetic_rows(count: int):
+    for i in range(count):
+        yield {
+            "id": str(uuid.UUID(int=i)),
+            "mood_emoji": EMOJIS[i % len(EMOJIS)],
+            "mood_color": "#7FD1AE",
+            "intensity_0_10": i % 11,
+            "context_text": "petite promenade au bord de mer" if i % 3 == 0 else None,
+            "media_present": i % 2 == 0,
+            "time_bucket": TIME_BUCKETS[i % len(TIME_BUCKETS)],
+            "geo_hint": "Casablanca",
+            "locale": LOCALES[i % len(LOCALES)]
+        }
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        sink = MemoryReflectionSink()
+        runner = BackfillRunner(
+            LocalBatchBackend(os.path.join(work_dir, "backend")),
+            sink,
+            os.path.join(work_dir, "requests"),
+            poll_interval=0.0
+        )
+
+        started = time.perf_counter()
+        stats = runner.run(synthetic_rows(rows))
+        elapsed = time.perf_counter() - started
+
+    print("=" * 80)
+    print(f"Backfill benchmark ({rows} moods, local backend)")
+    print("=" * 80)
+    print(json.dumps({key: value for key, value in stats.items() if key != "errors"}, indent=2))
+    print(f"Rows stored: {len(sink.rows)}")
+    print(f"Total: {elapsed:.2f} s ({rows / elapsed:,.0f} rows/s)")
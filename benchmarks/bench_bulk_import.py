@@ -0,0 +1,130 @@
+"""
+MOODI Benchmark - Bulk mood import
+Loads synthetic moods with the set-based importer and compares it against the
+per-row trigger path on a sample; both paths must leave identical streaks/coins.
+
+Needs a disposable Postgres with supabase_schema.sql applied (RLS policies
+are bypassed by the table owner). All rows created here are deleted at the end.
+
+Run with: python benchmarks/bench_bulk_import.py --dsn "$DATABASE_URL" [--moods 1000000]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moodi_bulk_import import MOOD_COLUMNS, import_moods
+
+EMOJIS = ["😌", "😣", "😊", "😢", "😴", "🤩"]
+TIME_BUCKETS = ["morning", "afternoon", "evening", "late-night"]
+START = datetime.datetime(2025, 1, 1, 9, 0, tzinfo=datetime.timezone.utc)
+
+
+def synthetic_moods(user_ids, moods_per_user: int, seed: int):
+    """Per user, moods in date order with 1-3 posts per day and random gaps"""
+    rng = random.Random(seed)
+    for user_id in user_ids:
+        day = 0
+        written = 0
+        while written < moods_per_user:
+            for post in range(min(rng.randint(1, 3), moods_per_user - written)):
+                yield {
+                    "user_id": user_id,
+                    "created_at": (START + datetime.timedelta(days=day, hours=post * 4)).isoformat(),
+                    "mood_emoji": EMOJIS[written % len(EMOJIS)],
+                    "mood_color": "#7FD1AE",
+                    "intensity_0_10": written % 11,
+                    "context_text": None,
+                    "media_present": written % 2 == 0,
+                    "time_bucket": TIME_BUCKETS[post % len(TIME_BUCKETS)],
+                    "geo_hint": "Casablanca"
+                }
+                written += 1
+            day += 1 if rng.random() < 0.8 else rng.randint(2, 4)
+
+
+def create_users(conn, count: int):
+    from psycopg2.extras import execute_values
+
+    user_ids = [str(uuid.uuid4()) for _ in range(count)]
+    with conn, conn.cursor() as cur:
+        execute_values(cur, "INSERT INTO public.users (id) VALUES %s", [(user_id,) for user_id in user_ids])
+    return user_ids
+
+
+def per_row_import(conn, rows) -> float:
+    """Insert with the trigger firing once per mood (the pre-bulk path)"""
+    from psycopg2.extras import execute_values
+
+    rows = list(rows)
+    started = time.perf_counter()
+    with conn, conn.cursor() as cur:
+        execute_values(
+            cur,
+            f"INSERT INTO public.moods ({', '.join(MOOD_COLUMNS)}) VALUES %s",
+            [tuple(row[column] for column in MOOD_COLUMNS) for row in rows],
+            page_size=1000
+        )
+    return time.perf_counter() - started
+
+
+def user_state(conn, user_ids):
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT id::text, streak_days, moodcoins, last_mood_date FROM public.users "
+            "WHERE id = ANY(%s::uuid[]) ORDER BY created_at, id",
+            (user_ids,)
+        )
+        return [record[1:] for record in cur.fetchall()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the set-based bulk importer")
+    parser.add_argument("--dsn", default=os.getenv("DATABASE_URL"), help="Postgres connection string")
+    parser.add_argument("--moods", type=int, default=1_000_000)
+    parser.add_argument("--moods-per-user", type=int, default=200)
+    parser.add_argument("--sample", type=int, default=20_000, help="Moods replayed through the per-row trigger")
+    args = parser.parse_args()
+
+    if not args.dsn:
+        sys.exit("--dsn (or DATABASE_URL) is required")
+
+    import psycopg2
+
+    conn = psycopg2.connect(args.dsn)
+    created = []
+    try:
+        bulk_users = create_users(conn, args.moods // args.moods_per_user)
+        created += bulk_users
+        started = time.perf_counter()
+        stats = import_moods(conn, synthetic_moods(bulk_users, args.moods_per_user, seed=1))
+        bulk_s = time.perf_counter() - started
+
+        # Same moods for two fresh user sets: one through the trigger, one bulk
+        sample_users = args.sample // args.moods_per_user
+        trigger_users = create_users(conn, sample_users)
+        check_users = create_users(conn, sample_users)
+        created += trigger_users + check_users
+        trigger_s = per_row_import(conn, synthetic_moods(trigger_users, args.moods_per_user, seed=2))
+        import_moods(conn, synthetic_moods(check_users, args.moods_per_user, seed=2))
+        matches = user_state(conn, trigger_users) == user_state(conn, check_users)
+    finally:
+        with conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM public.users WHERE id = ANY(%s::uuid[])", (created,))
+        conn.close()
+
+    sample_moods = sample_users * args.moods_per_user
+    print("=" * 80)
+    print(f"Bulk import benchmark ({stats['moods']} moods, {stats['users_updated']} users)")
+    print("=" * 80)
+    print(json.dumps(stats, indent=2))
+    print(f"Set-based:  {bulk_s:.2f} s ({stats['moods'] / bulk_s:,.0f} moods/s)")
+    print(f"Per-row trigger sample: {trigger_s:.2f} s ({sample_moods / trigger_s:,.0f} moods/s)")
+    print(f"Streaks/coins identical to trigger path: {matches}")
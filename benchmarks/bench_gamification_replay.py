@@ -0,0 +1,78 @@
+"""
+MOODI Benchmark - Gamification replay
+Replays synthetic mood histories through GamificationEngine.replay and, on a
+sample, through the per-mood GamificationEngine methods for comparison.
+
+Run with: python benchmarks/bench_gamification_replay.py [moods]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moodi_integration import GamificationEngine
+
+MOODS_PER_USER = 200
+
+
+def synthetic_history(count: int, seed: int = 0):
+    """Shuffled (user_id, mood_date) columns with repeats and gaps between days"""
+    rng = np.random.default_rng(seed)
+    user_ids = np.arange(count) // MOODS_PER_USER
+    steps = rng.choice([0, 1, 1, 1, 1, 2, 4], size=count)
+    steps[np.arange(0, count, MOODS_PER_USER)] = 0
+    offsets = np.cumsum(steps)
+    offsets -= np.repeat(offsets[::MOODS_PER_USER], MOODS_PER_USER)[:count]
+    mood_dates = np.datetime64("2024-01-01") + offsets.astype("timedelta64[D]")
+    order = rng.permutation(count)
+    return user_ids[order], mood_dates[order]
+
+
+def per_mood_replay(user_ids, mood_dates):
+    """The one-call-per-mood path: sort, then walk every mood through the engine"""
+    state = {}
+    for user_id, mood_date in sorted(zip(user_ids.tolist(), mood_dates.astype(object))):
+        user = state.setdefault(user_id, {"streak": 0, "coins": 0, "last": None, "unlocks": set()})
+        if user["last"] is not None and mood_date <= user["last"]:
+            continue
+        change = GamificationEngine.calculate_streak(user["last"], mood_date)
+        old_streak = user["streak"]
+        user["streak"] = old_streak + 1 if change == 1 else 1
+        user["coins"] += GamificationEngine.award_daily_coins(user, True)
+        user["coins"] += GamificationEngine.award_streak_bonus(user["streak"], old_streak if change == 1 else 0)
+        user["unlocks"].update(GamificationEngine.check_unlocks(user["coins"]))
+        user["last"] = mood_date
+    return state
+
+
+if __name__ == "__main__":
+    moods = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    sample = min(moods, 200_000)
+
+    user_ids, mood_dates = synthetic_history(moods)
+
+    started = time.perf_counter()
+    result = GamificationEngine.replay(user_ids, mood_dates)
+    replay_s = time.perf_counter() - started
+
+    sample_ids, sample_dates = synthetic_history(sample, seed=1)
+    started = time.perf_counter()
+    reference = per_mood_replay(sample_ids, sample_dates)
+    loop_s = time.perf_counter() - started
+    check = GamificationEngine.replay(sample_ids, sample_dates)
+    matches = all(
+        reference[user_id]["coins"] == check["total_coins"][i] and reference[user_id]["streak"] == check["final_streak"][i]
+        for i, user_id in enumerate(check["users"].tolist())
+    )
+
+    print("=" * 80)
+    print(f"Gamification replay benchmark ({moods:,} moods, {len(result['users']):,} users)")
+    print("=" * 80)
+    print(f"Posting days: {len(result['day_streak']):,}  Unlock events: {len(result['unlock_type']):,}")
+    print(f"Vectorized replay: {replay_s:.2f} s ({moods / replay_s:,.0f} moods/s)")
+    print(f"Per-mood loop ({sample:,} moods): {loop_s:.2f} s ({sample / loop_s:,.0f} moods/s)")
+    print(f"Results identical on sample: {matches}")
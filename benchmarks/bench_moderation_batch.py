@@ -0,0 +1,82 @@
+"""
+MOODI Benchmark - Moderation batching
+HTTP requests and caller latency for concurrent moderation checks, one request
+per text vs. the micro-batching coalescer, against a fake moderation endpoint
+with a fixed base latency plus a small per-text cost.
+
+Run with: python benchmarks/bench_moderation_batch.py [callers] [checks_per_caller]
+"""
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moodi_engine.moderation_batch import ModerationBatcher
+
+BASE_LATENCY_S = 0.060
+PER_TEXT_S = 0.0005
+
+
+class FakeModeration:
+    """Counts requests; sleeps like a remote call"""
+
+    def __init__(self):
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def create(self, texts):
+        with self._lock:
+            self.requests += 1
+        time.sleep(BASE_LATENCY_S + PER_TEXT_S * len(texts))
+        return [{"flagged": False, "text_length": len(text)} for text in texts]
+
+
+def run(callers: int, checks: int, check) -> list:
+    latencies = []
+    lock = threading.Lock()
+
+    def caller(index: int):
+        for n in range(checks):
+            started = time.perf_counter()
+            check(f"caller {index} note {n}")
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        list(executor.map(caller, range(callers)))
+    return sorted(latencies)
+
+
+def report(label: str, fake: FakeModeration, latencies: list, elapsed: float) -> None:
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[int(len(latencies) * 0.95)]
+    print(
+        f"{label:<24}{fake.requests:>10}{len(latencies) / elapsed:>12.0f}"
+        f"{p50:>10.1f}{p95:>10.1f}"
+    )
+
+
+if __name__ == "__main__":
+    callers = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    checks = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    print("=" * 80)
+    print(f"Moderation batching benchmark ({callers} concurrent callers x {checks} checks)")
+    print("=" * 80)
+    print(f"{'mode':<24}{'requests':>10}{'checks/s':>12}{'p50 ms':>10}{'p95 ms':>10}")
+
+    fake = FakeModeration()
+    started = time.perf_counter()
+    latencies = run(callers, checks, lambda text: fake.create([text])[0])
+    report("one request per text", fake, latencies, time.perf_counter() - started)
+
+    for max_batch, max_wait_ms in [(16, 2.0), (32, 5.0), (64, 10.0)]:
+        fake = FakeModeration()
+        batcher = ModerationBatcher(fake.create, max_batch=max_batch, max_wait_ms=max_wait_ms, max_in_flight=8)
+        started = time.perf_counter()
+        latencies = run(callers, checks, batcher.check)
+        report(f"batch {max_batch} / {max_wait_ms:g} ms", fake, latencies, time.perf_counter() - started)
@@ -0,0 +1,205 @@
+"""
+MOODI Benchmark - API overhead with the offline template backend
+Load on the FastAPI app with every endpoint on MOODI_BACKEND=template, so
+no upstream latency or tokens are involved and what is measured is our own
+per-request overhead (validation, repair, safety, caching, storage, the
+OpenAI SDK itself).
+
+Two modes:
+    asgi  in-process through httpx.ASGITransport; one process, no sockets
+    http  uvicorn workers on a local port, driven by several load-generator
+          processes (the 5k RPS target: e.g. --workers 4 --clients 4)
+
+Run with:
+    python benchmarks/bench_overhead.py asgi [requests] [concurrency]
+    python benchmarks/bench_overhead.py http [seconds] [concurrency] [--workers N] [--clients N]
+
+The traffic mix is 70% reflections (half without context_text, i.e.
+cacheable), 20% notifications and 10% referral captions. Use MOODI_BACKEND=replay
+and benchmarks/fake_server.py instead to add upstream latency distributions.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BENCH_ENV = {
+    "MOODI_BACKEND": "template",
+    "MOODI_STORE": "memory",
+    "MOODI_NOTIFICATION_REFRESH_S": "0",
+    "OPENAI_API_KEY": "bench",
+}
+os.environ.update({key: os.environ.get(key, value) for key, value in BENCH_ENV.items()})
+
+import httpx
+
+CONTEXTS = [
+    "petite promenade au bord de mer",
+    "long day at work but finished the project",
+    "nhar twil w t3eb bzaf",
+    "feeling a bit low tonight",
+]
+
+
+def request_mix(index: int):
+    """(path, json body) of the index-th request in the traffic mix"""
+    slot = index % 10
+    if slot < 7:
+        payload = {
+            "mood_emoji": "😌",
+            "mood_color": "#7FD1AE",
+            "intensity_0_10": index % 11,
+            "time_bucket": "evening",
+            "user_locale": ("fr", "en", "ar-darija", "ar")[index % 4],
+            "user_age_bucket": "adult"
+        }
+        if slot % 2:
+            payload["context_text"] = f"{CONTEXTS[index % len(CONTEXTS)]} #{index}"
+        return "/api/reflection", payload
+    if slot < 9:
+        return "/api/notification", {"user_locale": "fr", "theme": "streak_nudge", "days_streak": index % 30}
+    return "/api/referral-caption", {"user_locale": "en", "mood_emoji": "😌", "benefit": "7 days of calm"}
+
+
+async def drive(http: httpx.AsyncClient, concurrency: int, stop) -> dict:
+    """Closed-loop load: `concurrency` workers issue requests until stop(count) is true"""
+    latencies, errors, issued = [], 0, 0
+
+    async def worker():
+        nonlocal errors, issued
+        while not stop(issued):
+            index = issued
+            issued += 1
+            path, body = request_mix(index)
+            started = time.perf_counter()
+            try:
+                response = await http.post(path, json=body)
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {"latencies": latencies, "errors": errors, "elapsed": time.perf_counter() - started}
+
+
+def summarize(label: str, latencies, errors: int, elapsed: float) -> None:
+    latencies = sorted(latencies)
+    count = len(latencies)
+    print(
+        f"{label:<28}{count:>9}{count / elapsed:>10.0f}{latencies[count // 2]:>9.2f}"
+        f"{latencies[int(count * 0.99)]:>9.2f}{errors:>8}"
+    )
+
+
+def header() -> None:
+    print(f"{'run':<28}{'requests':>9}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}")
+
+
+# ============================================================================
+# In-process (ASGI)
+# ============================================================================
+
+async def run_asgi(requests: int, concurrency: int) -> None:
+    from fastapi_endpoint import app
+    from moodi_engine.backends import backends
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            # Warm-up: imports, first clients, compiled validators
+            await drive(http, concurrency, lambda issued: issued >= min(requests, 500))
+            result = await drive(http, concurrency, lambda issued: issued >= requests)
+
+    print("=" * 73)
+    print(f"API overhead, in-process ASGI (template backend: {backends()})")
+    print("=" * 73)
+    header()
+    summarize(f"asgi, concurrency {concurrency}", result["latencies"], result["errors"], result["elapsed"])
+    print(f"per request: {result['elapsed'] / requests * 1e6:.0f} µs of CPU on one event loop")
+
+
+# ============================================================================
+# Over HTTP (uvicorn workers + load-generator processes)
+# ============================================================================
+
+def _load_client(port: int, seconds: float, concurrency: int, results) -> None:
+    async def main():
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30.0) as http:
+            deadline = time.perf_counter() + seconds
+            results.put(await drive(http, concurrency, lambda issued: time.perf_counter() >= deadline))
+
+    asyncio.run(main())
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_http(seconds: float, concurrency: int, workers: int, clients: int) -> None:
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "fastapi_endpoint:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=os.environ.copy()
+    )
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/", timeout=1.0)
+                break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=_load_client, args=(port, seconds, concurrency, results))
+            for _ in range(clients)
+        ]
+        for process in processes:
+            process.start()
+        runs = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    print("=" * 73)
+    print(f"API overhead over HTTP ({workers} uvicorn workers, {clients} load processes x {concurrency} connections)")
+    print("=" * 73)
+    header()
+    summarize(
+        f"http, {seconds:.0f} s",
+        [latency for run in runs for latency in run["latencies"]],
+        sum(run["errors"] for run in runs),
+        max(run["elapsed"] for run in runs)
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API overhead benchmark on the template backend")
+    parser.add_argument("mode", choices=["asgi", "http"], nargs="?", default="asgi")
+    parser.add_argument("amount", type=float, nargs="?", help="requests (asgi) or seconds (http)")
+    parser.add_argument("concurrency", type=int, nargs="?", default=64)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--clients", type=int, default=max(1, (os.cpu_count() or 1) // 2))
+    args = parser.parse_args()
+
+    if args.mode == "asgi":
+        asyncio.run(run_asgi(int(args.amount or 20000), args.concurrency))
+    else:
+        run_http(args.amount or 15.0, args.concurrency, args.workers, args.clients)
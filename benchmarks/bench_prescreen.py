@@ -0,0 +1,93 @@
+"""
+MOODI Benchmark - Safety pre-screen
+Recall and latency of the local pre-screen on two labeled sets:
+
+    fixtures/prescreen_labeled.jsonl  written together with the lexicon, so
+                                      its recall is optimistic
+    fixtures/prescreen_holdout.jsonl  unsafe texts collected in review,
+                                      never used to tune the lexicon
+
+The pre-screen only escalates (it starts the safety classifier early); every
+text still goes to remote moderation. Its recall on the held-out set is the
+number to look at before it is trusted with anything more.
+
+Run with: python benchmarks/bench_prescreen.py [repeats]
+"""
+
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moodi_engine.prescreen import prescreen
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURES = os.path.join(FIXTURES_DIR, "prescreen_labeled.jsonl")
+HOLDOUT = os.path.join(FIXTURES_DIR, "prescreen_holdout.jsonl")
+
+
+def load_fixtures(path: str = FIXTURES):
+    with open(path, encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def recall_report(title: str, fixtures) -> list:
+    """Print per-locale recall and precision for one set; returns the unsafe texts scored clear"""
+    counts = defaultdict(lambda: defaultdict(int))
+    missed = []
+    for fixture in fixtures:
+        verdict = prescreen(fixture["text"])["verdict"]
+        for group in (fixture["locale"], "all"):
+            counts[group][(fixture["label"], verdict)] += 1
+        if fixture["label"] == "unsafe" and verdict == "clear":
+            missed.append(fixture)
+
+    print(f"{title} ({len(fixtures)} texts)")
+    print(f"{'locale':<12}{'unsafe recall':>15}{'precision':>12}{'high recall':>13}{'safe clear':>12}")
+    for group in ["en", "fr", "ar", "ar-darija", "all"]:
+        c = counts[group]
+        unsafe = sum(value for (label, _), value in c.items() if label == "unsafe")
+        safe = sum(value for (label, _), value in c.items() if label == "safe")
+        if not unsafe and not safe:
+            continue
+        escalated_unsafe = unsafe - c[("unsafe", "clear")]
+        escalated = escalated_unsafe + safe - c[("safe", "clear")]
+        print(
+            f"{group:<12}"
+            f"{escalated_unsafe / unsafe if unsafe else 0:>15.3f}"
+            f"{escalated_unsafe / escalated if escalated else 0:>12.3f}"
+            f"{c[('unsafe', 'high')] / unsafe if unsafe else 0:>13.3f}"
+            f"{c[('safe', 'clear')] / safe if safe else 0:>12.3f}"
+        )
+    if missed:
+        print("Unsafe texts scored clear:")
+        for fixture in missed:
+            print(f"  [{fixture['locale']}] {fixture['text']}")
+    print()
+    return missed
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    fixtures = load_fixtures()
+
+    latencies = []
+    for _ in range(repeats):
+        for fixture in fixtures:
+            started = time.perf_counter()
+            prescreen(fixture["text"])
+            latencies.append((time.perf_counter() - started) * 1e6)
+    latencies.sort()
+
+    print("=" * 80)
+    print("Pre-screen benchmark")
+    print("=" * 80)
+    missed = recall_report("Tuning set", fixtures)
+    recall_report("Held-out set", load_fixtures(HOLDOUT))
+    print(f"Latency: p50 {latencies[len(latencies) // 2]:.1f} us, "
+          f"p99 {latencies[int(len(latencies) * 0.99)]:.1f} us over {len(latencies):,} calls")
+    # Misses on the tuning set are lexicon regressions; held-out misses are expected
+    sys.exit(1 if missed else 0)
@@ -0,0 +1,117 @@
+"""
+MOODI Benchmark - Tail latency under injected faults
+Reflection calls against the local fake server (benchmarks/fake_server.py),
+bare client calls vs. the resilience layer (deadline, jittered retries,
+hedging after p95, circuit breaker), for several fault profiles.
+
+"ok" counts calls that returned a model answer; failed calls are what the
+endpoints turn into template fallbacks or 503s.
+
+Run with: python benchmarks/bench_resilience.py [requests_per_scenario] [concurrency]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from openai import AsyncOpenAI
+
+from benchmarks.fake_server import FaultProfile, serve_in_subprocess
+from moodi_engine import acomplete_json, set_async_client
+from moodi_engine.prompts import SYSTEM_PROMPT
+from moodi_engine.resilience import CallPolicy, resilience
+
+USER_PROMPT = 'Return a single JSON object that fits the schema for this mood payload:\n{"mood_emoji":"😌"}'
+
+PROFILES = [
+    ("healthy", FaultProfile()),
+    ("5% slow (1.5 s)", FaultProfile(slow_rate=0.05)),
+    ("10% 503", FaultProfile(error_rate=0.10)),
+    ("2% hang", FaultProfile(hang_rate=0.02, hang_ms=20000)),
+    ("outage (all 503)", FaultProfile(error_rate=1.0)),
+]
+
+
+def make_client(base_url: str) -> AsyncOpenAI:
+    return AsyncOpenAI(
+        base_url=base_url,
+        api_key="bench",
+        max_retries=0,
+        http_client=httpx.AsyncClient(limits=httpx.Limits(max_connections=256, max_keepalive_connections=64))
+    )
+
+
+async def bare(client: AsyncOpenAI):
+    """The pre-resilience call: one attempt, client timeout only"""
+    await client.chat.completions.create(
+        model="gpt-4.1-mini",
+        messages=[{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": USER_PROMPT}],
+        response_format={"type": "json_object"},
+        timeout=60.0
+    )
+
+
+async def resilient(client: AsyncOpenAI):
+    await acomplete_json(SYSTEM_PROMPT, USER_PROMPT, endpoint="bench_reflection")
+
+
+async def run(call, client: AsyncOpenAI, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await call(client)
+            except Exception:
+                failures += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    latencies.sort()
+    return {
+        "ok": 1 - failures / requests,
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[int(len(latencies) * 0.95)],
+        "p99": latencies[int(len(latencies) * 0.99)],
+        "max": latencies[-1],
+        "elapsed": time.perf_counter() - started
+    }
+
+
+async def main(requests: int, concurrency: int):
+    print("=" * 96)
+    print(f"Resilience benchmark ({requests} reflection calls per row, concurrency {concurrency})")
+    print("=" * 96)
+    print(f"{'profile':<20}{'mode':<11}{'ok':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'upstream':>10}{'hedges':>8}{'rejected':>10}")
+    for label, profile in PROFILES:
+        for mode, call in [("bare", bare), ("resilient", resilient)]:
+            server, base_url = serve_in_subprocess(profile)
+            client = make_client(base_url)
+            set_async_client(client)
+            resilience.set_policy("bench_reflection", CallPolicy(deadline_s=3.0, max_attempts=3))
+            result = await run(call, client, requests, concurrency)
+            stats = resilience.stats().get("bench_reflection", {})
+            upstream = (await client._client.get(f"{base_url}/stats")).json()["requests"]
+            await client.close()
+            server.terminate()
+            print(
+                f"{label:<20}{mode:<11}{result['ok']:>7.1%}{result['p50']:>9.0f}{result['p95']:>9.0f}"
+                f"{result['p99']:>9.0f}{result['max']:>9.0f}{upstream:>10}"
+                f"{stats.get('hedges', 0) if mode == 'resilient' else 0:>8}"
+                f"{stats.get('rejected', 0) if mode == 'resilient' else 0:>10}"
+            )
+
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    asyncio.run(main(requests, concurrency))
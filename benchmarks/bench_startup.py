@@ -0,0 +1,81 @@
+"""
+MOODI Benchmark - Cold start
+Measures import time and resident memory of the API entrypoints in fresh
+interpreters, for the working tree and (optionally) a baseline git ref.
+
+Run with: python benchmarks/bench_startup.py [--baseline <git-ref>] [--runs 10]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["api.main", "fastapi_endpoint", "moodi_integration"]
+
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+__import__(sys.argv[1])
+elapsed_ms = (time.perf_counter() - started) * 1000
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"import_ms": elapsed_ms, "max_rss_mb": rss_kb / 1024}))
+"""
+
+
+def measure(tree: str, module: str, runs: int) -> dict:
+    env = dict(os.environ, OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "bench"), PYTHONDONTWRITEBYTECODE="1")
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE, module],
+            cwd=tree, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        "import_ms": statistics.median(sample["import_ms"] for sample in samples),
+        "max_rss_mb": statistics.median(sample["max_rss_mb"] for sample in samples)
+    }
+
+
+def export_ref(ref: str, destination: str) -> None:
+    archive = subprocess.run(["git", "archive", ref], cwd=ROOT, capture_output=True, check=True).stdout
+    archive_path = os.path.join(destination, "tree.tar")
+    with open(archive_path, "wb") as handle:
+        handle.write(archive)
+    with tarfile.open(archive_path) as tar:
+        tar.extractall(destination)
+
+
+def report(label: str, tree: str, runs: int) -> None:
+    print(f"{label}")
+    for module in MODULES:
+        try:
+            stats = measure(tree, module, runs)
+        except subprocess.CalledProcessError as e:
+            print(f"  {module:<20} failed: {e.stderr.strip().splitlines()[-1] if e.stderr else e}")
+            continue
+        print(f"  {module:<20} import {stats['import_ms']:8.1f} ms   max RSS {stats['max_rss_mb']:7.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--baseline", help="git ref to compare against (e.g. the commit before the engine package)")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print(f"Cold-start benchmark (median of {args.runs} fresh interpreters)")
+    print("=" * 80)
+
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as baseline_tree:
+            export_ref(args.baseline, baseline_tree)
+            report(f"baseline ({args.baseline})", baseline_tree, args.runs)
+
+    report("working tree", ROOT, args.runs)
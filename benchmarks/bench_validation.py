@@ -0,0 +1,95 @@
+"""
+MOODI Benchmark - Response validation overhead
+Per-response cost of decoding and validating a reflection: the previous path
+(json.loads, the hand-written validate_response checks, then a second pass
+through ReflectionResponse(**result)) vs. one pass of the compiled
+RESPONSE_SCHEMA validator with orjson decoding (when installed); the
+endpoints now return that validated dict as-is.
+
+Run with: python benchmarks/bench_validation.py [iterations]
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moodi_engine.models import ReflectionResponse
+from moodi_engine.validation import decode_reflection, orjson, validate_reflection
+
+RAW = json.dumps({
+    "reflection_text": "Une petite promenade au bord de la mer, c'est un vrai moment pour respirer et laisser la journée se déposer doucement.",
+    "action_suggestion": "Ce soir, note une chose que la mer t'a apportée.",
+    "share_caption": "La mer, mon calme du soir 🌊",
+    "soundtrack_hint": "ambient waves, soft piano",
+    "tags": ["calme", "soir", "mer", "gratitude"],
+    "safety_flag": "ok"
+}, ensure_ascii=False)
+
+
+def legacy_validate(response: dict):
+    """validate_response as it was before the compiled validator"""
+    errors = []
+    for field in ["reflection_text", "action_suggestion", "share_caption", "soundtrack_hint", "tags", "safety_flag"]:
+        if field not in response:
+            errors.append(f"Missing required field: {field}")
+    if "reflection_text" in response and len(response["reflection_text"]) > 360:
+        errors.append("reflection_text too long")
+    if "action_suggestion" in response and len(response["action_suggestion"]) > 120:
+        errors.append("action_suggestion too long")
+    if "share_caption" in response and len(response["share_caption"]) > 90:
+        errors.append("share_caption too long")
+    if "tags" in response:
+        if not isinstance(response["tags"], list):
+            errors.append("tags must be an array")
+        elif len(response["tags"]) < 3 or len(response["tags"]) > 6:
+            errors.append("tags must have 3-6 items")
+    if "safety_flag" in response and response["safety_flag"] not in ["ok", "elevate"]:
+        errors.append("safety_flag invalid")
+    return (len(errors) == 0, errors)
+
+
+def previous_path():
+    result = json.loads(RAW)
+    legacy_validate(result)
+    return ReflectionResponse(**result)
+
+
+def pydantic_only():
+    return ReflectionResponse(**json.loads(RAW))
+
+
+def compiled_path():
+    return decode_reflection(RAW)
+
+
+def compiled_validate_only():
+    return validate_reflection(json.loads(RAW))
+
+
+def timed(func, iterations: int) -> float:
+    for _ in range(1000):
+        func()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    print("=" * 80)
+    print(f"Validation benchmark ({iterations:,} responses, orjson {'on' if orjson else 'off'})")
+    print("=" * 80)
+    baseline = timed(previous_path, iterations)
+    for label, func in [
+        ("previous (json + hand checks + pydantic)", previous_path),
+        ("pydantic only", pydantic_only),
+        ("json + compiled validator", compiled_validate_only),
+        ("compiled (orjson decode + validate)", compiled_path),
+    ]:
+        per_call = baseline if func is previous_path else timed(func, iterations)
+        print(f"{label:<44}{per_call:>8.2f} µs/response{baseline / per_call:>8.2f}x")
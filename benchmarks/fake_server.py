@@ -0,0 +1,320 @@
+"""
+MOODI Benchmark - Fake OpenAI server
+Local stand-in for /v1/chat/completions (plain and streamed) and
+/v1/moderations with injectable latency, tail latency, errors and hangs, for
+resilience and load benchmarks.
+
+Answers are replayed from a recordings file (JSONL lines of
+{"endpoint": ..., "content": ...}, as written with MOODI_BACKEND_RECORD) by
+the X-Moodi-Endpoint header the replay backend sends, round-robin per
+endpoint; endpoints without recordings get the offline template answers.
+A request's max_tokens is honoured at the same 4 characters per token the
+usage estimate assumes: longer answers are cut off with finish_reason
+"length".
+
+Run standalone with:
+    python benchmarks/fake_server.py --port 8089 --replay benchmarks/fixtures/recorded_responses.jsonl
+and start the API with MOODI_BACKEND=replay (MOODI_REPLAY_URL defaults to
+http://127.0.0.1:8089/v1). Benchmarks start it with serve_in_subprocess() so
+the server does not share the client's GIL. GET /v1/stats returns the
+request count.
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moodi_engine.backends import ENDPOINT_HEADER, TemplateGenerator
+
+
+# ============================================================================
+# OpenAI-shaped response bodies
+# ============================================================================
+
+def completion_body(
+    content: str, model: str, prompt_tokens: int = 0, finish_reason: str = "stop"
+) -> Dict[str, Any]:
+    """Chat completion JSON for one message; token counts are rough estimates"""
+    return {
+        "id": "chatcmpl-moodi-local",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "finish_reason": finish_reason,
+            "message": {"role": "assistant", "content": content}
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(content) // 4,
+            "total_tokens": prompt_tokens + len(content) // 4
+        }
+    }
+
+
+def stream_body(
+    content: str, model: str, prompt_tokens: int = 0, chunk_chars: int = 16, finish_reason: str = "stop"
+) -> bytes:
+    """Server-Sent Events of a streamed chat completion, ending with a usage chunk and [DONE]"""
+    created = int(time.time())
+
+    def event(choices: List[Dict[str, Any]], usage: Optional[Dict[str, int]] = None) -> str:
+        chunk = {
+            "id": "chatcmpl-moodi-local",
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": choices,
+            "usage": usage
+        }
+        return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+    events = [
+        event([{"index": 0, "delta": {"content": content[start:start + chunk_chars]}, "finish_reason": None}])
+        for start in range(0, len(content), chunk_chars)
+    ]
+    events.append(event([{"index": 0, "delta": {}, "finish_reason": finish_reason}]))
+    events.append(event([], {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": len(content) // 4,
+        "total_tokens": prompt_tokens + len(content) // 4
+    }))
+    events.append("data: [DONE]\n\n")
+    return "".join(events).encode()
+
+
+def moderation_body(texts: List[str], flagged: List[bool]) -> Dict[str, Any]:
+    """Moderation JSON with one result per text"""
+    return {
+        "id": "modr-moodi-local",
+        "model": "omni-moderation-latest",
+        "results": [{"flagged": flag, "categories": {}, "category_scores": {}} for flag in flagged]
+    }
+
+
+class FaultProfile:
+    """
+    Latency/fault mix of the fake server
+
+    Args:
+        latency_ms: Median latency of a normal response (log-normal)
+        sigma: Log-normal spread
+        slow_rate: Fraction of responses delayed to slow_ms
+        slow_ms: Latency of slow responses
+        error_rate: Fraction answered with 503
+        hang_rate: Fraction that hang for hang_ms before answering
+        hang_ms: How long a hung request stalls
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 80.0,
+        sigma: float = 0.25,
+        slow_rate: float = 0.0,
+        slow_ms: float = 1500.0,
+        error_rate: float = 0.0,
+        hang_rate: float = 0.0,
+        hang_ms: float = 30000.0,
+    ):
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_ms = hang_ms
+
+    def draw(self, rng: random.Random):
+        """(delay_s, status) for one request"""
+        roll = rng.random()
+        if roll < self.error_rate:
+            return self.latency_ms / 4000, 503
+        roll -= self.error_rate
+        if roll < self.hang_rate:
+            return self.hang_ms / 1000, 200
+        roll -= self.hang_rate
+        if roll < self.slow_rate:
+            return self.slow_ms / 1000, 200
+        return self.latency_ms * rng.lognormvariate(0, self.sigma) / 1000, 200
+
+
+def load_recordings(path: str) -> Dict[str, List[str]]:
+    """Recorded completion contents per endpoint from a JSONL file"""
+    recordings: Dict[str, List[str]] = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                recordings[entry["endpoint"]].append(entry["content"])
+    return dict(recordings)
+
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog (5) drops connections under benchmark concurrency
+    request_queue_size = 512
+    daemon_threads = True
+
+
+class FakeServer:
+    """Threaded HTTP server answering OpenAI-shaped requests under a FaultProfile"""
+
+    def __init__(
+        self,
+        profile: FaultProfile = None,
+        port: int = 0,
+        seed: int = 7,
+        recordings: Optional[Dict[str, List[str]]] = None,
+    ):
+        self.profile = profile or FaultProfile()
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._replay: Dict[str, Iterator[str]] = {
+            endpoint: itertools.cycle(contents) for endpoint, contents in (recordings or {}).items() if contents
+        }
+        self._templates = TemplateGenerator()
+        self._httpd = _Server(("127.0.0.1", port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/v1"
+
+    def start(self) -> "FakeServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _draw(self):
+        with self._lock:
+            self.requests += 1
+            return self.profile.draw(self._rng)
+
+    def content_for(self, endpoint: str, user_prompt: str) -> str:
+        """Next recorded content for the endpoint, else the template answer"""
+        replay = self._replay.get(endpoint) or self._replay.get("default")
+        if replay is not None:
+            with self._lock:
+                return next(replay)
+        return json.dumps(self._templates.answer(endpoint, user_prompt), ensure_ascii=False)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def _send(self, status: int, body, content_type: str = "application/json") -> None:
+                payload = body if isinstance(body, bytes) else json.dumps(body, ensure_ascii=False).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                try:
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up (deadline, or a hedge won)
+                    self.close_connection = True
+
+            def do_GET(self):
+                if self.path.endswith("/stats"):
+                    self._send(200, {"requests": server.requests})
+                else:
+                    self._send(404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                delay_s, status = server._draw()
+                time.sleep(delay_s)
+                if status != 200:
+                    self._send(status, {"error": {"message": "injected fault", "type": "server_error"}})
+                elif self.path.endswith("/moderations"):
+                    inputs = request.get("input")
+                    inputs = inputs if isinstance(inputs, list) else [inputs]
+                    self._send(200, moderation_body(inputs, [server._templates.flagged(text) for text in inputs]))
+                else:
+                    # Clients without the endpoint header (plain OpenAI clients) get a reflection
+                    endpoint = self.headers.get(ENDPOINT_HEADER, "reflection")
+                    messages = request.get("messages") or [{"content": ""}]
+                    content = server.content_for(endpoint, messages[-1].get("content", ""))
+                    model = request.get("model", "gpt-4.1-mini")
+                    finish_reason = "stop"
+                    if request.get("max_tokens") and len(content) > request["max_tokens"] * 4:
+                        content, finish_reason = content[:request["max_tokens"] * 4], "length"
+                    if request.get("stream"):
+                        self._send(200, stream_body(content, model, 420, finish_reason=finish_reason), "text/event-stream")
+                    else:
+                        self._send(200, completion_body(content, model, 420, finish_reason))
+
+        return Handler
+
+
+def _serve(profile: FaultProfile, recordings, conn) -> None:
+    fake = FakeServer(profile, recordings=recordings)
+    conn.send(fake.base_url)
+    fake._httpd.serve_forever()
+
+
+def serve_in_subprocess(profile: FaultProfile, recordings: Optional[Dict[str, List[str]]] = None):
+    """
+    Start a FakeServer in a child process
+
+    Returns:
+        Tuple of (process, base_url); terminate() the process when done
+    """
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve, args=(profile, recordings, child), daemon=True)
+    process.start()
+    return process, parent.recv()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI server with injected faults")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--replay", help="JSONL recordings to replay (endpoint, content)")
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--sigma", type=float, default=0.25)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-ms", type=float, default=1500.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeServer(
+        FaultProfile(
+            latency_ms=args.latency_ms, sigma=args.sigma, slow_rate=args.slow_rate, slow_ms=args.slow_ms,
+            error_rate=args.error_rate, hang_rate=args.hang_rate
+        ),
+        port=args.port,
+        recordings=load_recordings(args.replay) if args.replay else None
+    )
+    print(f"Fake OpenAI server on {fake.base_url}")
+    try:
+        fake._httpd.serve_forever()
+    except KeyboardInterrupt:
+        fake.stop()
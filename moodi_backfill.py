@@ -0,0 +1,436 @@
+"""
+MOODI Reflection Backfill
+Offline bulk regeneration of mood_reflections through a Batch-API-style job runner
+
+Run with: python moodi_backfill.py --dsn "$DATABASE_URL" [--backend openai|local]
+"""
+
+import argparse
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from moodi_engine import get_client
+from moodi_engine.budgets import token_budget
+from moodi_engine.prompts import SYSTEM_PROMPT, build_reflection_prompt
+from moodi_reflection_api import REFLECTION_MODEL, REFLECTION_TEMPERATURE, validate_response
+
+# OpenAI Batch API limit per input file
+MAX_REQUESTS_PER_FILE = 50000
+REFLECTION_FIELDS = ["reflection_text", "action_suggestion", "share_caption", "soundtrack_hint", "tags", "safety_flag"]
+
+
+# ============================================================================
+# Request Files
+# ============================================================================
+
+def mood_row_to_payload(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn a `moods` row (joined with the user's locale) into a mood payload
+
+    The moods table does not store the age bucket, so it defaults to "adult".
+    """
+    return {
+        "mood_emoji": row["mood_emoji"],
+        "mood_color": row["mood_color"],
+        "intensity_0_10": row["intensity_0_10"],
+        "context_text": row.get("context_text"),
+        "media_present": bool(row.get("media_present", False)),
+        "time_bucket": row.get("time_bucket"),
+        "geo_hint": row.get("geo_hint"),
+        "user_locale": row.get("locale") or "fr",
+        "user_age_bucket": row.get("user_age_bucket") or "adult"
+    }
+
+
+def build_request_line(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Build one Batch API request line for a mood row (custom_id = mood id)"""
+    payload = mood_row_to_payload(row)
+    body = {
+        "model": REFLECTION_MODEL,
+        "temperature": REFLECTION_TEMPERATURE,
+        "response_format": {"type": "json_object"},
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": build_reflection_prompt(payload)}
+        ]
+    }
+    max_tokens = token_budget("reflection", payload["user_locale"])
+    if max_tokens is not None:
+        body["max_tokens"] = max_tokens
+    return {"custom_id": str(row["id"]), "method": "POST", "url": "/v1/chat/completions", "body": body}
+
+
+def write_request_files(
+    rows: Iterable[Dict[str, Any]],
+    out_dir: str,
+    max_requests_per_file: int = MAX_REQUESTS_PER_FILE
+) -> List[str]:
+    """
+    Write mood rows as JSONL request files, splitting at the per-file limit
+
+    Returns:
+        Paths of the written files
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths: List[str] = []
+    handle = None
+    count = 0
+
+    try:
+        for row in rows:
+            if handle is None or count >= max_requests_per_file:
+                if handle is not None:
+                    handle.close()
+                path = os.path.join(out_dir, f"requests-{len(paths):04d}.jsonl")
+                paths.append(path)
+                handle = open(path, "w", encoding="utf-8")
+                count = 0
+            handle.write(json.dumps(build_request_line(row), ensure_ascii=False))
+            handle.write("\n")
+            count += 1
+    finally:
+        if handle is not None:
+            handle.close()
+
+    return paths
+
+
+# ============================================================================
+# Batch Backends
+# ============================================================================
+
+class BatchBackend:
+    """Interface for a backend that runs JSONL request files as batch jobs"""
+
+    def submit(self, path: str) -> str:
+        """Submit a request file and return a job id"""
+        raise NotImplementedError
+
+    def status(self, job_id: str) -> str:
+        """Return the job status: 'in_progress', 'completed', 'failed', 'expired' or 'cancelled'"""
+        raise NotImplementedError
+
+    def results(self, job_id: str) -> Iterator[Dict[str, Any]]:
+        """Yield the output lines of a completed job"""
+        raise NotImplementedError
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """Runs request files through the OpenAI Batch API"""
+
+    def __init__(self, client=None, completion_window: str = "24h"):
+        self.client = client or get_client()
+        self.completion_window = completion_window
+
+    def submit(self, path: str) -> str:
+        with open(path, "rb") as handle:
+            input_file = self.client.files.create(file=handle, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window=self.completion_window
+        )
+        return batch.id
+
+    def status(self, job_id: str) -> str:
+        status = self.client.batches.retrieve(job_id).status
+        if status in ("validating", "finalizing", "cancelling"):
+            return "in_progress"
+        return status
+
+    def results(self, job_id: str) -> Iterator[Dict[str, Any]]:
+        batch = self.client.batches.retrieve(job_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _template_reflection(request_body: Dict[str, Any]) -> Dict[str, Any]:
+    """Deterministic stand-in reflection used by the local backend"""
+    return {
+        "reflection_text": "Thanks for checking in. Noticing how you feel is already a small act of care.",
+        "action_suggestion": "Take one slow breath and relax your shoulders.",
+        "share_caption": "One small check-in at a time.",
+        "soundtrack_hint": "soft acoustic",
+        "tags": ["check-in", "calm", "self-care"],
+        "safety_flag": "ok"
+    }
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    File-based stand-in for the Batch API
+
+    Jobs are processed on submit with `responder` (request body -> reflection
+    dict) and written as OpenAI-format output JSONL under `work_dir`.
+    """
+
+    def __init__(
+        self,
+        work_dir: str,
+        responder: Callable[[Dict[str, Any]], Dict[str, Any]] = _template_reflection
+    ):
+        self.work_dir = work_dir
+        self.responder = responder
+        os.makedirs(work_dir, exist_ok=True)
+
+    def _output_path(self, job_id: str) -> str:
+        return os.path.join(self.work_dir, f"{job_id}-output.jsonl")
+
+    def submit(self, path: str) -> str:
+        job_id = f"batch_local_{uuid.uuid4().hex[:12]}"
+        with open(path, encoding="utf-8") as source, \
+                open(self._output_path(job_id), "w", encoding="utf-8") as output:
+            for line in source:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                output.write(json.dumps(self._respond(request), ensure_ascii=False))
+                output.write("\n")
+        return job_id
+
+    def _respond(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            content = json.dumps(self.responder(request["body"]), ensure_ascii=False)
+        except Exception as e:
+            return {
+                "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+                "custom_id": request["custom_id"],
+                "response": None,
+                "error": {"code": "local_error", "message": str(e)}
+            }
+        return {
+            "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+            "custom_id": request["custom_id"],
+            "response": {
+                "status_code": 200,
+                "body": {
+                    "model": request["body"].get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]
+                }
+            },
+            "error": None
+        }
+
+    def status(self, job_id: str) -> str:
+        return "completed" if os.path.exists(self._output_path(job_id)) else "failed"
+
+    def results(self, job_id: str) -> Iterator[Dict[str, Any]]:
+        with open(self._output_path(job_id), encoding="utf-8") as handle:
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+
+
+# ============================================================================
+# Result Parsing
+# ============================================================================
+
+def parse_result_line(line: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]], List[str]]:
+    """
+    Parse and validate one batch output line
+
+    Returns:
+        Tuple of (mood_id, reflection or None, list_of_errors)
+    """
+    mood_id = line.get("custom_id")
+    response = line.get("response") or {}
+
+    if line.get("error") or response.get("status_code") != 200:
+        error = line.get("error") or {"message": f"status {response.get('status_code')}"}
+        return mood_id, None, [f"Batch request failed: {error.get('message')}"]
+
+    try:
+        content = response["body"]["choices"][0]["message"]["content"]
+        reflection = json.loads(content)
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        return mood_id, None, [f"Unparseable completion: {str(e)}"]
+
+    is_valid, errors = validate_response(reflection)
+    if not is_valid:
+        return mood_id, None, errors
+    return mood_id, reflection, []
+
+
+# ============================================================================
+# Sinks
+# ============================================================================
+
+class MemoryReflectionSink:
+    """Collects reflection rows in memory (local runs and benchmarks)"""
+
+    def __init__(self):
+        self.rows: List[Tuple] = []
+
+    def write(self, rows: List[Tuple]) -> None:
+        self.rows.extend(rows)
+
+
+class PostgresReflectionSink:
+    """
+    Bulk-inserts reflection rows into mood_reflections with execute_values
+
+    With `replace_existing`, older reflections for the same moods are deleted
+    in the same transaction.
+    """
+
+    def __init__(self, conn, replace_existing: bool = True, page_size: int = 1000):
+        self.conn = conn
+        self.replace_existing = replace_existing
+        self.page_size = page_size
+
+    def write(self, rows: List[Tuple]) -> None:
+        from psycopg2.extras import execute_values
+
+        with self.conn.cursor() as cur:
+            if self.replace_existing:
+                cur.execute(
+                    "DELETE FROM public.mood_reflections WHERE mood_id = ANY(%s::uuid[])",
+                    ([row[0] for row in rows],)
+                )
+            execute_values(
+                cur,
+                """INSERT INTO public.mood_reflections
+                   (mood_id, reflection_text, action_suggestion, share_caption, soundtrack_hint, tags, safety_flag)
+                   VALUES %s""",
+                rows,
+                page_size=self.page_size
+            )
+        self.conn.commit()
+
+
+def fetch_mood_rows(conn, fetch_size: int = 5000) -> Iterator[Dict[str, Any]]:
+    """Stream every mood joined with its user's locale through a server-side cursor"""
+    with conn.cursor(name="moodi_backfill_moods") as cur:
+        cur.itersize = fetch_size
+        cur.execute(
+            """SELECT m.id, m.mood_emoji, m.mood_color, m.intensity_0_10, m.context_text,
+                      m.media_present, m.time_bucket, m.geo_hint, u.locale
+               FROM public.moods m
+               JOIN public.users u ON u.id = m.user_id
+               ORDER BY m.created_at"""
+        )
+        columns = None
+        for record in cur:
+            if columns is None:
+                columns = [column[0] for column in cur.description]
+            yield dict(zip(columns, record))
+
+
+# ============================================================================
+# Job Runner
+# ============================================================================
+
+class BackfillRunner:
+    """Writes request files, submits them, polls for completion and stores valid results"""
+
+    def __init__(
+        self,
+        backend: BatchBackend,
+        sink,
+        work_dir: str,
+        poll_interval: float = 30.0,
+        insert_batch_size: int = 5000,
+        max_requests_per_file: int = MAX_REQUESTS_PER_FILE
+    ):
+        self.backend = backend
+        self.sink = sink
+        self.work_dir = work_dir
+        self.poll_interval = poll_interval
+        self.insert_batch_size = insert_batch_size
+        self.max_requests_per_file = max_requests_per_file
+
+    def run(self, rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Run a full backfill
+
+        Returns:
+            Stats dictionary with request, validation and timing counters
+        """
+        stats = {
+            "files": 0, "requests": 0, "valid": 0, "invalid": 0, "failed_jobs": 0,
+            "write_s": 0.0, "wait_s": 0.0, "parse_insert_s": 0.0, "errors": []
+        }
+
+        started = time.perf_counter()
+        paths = write_request_files(rows, self.work_dir, self.max_requests_per_file)
+        stats["files"] = len(paths)
+        stats["write_s"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        pending = {self.backend.submit(path): path for path in paths}
+        completed: List[str] = []
+        while pending:
+            for job_id in list(pending):
+                status = self.backend.status(job_id)
+                if status == "completed":
+                    completed.append(job_id)
+                    del pending[job_id]
+                elif status in ("failed", "expired", "cancelled"):
+                    stats["failed_jobs"] += 1
+                    stats["errors"].append(f"{pending.pop(job_id)}: job {job_id} {status}")
+            if pending:
+                time.sleep(self.poll_interval)
+        stats["wait_s"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        buffer: List[Tuple] = []
+        for job_id in completed:
+            for line in self.backend.results(job_id):
+                stats["requests"] += 1
+                mood_id, reflection, errors = parse_result_line(line)
+                if reflection is None:
+                    stats["invalid"] += 1
+                    if len(stats["errors"]) < 100:
+                        stats["errors"].append(f"{mood_id}: {'; '.join(errors)}")
+                    continue
+                stats["valid"] += 1
+                buffer.append((mood_id, *[reflection[field] for field in REFLECTION_FIELDS]))
+                if len(buffer) >= self.insert_batch_size:
+                    self.sink.write(buffer)
+                    buffer = []
+        if buffer:
+            self.sink.write(buffer)
+        stats["parse_insert_s"] = time.perf_counter() - started
+
+        return stats
+
+
+# ============================================================================
+# Command Line
+# ============================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regenerate mood_reflections in bulk")
+    parser.add_argument("--dsn", default=os.getenv("DATABASE_URL"), help="Postgres connection string")
+    parser.add_argument("--backend", choices=["openai", "local"], default="openai")
+    parser.add_argument("--work-dir", default=f"backfill-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}")
+    parser.add_argument("--poll-interval", type=float, default=30.0)
+    args = parser.parse_args()
+
+    import psycopg2
+
+    read_conn = psycopg2.connect(args.dsn)
+    write_conn = psycopg2.connect(args.dsn)
+
+    if args.backend == "openai":
+        backend = OpenAIBatchBackend()
+    else:
+        backend = LocalBatchBackend(os.path.join(args.work_dir, "local-backend"))
+
+    runner = BackfillRunner(
+        backend,
+        PostgresReflectionSink(write_conn),
+        args.work_dir,
+        poll_interval=args.poll_interval
+    )
+    result = runner.run(fetch_mood_rows(read_conn))
+
+    print(json.dumps(result, indent=2, ensure_ascii=False))
@@ -0,0 +1,168 @@
+"""
+MOODI Bulk Mood Import
+Loads historical moods with COPY and recomputes streaks and coins set-wise in one pass
+
+Per-row gamification is skipped during the load (moodi.skip_gamification);
+one window-function UPDATE then applies the same rules as the
+apply_mood_gamification() trigger to every affected user.
+
+Run with: python moodi_bulk_import.py --dsn "$DATABASE_URL" moods.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, Iterable
+
+MOOD_COLUMNS = [
+    "user_id", "created_at", "mood_emoji", "mood_color", "intensity_0_10",
+    "context_text", "media_present", "time_bucket", "geo_hint"
+]
+
+CREATE_STAGING_SQL = """
+CREATE TEMP TABLE moodi_import_staging (
+  user_id UUID NOT NULL,
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+  mood_emoji TEXT NOT NULL,
+  mood_color TEXT NOT NULL,
+  intensity_0_10 INT,
+  context_text TEXT,
+  media_present BOOLEAN NOT NULL DEFAULT FALSE,
+  time_bucket TEXT,
+  geo_hint TEXT
+) ON COMMIT DROP
+"""
+
+INSERT_MOODS_SQL = """
+INSERT INTO public.moods (user_id, created_at, mood_emoji, mood_color, intensity_0_10,
+                          context_text, media_present, time_bucket, geo_hint)
+SELECT user_id, created_at, mood_emoji, mood_color, intensity_0_10,
+       context_text, media_present, time_bucket, geo_hint
+FROM moodi_import_staging
+"""
+
+# Gaps-and-islands over the distinct new posting days of each user.
+# Days on or before users.last_mood_date change nothing (same as the trigger).
+# An island that starts the day after last_mood_date continues the stored
+# streak; any other island starts again at 1. Every day earns 5 coins, and
+# every day whose streak value is a multiple of 3 earns a 5-coin bonus.
+RECOMPUTE_GAMIFICATION_SQL = """
+WITH days AS (
+  SELECT DISTINCT s.user_id, DATE(s.created_at) AS mood_date
+  FROM moodi_import_staging s
+  JOIN public.users u ON u.id = s.user_id
+  WHERE u.last_mood_date IS NULL OR DATE(s.created_at) > u.last_mood_date
+),
+islands AS (
+  SELECT user_id, mood_date,
+         mood_date - (ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY mood_date))::INT AS island
+  FROM days
+),
+runs AS (
+  SELECT user_id, mood_date,
+         ROW_NUMBER() OVER (PARTITION BY user_id, island ORDER BY mood_date) AS run_position,
+         MIN(mood_date) OVER (PARTITION BY user_id, island) AS island_start
+  FROM islands
+),
+streaks AS (
+  SELECT r.user_id, r.mood_date,
+         r.run_position + CASE WHEN u.last_mood_date = r.island_start - 1 THEN u.streak_days ELSE 0 END AS streak
+  FROM runs r
+  JOIN public.users u ON u.id = r.user_id
+),
+totals AS (
+  SELECT user_id,
+         MAX(mood_date) AS last_mood_date,
+         COUNT(*) AS new_days,
+         COUNT(*) FILTER (WHERE streak % 3 = 0) AS bonus_days,
+         (ARRAY_AGG(streak ORDER BY mood_date DESC))[1] AS final_streak
+  FROM streaks
+  GROUP BY user_id
+)
+UPDATE public.users u
+SET streak_days = t.final_streak,
+    last_mood_date = t.last_mood_date,
+    moodcoins = u.moodcoins + 5 * t.new_days + 5 * t.bonus_days
+FROM totals t
+WHERE u.id = t.user_id
+"""
+
+
+def _write_csv(rows: Iterable[Dict[str, Any]], handle) -> int:
+    writer = csv.writer(handle)
+    count = 0
+    for row in rows:
+        writer.writerow([
+            "" if row.get(column) is None else
+            ("true" if row[column] is True else "false" if row[column] is False else row[column])
+            for column in MOOD_COLUMNS
+        ])
+        count += 1
+    return count
+
+
+def import_moods(conn, rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Import moods and apply gamification for the whole batch in one transaction
+
+    Args:
+        conn: psycopg2 connection
+        rows: Mood dicts with MOOD_COLUMNS keys (created_at as datetime or ISO string)
+
+    Returns:
+        Stats with row/user counts and per-phase timings
+    """
+    stats: Dict[str, Any] = {}
+
+    started = time.perf_counter()
+    with tempfile.TemporaryFile("w+", encoding="utf-8", newline="") as buffer:
+        stats["moods"] = _write_csv(rows, buffer)
+        buffer.seek(0)
+        stats["serialize_s"] = time.perf_counter() - started
+
+        with conn:
+            with conn.cursor() as cur:
+                started = time.perf_counter()
+                cur.execute(CREATE_STAGING_SQL)
+                cur.copy_expert(
+                    f"COPY moodi_import_staging ({', '.join(MOOD_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                    buffer
+                )
+                stats["copy_s"] = time.perf_counter() - started
+
+                started = time.perf_counter()
+                cur.execute("SET LOCAL moodi.skip_gamification = 'on'")
+                cur.execute(INSERT_MOODS_SQL)
+                stats["insert_s"] = time.perf_counter() - started
+
+                started = time.perf_counter()
+                cur.execute(RECOMPUTE_GAMIFICATION_SQL)
+                stats["users_updated"] = cur.rowcount
+                stats["gamification_s"] = time.perf_counter() - started
+
+    return stats
+
+
+def read_csv_file(path: str) -> Iterable[Dict[str, Any]]:
+    """Read moods from a CSV file with a MOOD_COLUMNS header"""
+    with open(path, encoding="utf-8", newline="") as handle:
+        for row in csv.DictReader(handle):
+            yield {column: (row.get(column) or None) for column in MOOD_COLUMNS}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-import moods with set-based gamification")
+    parser.add_argument("csv_path", help="CSV file with a header row of mood columns")
+    parser.add_argument("--dsn", default=os.getenv("DATABASE_URL"), help="Postgres connection string")
+    args = parser.parse_args()
+
+    import psycopg2
+
+    connection = psycopg2.connect(args.dsn)
+    try:
+        print(json.dumps(import_moods(connection, read_csv_file(args.csv_path)), indent=2))
+    finally:
+        connection.close()
@@ -0,0 +1,39 @@
+"""
+MOODI Engine
+Shared prompts, models and model-calling layer used by the FastAPI apps and the integration workflow
+
+Importing the package is cheap: OpenAI clients are created lazily on first
+use, and pydantic models live in moodi_engine.models.
+"""
+
+from moodi_engine.clients import (
+    get_client,
+    set_client,
+    get_async_client,
+    set_async_client,
+    aclose_async_client,
+)
+from moodi_engine.engine import (
+    DEFAULT_MODEL,
+    complete,
+    complete_json,
+    acomplete,
+    acomplete_json,
+    astream_completion,
+)
+from moodi_engine.metrics import usage_tracker
+
+__all__ = [
+    "get_client",
+    "set_client",
+    "get_async_client",
+    "set_async_client",
+    "aclose_async_client",
+    "DEFAULT_MODEL",
+    "complete",
+    "complete_json",
+    "acomplete",
+    "acomplete_json",
+    "astream_completion",
+    "usage_tracker",
+]
@@ -0,0 +1,126 @@
+"""
+MOODI Engine - Authentication
+Verifies Supabase access tokens (HS256 JWTs signed with the project's JWT secret)
+
+Writes that change a user's moods, streak and coins go through a direct
+database connection, which bypasses the RLS policies, so the API has to
+establish who the caller is itself: the user is the token's `sub`, and a
+`user_id` in the request body is only accepted when it matches it.
+
+Only the standard library is used; Supabase signs access tokens with HS256
+and the secret from Settings > API (SUPABASE_JWT_SECRET).
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+JWT_AUDIENCE = os.getenv("MOODI_JWT_AUDIENCE", "authenticated")
+# Clock skew tolerated on exp/nbf
+LEEWAY_S = 30
+
+
+class AuthError(Exception):
+    """Missing, invalid or mismatched credentials (status_code: 401 or 403)"""
+
+    def __init__(self, message: str, status_code: int = 401):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def encode_token(claims: Dict[str, Any], secret: str) -> str:
+    """Sign claims as an HS256 JWT (local runs and tests; Supabase issues the real ones)"""
+    header = _b64encode(json.dumps({"alg": "HS256", "typ": "JWT"}).encode())
+    payload = _b64encode(json.dumps(claims).encode())
+    signature = hmac.new(secret.encode(), f"{header}.{payload}".encode(), hashlib.sha256).digest()
+    return f"{header}.{payload}.{_b64encode(signature)}"
+
+
+def verify_token(
+    token: str,
+    secret: Optional[str] = None,
+    audience: Optional[str] = JWT_AUDIENCE,
+    now: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Check an access token's signature, expiry and audience
+
+    Args:
+        token: Compact JWT
+        secret: HS256 secret (default SUPABASE_JWT_SECRET)
+        audience: Required `aud` claim, or None to skip the check
+        now: Current time in epoch seconds (default time.time())
+
+    Returns:
+        The token's claims
+
+    Raises:
+        AuthError: Token is malformed, forged, expired or for another audience
+    """
+    secret = secret or SUPABASE_JWT_SECRET
+    if not secret:
+        raise AuthError("Authentication is not configured (SUPABASE_JWT_SECRET)", status_code=503)
+    try:
+        header_segment, payload_segment, signature_segment = token.split(".")
+        header = json.loads(_b64decode(header_segment))
+        claims = json.loads(_b64decode(payload_segment))
+        signature = _b64decode(signature_segment)
+    except ValueError:
+        raise AuthError("Malformed access token")
+    if not isinstance(header, dict) or header.get("alg") != "HS256" or not isinstance(claims, dict):
+        raise AuthError("Unsupported access token")
+
+    expected = hmac.new(secret.encode(), f"{header_segment}.{payload_segment}".encode(), hashlib.sha256).digest()
+    if not hmac.compare_digest(signature, expected):
+        raise AuthError("Invalid access token signature")
+
+    now = time.time() if now is None else now
+    if "exp" in claims and now > claims["exp"] + LEEWAY_S:
+        raise AuthError("Access token expired")
+    if "nbf" in claims and now < claims["nbf"] - LEEWAY_S:
+        raise AuthError("Access token not yet valid")
+    if audience is not None:
+        token_audience = claims.get("aud")
+        audiences = token_audience if isinstance(token_audience, list) else [token_audience]
+        if audience not in audiences:
+            raise AuthError("Access token audience mismatch")
+    if not claims.get("sub"):
+        raise AuthError("Access token has no subject")
+    return claims
+
+
+def authenticated_user(authorization: Optional[str], user_id: Optional[str] = None) -> str:
+    """
+    User id of a request from its Authorization header
+
+    Args:
+        authorization: "Bearer <token>" header value
+        user_id: User id the request claims to act for; must match the token
+
+    Returns:
+        The token's subject
+
+    Raises:
+        AuthError: 401 without a valid bearer token, 403 when user_id is
+            another user
+    """
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        raise AuthError("Bearer access token required")
+    subject = verify_token(token.strip())["sub"]
+    if user_id is not None and user_id.lower() != subject.lower():
+        raise AuthError("user_id does not match the access token", status_code=403)
+    return subject
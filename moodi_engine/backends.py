@@ -0,0 +1,355 @@
+"""
+MOODI Engine - Model backends
+Pluggable providers of OpenAI-shaped clients, selected per endpoint
+
+    openai    the shared OpenAI clients (default)
+    replay    an OpenAI-compatible server at MOODI_REPLAY_URL, e.g.
+              benchmarks/fake_server.py replaying recorded responses with
+              injected latency
+    template  offline, in-process answers built from moodi_engine.fallbacks
+              and the local pre-screen; no network, no tokens, no SDK
+
+MOODI_BACKEND picks the backend for every endpoint and
+MOODI_BACKEND_<ENDPOINT> (e.g. MOODI_BACKEND_MODERATION=openai) overrides it
+for one. The engine, resilience and streaming code paths are the same
+whichever one is used.
+
+With MOODI_BACKEND_RECORD=<path>, every completion's content is appended to
+a JSONL file the fake server can replay.
+"""
+
+import json
+import os
+import re
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from moodi_engine import clients
+from moodi_engine.fallbacks import FALLBACK_NOTIFICATION, fallback_caption, fallback_reflection
+from moodi_engine.prescreen import prescreen
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+DEFAULT_BACKEND = os.getenv("MOODI_BACKEND", "openai")
+REPLAY_URL = os.getenv("MOODI_REPLAY_URL", "http://127.0.0.1:8089/v1")
+RECORD_PATH = os.getenv("MOODI_BACKEND_RECORD")
+
+# Sent by the replay backend so the server can answer per endpoint
+ENDPOINT_HEADER = "X-Moodi-Endpoint"
+
+
+# ============================================================================
+# Offline template generator
+# ============================================================================
+
+_QUOTED = re.compile(r'(\w+)="([^"]*)"')
+_SAFETY_TEXT = re.compile(r'Text: """(.*)"""', re.S)
+_REPAIR_FIELD = re.compile(r"^- (\w+):", re.M)
+
+
+def _embedded_json(text: str) -> Dict[str, Any]:
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        return {}
+    try:
+        value = json.loads(text[start:end + 1])
+    except ValueError:
+        return {}
+    return value if isinstance(value, dict) else {}
+
+
+class TemplateGenerator:
+    """
+    Deterministic answers per endpoint, parsed back out of our own prompts
+
+    Reflections come from the fallback templates (safety_flag first, as the
+    stream asks), safety answers from the local pre-screen.
+    """
+
+    def answer(self, endpoint: str, user_prompt: str) -> Dict[str, Any]:
+        if endpoint == "reflection":
+            return fallback_reflection(_embedded_json(user_prompt))
+        if endpoint == "reflection_stream":
+            reflection = fallback_reflection(_embedded_json(user_prompt))
+            return {"safety_flag": reflection["safety_flag"], **reflection}
+        if endpoint == "reflection_repair":
+            template = fallback_reflection({})
+            return {field: template[field] for field in _REPAIR_FIELD.findall(user_prompt) if field in template}
+        if endpoint == "notification":
+            return dict(FALLBACK_NOTIFICATION)
+        if endpoint == "notification_catalog":
+            return {"variants": [dict(FALLBACK_NOTIFICATION)]}
+        if endpoint == "referral_caption":
+            return {"caption": fallback_caption(dict(_QUOTED.findall(user_prompt)).get("user_locale", "en"))}
+        if endpoint == "safety_classifier":
+            match = _SAFETY_TEXT.search(user_prompt)
+            verdict = prescreen(match.group(1) if match else "")["verdict"]
+            return {"safety_flag": "ok" if verdict == "clear" else "elevate"}
+        return {}
+
+    def flagged(self, text: str) -> bool:
+        return prescreen(text or "")["verdict"] == "high"
+
+
+class _Fields:
+    """Attribute access over a dict, with model_dump() like the openai types"""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def model_dump(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+
+def _usage(prompt_chars: int, content: str) -> _Fields:
+    # Rough estimate: 4 characters per token
+    return _Fields(prompt_tokens=prompt_chars // 4, completion_tokens=len(content) // 4, prompt_tokens_details=None)
+
+
+class _TemplateCompletions:
+    def __init__(self, endpoint: str, generator: TemplateGenerator):
+        self.endpoint = endpoint
+        self.generator = generator
+
+    def _content(self, messages: List[Dict[str, str]]) -> Tuple[str, int]:
+        user_prompt = messages[-1]["content"] if messages else ""
+        content = json.dumps(self.generator.answer(self.endpoint, user_prompt), ensure_ascii=False)
+        return content, sum(len(message.get("content", "")) for message in messages)
+
+    def create(self, messages: List[Dict[str, str]], **kwargs) -> _Fields:
+        content, prompt_chars = self._content(messages)
+        return _Fields(
+            choices=[_Fields(message=_Fields(role="assistant", content=content), finish_reason="stop")],
+            usage=_usage(prompt_chars, content)
+        )
+
+    def stream(self, messages: List[Dict[str, str]], chunk_chars: int = 16) -> List[_Fields]:
+        content, prompt_chars = self._content(messages)
+        chunks = [
+            _Fields(choices=[_Fields(delta=_Fields(content=content[start:start + chunk_chars]))], usage=None)
+            for start in range(0, len(content), chunk_chars)
+        ]
+        chunks.append(_Fields(choices=[], usage=_usage(prompt_chars, content)))
+        return chunks
+
+
+class _AsyncTemplateCompletions(_TemplateCompletions):
+    async def create(self, messages: List[Dict[str, str]], stream: bool = False, **kwargs):
+        if not stream:
+            return _TemplateCompletions.create(self, messages)
+        return _ChunkStream(self.stream(messages))
+
+
+class _ChunkStream:
+    def __init__(self, chunks: List[_Fields]):
+        self._chunks = iter(chunks)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> _Fields:
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def close(self) -> None:
+        self._chunks = iter(())
+
+
+class _TemplateModerations:
+    def __init__(self, generator: TemplateGenerator):
+        self.generator = generator
+
+    def create(self, input, **kwargs) -> _Fields:
+        texts = input if isinstance(input, list) else [input]
+        return _Fields(results=[
+            _Fields(flagged=self.generator.flagged(text), categories=_Fields(), category_scores=_Fields())
+            for text in texts
+        ])
+
+
+class TemplateClient:
+    """In-process stand-in for the parts of OpenAI/AsyncOpenAI the engine uses"""
+
+    def __init__(self, endpoint: str, generator: Optional[TemplateGenerator] = None, asynchronous: bool = False):
+        generator = generator or TemplateGenerator()
+        completions = (_AsyncTemplateCompletions if asynchronous else _TemplateCompletions)(endpoint, generator)
+        self.chat = _Fields(completions=completions)
+        self.moderations = _TemplateModerations(generator)
+
+    async def close(self) -> None:
+        pass
+
+
+# ============================================================================
+# Backends
+# ============================================================================
+
+class Backend:
+    """Source of the sync and async OpenAI clients for one endpoint"""
+
+    name = "base"
+
+    def client(self) -> "OpenAI":
+        raise NotImplementedError
+
+    def async_client(self) -> "AsyncOpenAI":
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        pass
+
+
+class OpenAIBackend(Backend):
+    """The shared, lazily created OpenAI clients (moodi_engine.clients)"""
+
+    name = "openai"
+
+    def client(self) -> "OpenAI":
+        return clients.get_client()
+
+    def async_client(self) -> "AsyncOpenAI":
+        return clients.get_async_client()
+
+
+class ReplayBackend(Backend):
+    """
+    Clients pointed at an OpenAI-compatible server (e.g. benchmarks/fake_server.py)
+
+    Args:
+        endpoint: Endpoint name, sent as the X-Moodi-Endpoint header
+        base_url: Server base URL including /v1
+    """
+
+    name = "replay"
+
+    def __init__(self, endpoint: str, base_url: str = REPLAY_URL):
+        self.endpoint = endpoint
+        self.base_url = base_url
+        self._client: Optional["OpenAI"] = None
+        self._async_client: Optional["AsyncOpenAI"] = None
+
+    def _options(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "api_key": os.getenv("OPENAI_API_KEY") or "replay",
+            "max_retries": clients.MAX_RETRIES,
+            "default_headers": {ENDPOINT_HEADER: self.endpoint}
+        }
+
+    def client(self) -> "OpenAI":
+        if self._client is None:
+            import httpx
+            from openai import OpenAI
+
+            limits, timeout = clients._pool_settings()
+            self._client = OpenAI(**self._options(), http_client=httpx.Client(limits=limits, timeout=timeout))
+        return self._client
+
+    def async_client(self) -> "AsyncOpenAI":
+        if self._async_client is None:
+            import httpx
+            from openai import AsyncOpenAI
+
+            limits, timeout = clients._pool_settings()
+            self._async_client = AsyncOpenAI(
+                **self._options(), http_client=httpx.AsyncClient(limits=limits, timeout=timeout)
+            )
+        return self._async_client
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+
+class TemplateBackend(Backend):
+    """
+    Offline answers from TemplateGenerator, in-process
+
+    The clients skip HTTP and the openai SDK entirely, so load tests on this
+    backend measure only our own request handling.
+    """
+
+    name = "template"
+
+    def __init__(self, endpoint: str, generator: Optional[TemplateGenerator] = None):
+        generator = generator or TemplateGenerator()
+        self._client = TemplateClient(endpoint, generator)
+        self._async_client = TemplateClient(endpoint, generator, asynchronous=True)
+
+    def client(self) -> TemplateClient:
+        return self._client
+
+    def async_client(self) -> TemplateClient:
+        return self._async_client
+
+
+_FACTORIES: Dict[str, Callable[[str], Backend]] = {
+    "openai": lambda endpoint: OpenAIBackend(),
+    "replay": ReplayBackend,
+    "template": TemplateBackend,
+}
+
+_backends: Dict[str, Backend] = {}
+_backends_lock = threading.Lock()
+
+
+def backend_name(endpoint: str) -> str:
+    """Configured backend for `endpoint` (MOODI_BACKEND_<ENDPOINT>, else MOODI_BACKEND)"""
+    return os.getenv(f"MOODI_BACKEND_{endpoint.upper()}", DEFAULT_BACKEND)
+
+
+def backend_for(endpoint: str) -> Backend:
+    """Backend serving `endpoint`, created on first use"""
+    backend = _backends.get(endpoint)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(endpoint)
+            if backend is None:
+                name = backend_name(endpoint)
+                if name not in _FACTORIES:
+                    raise ValueError(f"Unknown backend for {endpoint}: {name!r} (expected one of {', '.join(_FACTORIES)})")
+                backend = _backends[endpoint] = _FACTORIES[name](endpoint)
+    return backend
+
+
+def set_backend(endpoint: str, backend: Optional[Backend]) -> None:
+    """Replace (or with None, reset to configuration) the backend of one endpoint"""
+    with _backends_lock:
+        if backend is None:
+            _backends.pop(endpoint, None)
+        else:
+            _backends[endpoint] = backend
+
+
+def backends() -> Dict[str, str]:
+    """Endpoint -> backend name, for endpoints used so far"""
+    return {endpoint: backend.name for endpoint, backend in sorted(_backends.items())}
+
+
+async def aclose_backends() -> None:
+    """Close clients owned by replay/template backends"""
+    for backend in list(_backends.values()):
+        await backend.aclose()
+
+
+# ============================================================================
+# Recording
+# ============================================================================
+
+_record_lock = threading.Lock()
+
+
+def record_response(endpoint: str, content: str) -> None:
+    """Append a completion to MOODI_BACKEND_RECORD (no-op when unset)"""
+    if not RECORD_PATH:
+        return
+    line = json.dumps({"endpoint": endpoint, "content": content}, ensure_ascii=False)
+    try:
+        with _record_lock, open(RECORD_PATH, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        print(f"Recording response failed: {e}")
@@ -0,0 +1,53 @@
+"""
+MOODI Engine - Batch fan-out
+Bounded-concurrency fan-out that dedupes identical items and yields results as they complete
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+
+async def fan_out(
+    items: Sequence[Any],
+    worker: Callable[[Any], Awaitable[Any]],
+    key: Optional[Callable[[Any], Hashable]] = None,
+    max_concurrency: int = 16,
+) -> AsyncIterator[Tuple[int, Any, Optional[Exception]]]:
+    """
+    Run `worker` over `items` with at most `max_concurrency` calls in flight
+
+    Items with the same `key` are processed once and the result is reported
+    for every index that carried them.
+
+    Yields:
+        (index, value, error) tuples in completion order; `error` is the
+        exception raised by the worker, or None on success
+    """
+    groups: Dict[Hashable, List[int]] = {}
+    unique: List[Tuple[Hashable, Any]] = []
+    for index, item in enumerate(items):
+        item_key = key(item) if key is not None else index
+        if item_key not in groups:
+            groups[item_key] = []
+            unique.append((item_key, item))
+        groups[item_key].append(index)
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(item_key: Hashable, item: Any):
+        async with semaphore:
+            try:
+                return item_key, await worker(item), None
+            except Exception as e:
+                return item_key, None, e
+
+    tasks = [asyncio.create_task(run(item_key, item)) for item_key, item in unique]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item_key, value, error = await next_done
+            for index in groups[item_key]:
+                yield index, value, error
+    finally:
+        # Client went away or the consumer stopped early
+        for task in tasks:
+            task.cancel()
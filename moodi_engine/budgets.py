@@ -0,0 +1,139 @@
+"""
+MOODI Engine - Token budgets
+max_tokens per endpoint and locale, computed from the output schemas
+
+Every output is bounded by its schema (360-char reflection, 80-char
+notification, 72-char caption), so a completion that runs past the schema's
+size in tokens is only producing text we would trim or reject. The budget is
+the schema's worst-case size in tokens for the locale's script, times a
+headroom factor. Arabic script packs fewer characters per token than Latin,
+so ar/ar-darija get larger budgets.
+
+MOODI_MAX_TOKENS_<ENDPOINT> overrides the computed budget (0 disables it),
+MOODI_TOKEN_BUDGETS=0 turns budgets off altogether.
+"""
+
+import functools
+import math
+import os
+from typing import Any, Dict, Optional
+
+from moodi_engine.structured import OUTPUT_SCHEMAS
+
+TOKEN_BUDGETS = os.getenv("MOODI_TOKEN_BUDGETS", "1") == "1"
+HEADROOM = float(os.getenv("MOODI_TOKEN_BUDGET_HEADROOM", "1.5"))
+
+# Characters per token of model-written text, by locale (conservative ends of
+# what the gpt-4.1 tokenizer does on our copy; emojis and Darija in Arabic
+# script are the expensive cases)
+CHARS_PER_TOKEN = {"en": 4.0, "fr": 3.4, "ar": 2.0, "ar-darija": 2.4}
+# Keys, enum values and JSON punctuation are ASCII
+SYNTAX_CHARS_PER_TOKEN = 3.5
+
+# Assumed sizes where the schema sets no maxLength
+DEFAULT_STRING_CHARS = 80
+DEFAULT_ITEM_CHARS = 24
+DEFAULT_ARRAY_ITEMS = 8
+
+MIN_BUDGET = 16
+
+# Endpoints whose output shares another endpoint's schema
+_SCHEMA_ALIASES = {"reflection_repair": "reflection"}
+
+
+def _estimate(schema: Dict[str, Any], chars_per_token: float, items: int, item: bool = False) -> float:
+    """Worst-case tokens of a value matching `schema`"""
+    kind = schema.get("type")
+    if kind == "object":
+        return 1 + sum(
+            (len(field) + 4) / SYNTAX_CHARS_PER_TOKEN + _estimate(subschema, chars_per_token, items)
+            for field, subschema in schema.get("properties", {}).items()
+        )
+    if kind == "array":
+        count = schema.get("maxItems") or items
+        return 1 + count * (1 + _estimate(schema.get("items", {}), chars_per_token, items, item=True))
+    if kind == "string":
+        if "enum" in schema:
+            return 1 + max(len(value) for value in schema["enum"]) / SYNTAX_CHARS_PER_TOKEN
+        chars = schema.get("maxLength") or (DEFAULT_ITEM_CHARS if item else DEFAULT_STRING_CHARS)
+        return 1 + chars / chars_per_token
+    return 4
+
+
+def token_budget(
+    endpoint: str,
+    user_locale: Optional[str] = None,
+    headroom: Optional[float] = None,
+    items: int = DEFAULT_ARRAY_ITEMS,
+) -> Optional[int]:
+    """
+    max_tokens for one call
+
+    Args:
+        endpoint: Engine endpoint name
+        user_locale: Locale of the output; None assumes the most expensive one
+        headroom: Multiplier over the worst-case size (default HEADROOM)
+        items: Assumed length of arrays without maxItems (e.g. catalog variants)
+
+    Returns:
+        Token budget, or None when budgets are off or the endpoint has no schema
+    """
+    override = os.getenv(f"MOODI_MAX_TOKENS_{endpoint.upper()}")
+    if override is not None:
+        return int(override) or None
+    if not TOKEN_BUDGETS:
+        return None
+    return _computed_budget(endpoint, user_locale, headroom or HEADROOM, items)
+
+
+@functools.lru_cache(maxsize=256)
+def _computed_budget(endpoint: str, user_locale: Optional[str], headroom: float, items: int) -> Optional[int]:
+    output_schema = OUTPUT_SCHEMAS.get(_SCHEMA_ALIASES.get(endpoint, endpoint))
+    if output_schema is None:
+        return None
+    chars_per_token = CHARS_PER_TOKEN.get(user_locale, min(CHARS_PER_TOKEN.values()))
+    tokens = _estimate(output_schema.schema, chars_per_token, items) * headroom
+    # Round up to a multiple of 8 so small schema edits do not churn the number
+    return max(MIN_BUDGET, int(math.ceil(tokens / 8) * 8))
+
+
+def budget_table(headroom: Optional[float] = None) -> Dict[str, Dict[str, Optional[int]]]:
+    """Budget per endpoint and locale, for /api/metrics and tuning"""
+    return {
+        endpoint: {locale: token_budget(endpoint, locale, headroom) for locale in CHARS_PER_TOKEN}
+        for endpoint in list(OUTPUT_SCHEMAS) + list(_SCHEMA_ALIASES)
+    }
+
+
+# ============================================================================
+# Streaming limits
+# ============================================================================
+
+# A streamed field is cut off once it runs this far past its schema limit;
+# the repair stage trims what was received and re-asks for the rest
+STREAM_ABORT_RATIO = float(os.getenv("MOODI_STREAM_ABORT_RATIO", "1.25"))
+
+
+def stream_limits(schema: Dict[str, Any], ratio: float = STREAM_ABORT_RATIO) -> Dict[str, int]:
+    """
+    Raw-character limits per top-level field for IncrementalJSONObjectParser
+
+    Strings are limited to maxLength (or DEFAULT_STRING_CHARS, or the longest
+    enum value) times `ratio`, arrays to maxItems items of DEFAULT_ITEM_CHARS;
+    "*" bounds the whole object, so unknown keys cannot run on either.
+    """
+    limits: Dict[str, int] = {}
+    for field, subschema in schema.get("properties", {}).items():
+        kind = subschema.get("type")
+        if kind == "string" and "enum" in subschema:
+            chars = max(len(value) for value in subschema["enum"]) + 2
+        elif kind == "string":
+            chars = subschema.get("maxLength") or DEFAULT_STRING_CHARS
+        elif kind == "array":
+            count = subschema.get("maxItems") or DEFAULT_ARRAY_ITEMS
+            chars = count * (DEFAULT_ITEM_CHARS + 4)
+        else:
+            continue
+        limits[field] = int(chars * ratio)
+    limits["*"] = sum(limits.values()) + sum(len(field) + 6 for field in limits)
+    return limits
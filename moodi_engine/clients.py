@@ -0,0 +1,91 @@
+"""
+MOODI Engine - OpenAI clients
+Lazily created, process-wide clients backed by shared HTTP connection pools
+
+The openai and httpx packages are only imported when a client is first
+needed, so importing the engine (and cold-starting the API) stays cheap.
+"""
+
+import os
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+# Connection pool sizing (per worker process)
+MAX_CONNECTIONS = int(os.getenv("MOODI_OPENAI_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("MOODI_OPENAI_MAX_KEEPALIVE", "20"))
+
+_client: Optional["OpenAI"] = None
+_async_client: Optional["AsyncOpenAI"] = None
+
+
+# Retries are owned by moodi_engine.resilience; client-level retries would multiply them
+MAX_RETRIES = 0
+
+
+def _pool_settings():
+    import httpx
+
+    limits = httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+    )
+    return limits, httpx.Timeout(60.0, connect=5.0)
+
+
+def get_client() -> "OpenAI":
+    """Return the shared synchronous OpenAI client, creating it on first use"""
+    global _client
+    if _client is None:
+        import httpx
+        from openai import OpenAI
+
+        limits, timeout = _pool_settings()
+        _client = OpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            max_retries=MAX_RETRIES,
+            http_client=httpx.Client(limits=limits, timeout=timeout)
+        )
+    return _client
+
+
+def set_client(client: Optional["OpenAI"]) -> None:
+    """Replace the shared synchronous client (used by benchmarks and local stand-ins)"""
+    global _client
+    _client = client
+
+
+def get_async_client() -> "AsyncOpenAI":
+    """
+    Return the shared AsyncOpenAI client, creating it on first use
+
+    All async endpoints go through this client so they share one
+    keep-alive connection pool instead of opening a socket per request.
+    """
+    global _async_client
+    if _async_client is None:
+        import httpx
+        from openai import AsyncOpenAI
+
+        limits, timeout = _pool_settings()
+        _async_client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            max_retries=MAX_RETRIES,
+            http_client=httpx.AsyncClient(limits=limits, timeout=timeout)
+        )
+    return _async_client
+
+
+def set_async_client(client: Optional["AsyncOpenAI"]) -> None:
+    """Replace the shared async client (used by benchmarks and local stand-ins)"""
+    global _async_client
+    _async_client = client
+
+
+async def aclose_async_client() -> None:
+    """Close the shared async client and release its connection pool"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
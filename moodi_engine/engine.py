@@ -0,0 +1,257 @@
+"""
+MOODI Engine - Completion calls
+JSON completions on top of the shared clients (blocking and non-blocking)
+
+Every call records its token usage and latency in `usage_tracker` under the
+given endpoint name, and runs under that endpoint's deadline, retry, hedging
+and circuit-breaker policy (moodi_engine.resilience). The response format
+(json_object or a strict json_schema) is chosen per endpoint by
+moodi_engine.structured, which also counts invalid outputs per mode. The
+clients come from the endpoint's backend (moodi_engine.backends).
+
+max_tokens defaults to the endpoint's budget (moodi_engine.budgets) for its
+most expensive locale; callers that know the locale pass a tighter one.
+"""
+
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from moodi_engine.backends import backend_for, record_response
+from moodi_engine.budgets import token_budget
+from moodi_engine.metrics import extract_usage, usage_tracker
+from moodi_engine.resilience import resilience
+from moodi_engine.structured import is_unsupported_error, structured_outputs
+from moodi_engine.validation import loads
+
+DEFAULT_MODEL = "gpt-4.1-mini"
+
+
+def _request_kwargs(
+    system_prompt: str, user_prompt: str, temperature: float, model: str, endpoint: str, max_tokens: Optional[int]
+) -> Dict[str, Any]:
+    # The system message always comes first and is byte-identical across
+    # calls, so the upstream prompt cache can reuse it
+    messages: List[Dict[str, str]] = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    kwargs = {
+        "model": model,
+        "temperature": temperature,
+        "response_format": structured_outputs.response_format(endpoint, model),
+        "messages": messages
+    }
+    if max_tokens is None:
+        max_tokens = token_budget(endpoint)
+    if max_tokens is not None:
+        kwargs["max_tokens"] = max_tokens
+    return kwargs
+
+
+def _downgrade(error: Exception, mode: str, endpoint: str, kwargs: Dict[str, Any]) -> bool:
+    """
+    Whether a failed request should be sent again as json_object
+
+    True when the model rejected a strict schema: the model is marked as not
+    supporting strict schemas and `kwargs` switches to its json_object format.
+    """
+    if mode != "strict" or not is_unsupported_error(error):
+        return False
+    structured_outputs.mark_unsupported(kwargs["model"], error)
+    kwargs["response_format"] = structured_outputs.response_format(endpoint, kwargs["model"])
+    return True
+
+
+def _finish_reason(response: Any) -> Optional[str]:
+    choices = getattr(response, "choices", None)
+    return getattr(choices[0], "finish_reason", None) if choices else None
+
+
+def _decode(endpoint: str, mode: str, content: str) -> Dict[str, Any]:
+    record_response(endpoint, content)
+    try:
+        data = loads(content)
+    except ValueError:
+        structured_outputs.record_unparseable(endpoint, mode)
+        raise
+    structured_outputs.record_output(endpoint, mode, data)
+    return data
+
+
+def complete(
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float = 0.7,
+    model: str = DEFAULT_MODEL,
+    endpoint: str = "default",
+    max_tokens: Optional[int] = None,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """
+    Run a JSON-mode chat completion on the shared synchronous client
+
+    Returns:
+        Tuple of (parsed JSON object, token usage dict with prompt_tokens,
+        cached_tokens and completion_tokens)
+
+    Raises:
+        UpstreamUnavailable: Deadline/retries exhausted or circuit open
+    """
+    started = time.perf_counter()
+    backend = backend_for(endpoint)
+    mode = structured_outputs.mode_for(endpoint, model)
+    kwargs = _request_kwargs(system_prompt, user_prompt, temperature, model, endpoint, max_tokens)
+    try:
+        response = resilience.call(
+            endpoint, lambda timeout: backend.client().chat.completions.create(**kwargs, timeout=timeout)
+        )
+    except Exception as e:
+        if not _downgrade(e, mode, endpoint, kwargs):
+            raise
+        mode = "json_object"
+        response = resilience.call(
+            endpoint, lambda timeout: backend.client().chat.completions.create(**kwargs, timeout=timeout)
+        )
+    usage = extract_usage(response)
+    stop = "length" if _finish_reason(response) == "length" else None
+    usage_tracker.record(endpoint, usage, (time.perf_counter() - started) * 1000, stop)
+    return _decode(endpoint, mode, response.choices[0].message.content), usage
+
+
+def complete_json(
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float = 0.7,
+    model: str = DEFAULT_MODEL,
+    endpoint: str = "default",
+    max_tokens: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Run a JSON-mode chat completion and return only the parsed object"""
+    return complete(system_prompt, user_prompt, temperature, model, endpoint, max_tokens)[0]
+
+
+async def acomplete(
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float = 0.7,
+    model: str = DEFAULT_MODEL,
+    endpoint: str = "default",
+    max_tokens: Optional[int] = None,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """
+    Run a JSON-mode chat completion without blocking the event loop
+
+    Args:
+        system_prompt: System message content
+        user_prompt: User message content
+        temperature: Sampling temperature
+        model: Model name
+        endpoint: Name the usage is recorded under
+        max_tokens: Completion token cap (None: the endpoint's budget)
+
+    Returns:
+        Tuple of (parsed JSON object, token usage dict)
+
+    Raises:
+        UpstreamUnavailable: Deadline/retries exhausted or circuit open
+    """
+    started = time.perf_counter()
+    backend = backend_for(endpoint)
+    mode = structured_outputs.mode_for(endpoint, model)
+    kwargs = _request_kwargs(system_prompt, user_prompt, temperature, model, endpoint, max_tokens)
+    try:
+        response = await resilience.acall(
+            endpoint, lambda timeout: backend.async_client().chat.completions.create(**kwargs, timeout=timeout)
+        )
+    except Exception as e:
+        if not _downgrade(e, mode, endpoint, kwargs):
+            raise
+        mode = "json_object"
+        response = await resilience.acall(
+            endpoint, lambda timeout: backend.async_client().chat.completions.create(**kwargs, timeout=timeout)
+        )
+    usage = extract_usage(response)
+    stop = "length" if _finish_reason(response) == "length" else None
+    usage_tracker.record(endpoint, usage, (time.perf_counter() - started) * 1000, stop)
+    return _decode(endpoint, mode, response.choices[0].message.content), usage
+
+
+async def acomplete_json(
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float = 0.7,
+    model: str = DEFAULT_MODEL,
+    endpoint: str = "default",
+    max_tokens: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Non-blocking variant of complete_json"""
+    return (await acomplete(system_prompt, user_prompt, temperature, model, endpoint, max_tokens))[0]
+
+
+async def astream_completion(
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float = 0.7,
+    model: str = DEFAULT_MODEL,
+    endpoint: str = "default",
+    max_tokens: Optional[int] = None,
+) -> AsyncIterator[str]:
+    """
+    Stream a JSON-mode chat completion
+
+    Usage arrives in the final chunk and is recorded once the stream ends.
+    Opening the stream is retried under the endpoint's policy; once output
+    has started, errors are passed to the caller. A stream rejected for its
+    strict schema is reopened as json_object. A caller that stops iterating
+    early (e.g. once the streaming parser's output limits are passed) should aclose()
+    the generator; the upstream stream is then closed so no more tokens are
+    generated.
+
+    Yields:
+        Content deltas as they arrive
+    """
+    started = time.perf_counter()
+    usage: Optional[Dict[str, int]] = None
+    backend = backend_for(endpoint)
+    mode = structured_outputs.mode_for(endpoint, model)
+    kwargs = _request_kwargs(system_prompt, user_prompt, temperature, model, endpoint, max_tokens)
+
+    def open_stream(timeout: float):
+        return backend.async_client().chat.completions.create(
+            **kwargs, stream=True, stream_options={"include_usage": True}, timeout=timeout
+        )
+
+    try:
+        stream = await resilience.acall(endpoint, open_stream)
+    except Exception as e:
+        if not _downgrade(e, mode, endpoint, kwargs):
+            raise
+        mode = "json_object"
+        stream = await resilience.acall(endpoint, open_stream)
+    parts: List[str] = []
+    completed = False
+    stop: Optional[str] = None
+    try:
+        async for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                usage = extract_usage(chunk)
+            if _finish_reason(chunk) == "length":
+                stop = "length"
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+        completed = True
+    finally:
+        if not completed:
+            stop = "aborted"
+            close = getattr(stream, "close", None)
+            if close is not None:
+                try:
+                    await close()
+                except Exception as e:
+                    print(f"Closing {endpoint} stream failed: {e}")
+        usage_tracker.record(endpoint, usage or extract_usage(None), (time.perf_counter() - started) * 1000, stop)
+        if completed:
+            try:
+                _decode(endpoint, mode, "".join(parts))
+            except ValueError:
+                pass
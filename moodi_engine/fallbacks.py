@@ -0,0 +1,93 @@
+"""
+MOODI Engine - Fallback copy
+Template responses served when the model is unavailable (open circuit, deadline exceeded)
+
+Fallback reflections never claim a text is safe without checking: with the
+model unavailable nothing has read the context text, so any mood that has
+one gets the "elevate" template.
+"""
+
+from typing import Any, Dict
+
+_REFLECTIONS = {
+    "en": {
+        "ok": {
+            "reflection_text": "Thank you for checking in. Naming how you feel is already a small act of care for yourself.",
+            "action_suggestion": "Take three slow breaths and notice one thing around you.",
+            "share_caption": "Checking in with myself today.",
+        },
+        "elevate": {
+            "reflection_text": "Thank you for sharing this. What you feel matters, and you don't have to carry it alone.",
+            "action_suggestion": "Please reach out now to someone you trust or your local emergency number.",
+            "share_caption": "Taking a moment for myself.",
+        },
+    },
+    "fr": {
+        "ok": {
+            "reflection_text": "Merci d'avoir pris ce moment. Mettre des mots sur ce que tu ressens, c'est déjà prendre soin de toi.",
+            "action_suggestion": "Prends trois respirations lentes et remarque une chose autour de toi.",
+            "share_caption": "Un moment pour moi aujourd'hui.",
+        },
+        "elevate": {
+            "reflection_text": "Merci de partager cela. Ce que tu ressens compte, et tu n'as pas à le porter seul·e.",
+            "action_suggestion": "Contacte maintenant une personne de confiance ou le numéro d'urgence local.",
+            "share_caption": "Je prends un moment pour moi.",
+        },
+    },
+    "ar": {
+        "ok": {
+            "reflection_text": "شكراً لأنك توقفت لتسأل نفسك عن حالك. التعبير عن مشاعرك هو بداية الاهتمام بنفسك.",
+            "action_suggestion": "خذ ثلاثة أنفاس بطيئة ولاحظ شيئاً واحداً من حولك.",
+            "share_caption": "لحظة صادقة مع نفسي اليوم.",
+        },
+        "elevate": {
+            "reflection_text": "شكراً لمشاركتك هذا. مشاعرك مهمة، ولست مضطراً لحملها وحدك.",
+            "action_suggestion": "تواصل الآن مع شخص تثق به أو مع رقم الطوارئ المحلي.",
+            "share_caption": "أمنح نفسي لحظة.",
+        },
+    },
+    "ar-darija": {
+        "ok": {
+            "reflection_text": "شكراً حيت وقفتي تسول راسك على حالك. تعبر على داكشي لي حاس بيه هي أول خطوة باش تهلا فراسك.",
+            "action_suggestion": "خود تلاتة د النفس بشوية وشوف حاجة وحدة دايرة بيك.",
+            "share_caption": "لحظة مع راسي اليوم.",
+        },
+        "elevate": {
+            "reflection_text": "شكراً حيت شاركتي هادشي. داكشي لي حاس بيه مهم، وماشي ضروري تحملو بوحدك.",
+            "action_suggestion": "تاصل دابا بشي حد كتيق فيه ولا بنمرة الطوارئ.",
+            "share_caption": "كنعطي لراسي لحظة.",
+        },
+    },
+}
+
+_CAPTIONS = {
+    "en": "Check out MOODI!",
+    "fr": "Découvre MOODI !",
+    "ar": "اكتشف MOODI!",
+    "ar-darija": "جرب MOODI!",
+}
+
+FALLBACK_NOTIFICATION = {"title": "MOODI", "body": "How are you feeling today?"}
+
+
+def fallback_reflection(mood_payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Template reflection in the payload's locale
+
+    Returns:
+        Dict matching RESPONSE_SCHEMA; safety_flag is "elevate" unless the
+        context text is empty
+    """
+    context_text = mood_payload.get("context_text") or ""
+    safety_flag = "elevate" if context_text.strip() else "ok"
+    copy = _REFLECTIONS.get(mood_payload.get("user_locale"), _REFLECTIONS["en"])[safety_flag]
+    return {
+        **copy,
+        "soundtrack_hint": "soft ambient",
+        "tags": ["check-in", mood_payload.get("time_bucket") or "today", "self-care"],
+        "safety_flag": safety_flag
+    }
+
+
+def fallback_caption(user_locale: str) -> str:
+    return _CAPTIONS.get(user_locale, _CAPTIONS["en"])
@@ -0,0 +1,201 @@
+"""
+MOODI Engine - Gamification
+Unlock catalog and vectorized replay of whole mood histories
+
+replay_moods() is used when reward rules change: the full history is replayed
+from a zero state with sorting and run-length logic instead of one Python call
+per mood. The rules match GamificationEngine and the apply_mood_gamification()
+trigger: one daily reward per posting day, streaks over consecutive days, and
+a bonus whenever the streak reaches a multiple of the bonus interval.
+
+NumPy is an optional dependency and is imported on first use.
+"""
+
+import json
+import os
+from bisect import bisect_right
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+# Inserts only the unlocks the user does not have yet; RETURNING reports them
+UPSERT_UNLOCKS_SQL = """
+INSERT INTO public.user_unlocks (user_id, unlock_type)
+SELECT %s::uuid, unnest(%s::text[])
+ON CONFLICT (user_id, unlock_type) DO NOTHING
+RETURNING unlock_type
+"""
+
+
+# ============================================================================
+# Unlock Catalog
+# ============================================================================
+
+class UnlockCatalog:
+    """Unlock types held in ascending coin-threshold order for bisect lookups"""
+
+    def __init__(self, unlocks: Iterable[Tuple[str, int]]):
+        ordered = sorted(unlocks, key=lambda unlock: (unlock[1], unlock[0]))
+        self.unlock_types: List[str] = [unlock_type for unlock_type, _ in ordered]
+        self.thresholds: List[int] = [int(threshold) for _, threshold in ordered]
+        if len(set(self.unlock_types)) != len(self.unlock_types):
+            raise ValueError("Unlock types must be unique")
+
+    @classmethod
+    def from_file(cls, path: str) -> "UnlockCatalog":
+        """Load a JSON list of {"unlock_type": ..., "threshold": ...} entries"""
+        with open(path, encoding="utf-8") as handle:
+            entries = json.load(handle)
+        return cls((entry["unlock_type"], entry["threshold"]) for entry in entries)
+
+    def __len__(self) -> int:
+        return len(self.unlock_types)
+
+    def items(self) -> List[Tuple[str, int]]:
+        return list(zip(self.unlock_types, self.thresholds))
+
+    def reached(self, coins: int) -> List[str]:
+        """All unlocks with a threshold at or below `coins`"""
+        return self.unlock_types[:bisect_right(self.thresholds, coins)]
+
+    def crossed(self, previous_coins: int, coins: int) -> List[str]:
+        """
+        Unlocks whose threshold lies in (previous_coins, coins]
+
+        A balance that drops and climbs back reports the same unlock again;
+        record_unlocks() keeps the stored result idempotent.
+        """
+        low = bisect_right(self.thresholds, previous_coins)
+        return self.unlock_types[low:max(low, bisect_right(self.thresholds, coins))]
+
+
+# Default catalog; MOODI_UNLOCK_CATALOG points to a JSON file that replaces it
+DEFAULT_UNLOCKS = [("custom_gradient", 50), ("voice_reflection", 120)]
+
+unlock_catalog = (
+    UnlockCatalog.from_file(os.environ["MOODI_UNLOCK_CATALOG"])
+    if os.getenv("MOODI_UNLOCK_CATALOG")
+    else UnlockCatalog(DEFAULT_UNLOCKS)
+)
+
+
+def record_unlocks(conn, user_id: str, unlock_types: Sequence[str]) -> List[str]:
+    """
+    Write unlocks to user_unlocks in one idempotent upsert
+
+    Args:
+        conn: psycopg2 connection (the caller owns the transaction)
+        user_id: User UUID
+        unlock_types: Unlock types to grant
+
+    Returns:
+        Unlock types that were not stored before
+    """
+    if not unlock_types:
+        return []
+    with conn.cursor() as cur:
+        cur.execute(UPSERT_UNLOCKS_SQL, (user_id, list(unlock_types)))
+        return [record[0] for record in cur.fetchall()]
+
+
+# ============================================================================
+# History Replay
+# ============================================================================
+
+def _posting_days(user_ids, mood_dates) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """Unique users plus (user index, day number) of each distinct posting day, sorted"""
+    import numpy as np
+
+    if len(user_ids) != len(mood_dates):
+        raise ValueError("user_ids and mood_dates must have the same length")
+    users, codes = np.unique(np.asarray(user_ids), return_inverse=True)
+    days = np.asarray(mood_dates, dtype="datetime64[D]").astype(np.int64)
+    order = np.lexsort((days, codes))
+    codes, days = codes[order], days[order]
+
+    # Several moods on one day count once
+    keep = np.ones(len(days), dtype=bool)
+    keep[1:] = (codes[1:] != codes[:-1]) | (days[1:] != days[:-1])
+    return users, codes[keep], days[keep]
+
+
+def replay_moods(
+    user_ids: Sequence[Any],
+    mood_dates: Sequence[Any],
+    daily_coins: int = 5,
+    streak_bonus_coins: int = 5,
+    streak_bonus_interval: int = 3,
+    unlocks: Sequence[Tuple[str, int]] = (),
+) -> Dict[str, "np.ndarray"]:
+    """
+    Replay a mood history from a zero state
+
+    Args:
+        user_ids: One user id per mood (any hashable dtype NumPy can sort)
+        mood_dates: One date per mood (date, datetime64 or ISO string); order does not matter
+        daily_coins: Coins for each posting day
+        streak_bonus_coins: Coins when the streak reaches a multiple of the interval
+        streak_bonus_interval: Streak length between bonuses
+        unlocks: (unlock_type, coin_threshold) pairs
+
+    Returns:
+        Dict of arrays:
+            users: distinct user ids; the *_index arrays below point into it
+            day_user_index, day_date, day_streak, day_coins, day_balance:
+                one entry per posting day, sorted by user then date
+            final_streak, last_mood_date, total_coins: one entry per user
+            unlock_user_index, unlock_type, unlock_date: one entry per unlock event
+    """
+    import numpy as np
+
+    users, codes, days = _posting_days(user_ids, mood_dates)
+    count = len(days)
+    positions = np.arange(count)
+
+    first_of_user = np.ones(count, dtype=bool)
+    first_of_user[1:] = codes[1:] != codes[:-1]
+    run_start = first_of_user.copy()
+    run_start[1:] |= days[1:] - days[:-1] != 1
+
+    # Streak = position within the run of consecutive days, starting at 1
+    run_start_position = np.maximum.accumulate(np.where(run_start, positions, 0))
+    streak = positions - run_start_position + 1
+
+    coins = np.full(count, daily_coins, dtype=np.int64)
+    coins += np.where(streak % streak_bonus_interval == 0, streak_bonus_coins, 0)
+
+    # Per-user running balance: global cumsum minus the total before the user's first day
+    running = np.cumsum(coins)
+    user_start = np.flatnonzero(first_of_user)
+    before_user = running[user_start] - coins[user_start]
+    balance = running - np.repeat(before_user, np.diff(np.append(user_start, count)))
+
+    # Each day unlocks every threshold in (previous balance, balance]
+    unlocks = sorted(unlocks, key=lambda unlock: unlock[1])
+    thresholds = np.array([threshold for _, threshold in unlocks], dtype=np.int64)
+    unlock_types = np.array([unlock_type for unlock_type, _ in unlocks], dtype=object)
+    previous_balance = balance - coins
+    low = np.searchsorted(thresholds, previous_balance, side="right")
+    high = np.searchsorted(thresholds, balance, side="right")
+    crossed = high - low
+    event_day = np.repeat(positions, crossed)
+    event_offset = np.arange(crossed.sum()) - np.repeat(np.cumsum(crossed) - crossed, crossed)
+    event_unlock = np.repeat(low, crossed) + event_offset
+
+    user_end = np.append(user_start[1:], count)[:len(user_start)] - 1
+    return {
+        "users": users,
+        "day_user_index": codes,
+        "day_date": days.astype("datetime64[D]"),
+        "day_streak": streak,
+        "day_coins": coins,
+        "day_balance": balance,
+        "final_streak": streak[user_end],
+        "last_mood_date": days[user_end].astype("datetime64[D]"),
+        "total_coins": balance[user_end],
+        "unlock_user_index": codes[event_day],
+        "unlock_type": unlock_types[event_unlock],
+        "unlock_date": days[event_day].astype("datetime64[D]"),
+    }
@@ -0,0 +1,145 @@
+"""
+MOODI Engine - Metrics
+Per-endpoint token usage and latency counters
+"""
+
+import bisect
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+# Latency samples kept per endpoint for percentiles
+LATENCY_WINDOW = 1024
+
+# Upper bounds of the completion-token histogram buckets (plus one overflow
+# bucket), to compare what endpoints actually write with their budgets
+COMPLETION_TOKEN_BUCKETS = (16, 32, 64, 128, 192, 256, 384, 512, 768, 1024)
+
+# USD per 1M tokens: (input, cached input, output). Unknown models cost 0.
+MODEL_PRICES = {
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+}
+
+
+def extract_usage(response: Any) -> Dict[str, int]:
+    """
+    Pull token usage out of a chat completion (or final stream chunk)
+
+    Returns:
+        Dictionary with prompt_tokens, cached_tokens and completion_tokens
+        (zeros when the response carries no usage)
+    """
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {"prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": usage.prompt_tokens or 0,
+        "cached_tokens": (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0,
+        "completion_tokens": usage.completion_tokens or 0
+    }
+
+
+def estimate_cost(model: str, usage: Dict[str, int]) -> float:
+    """Approximate USD cost of one call from its token usage"""
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return 0.0
+    input_price, cached_price, output_price = prices
+    uncached = usage["prompt_tokens"] - usage["cached_tokens"]
+    return (
+        uncached * input_price + usage["cached_tokens"] * cached_price + usage["completion_tokens"] * output_price
+    ) / 1_000_000
+
+
+def _percentile(samples, fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class UsageTracker:
+    """Thread-safe per-endpoint accumulator for token usage and call latency"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, Dict[str, Any]] = {}
+
+    def record(
+        self, endpoint: str, usage: Dict[str, int], latency_ms: float, stop: Optional[str] = None
+    ) -> None:
+        """
+        Args:
+            endpoint: Endpoint name
+            usage: Token usage of the call
+            latency_ms: Call latency
+            stop: "length" when the output hit max_tokens, "aborted" when a
+                stream was cut off early; None for a normal finish
+        """
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = {
+                    "calls": 0,
+                    "prompt_tokens": 0,
+                    "cached_tokens": 0,
+                    "completion_tokens": 0,
+                    "completion_histogram": [0] * (len(COMPLETION_TOKEN_BUCKETS) + 1),
+                    "completion_samples": deque(maxlen=LATENCY_WINDOW),
+                    "length": 0,
+                    "aborted": 0,
+                    "latencies_ms": deque(maxlen=LATENCY_WINDOW)
+                }
+            stats["calls"] += 1
+            stats["prompt_tokens"] += usage["prompt_tokens"]
+            stats["cached_tokens"] += usage["cached_tokens"]
+            stats["completion_tokens"] += usage["completion_tokens"]
+            stats["latencies_ms"].append(latency_ms)
+            if stop is not None:
+                stats[stop] += 1
+            # Calls without a model completion (cache/template serves, aborted
+            # streams) carry no token count to bucket
+            if usage["completion_tokens"]:
+                bucket = bisect.bisect_left(COMPLETION_TOKEN_BUCKETS, usage["completion_tokens"])
+                stats["completion_histogram"][bucket] += 1
+                stats["completion_samples"].append(usage["completion_tokens"])
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Totals, cached-prompt ratio, completion-token histogram and latency percentiles per endpoint"""
+        labels = [f"<={bound}" for bound in COMPLETION_TOKEN_BUCKETS] + [f">{COMPLETION_TOKEN_BUCKETS[-1]}"]
+        with self._lock:
+            result = {}
+            for endpoint, stats in self._endpoints.items():
+                latencies = list(stats["latencies_ms"])
+                completions = list(stats["completion_samples"])
+                result[endpoint] = {
+                    "calls": stats["calls"],
+                    "prompt_tokens": stats["prompt_tokens"],
+                    "cached_tokens": stats["cached_tokens"],
+                    "completion_tokens": stats["completion_tokens"],
+                    "cached_prompt_ratio": (
+                        stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0
+                    ),
+                    "completion_tokens_histogram": {
+                        label: count for label, count in zip(labels, stats["completion_histogram"]) if count
+                    },
+                    "completion_tokens_p50": _percentile(completions, 0.50),
+                    "completion_tokens_p95": _percentile(completions, 0.95),
+                    "stopped_at_max_tokens": stats["length"],
+                    "streams_aborted": stats["aborted"],
+                    "latency_p50_ms": _percentile(latencies, 0.50),
+                    "latency_p95_ms": _percentile(latencies, 0.95)
+                }
+            return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+
+# Process-wide tracker fed by moodi_engine.engine
+usage_tracker = UsageTracker()
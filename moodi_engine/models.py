@@ -0,0 +1,92 @@
+"""
+MOODI Engine - Models
+Request/response models shared by the FastAPI apps
+"""
+
+from typing import Optional, Literal
+
+from pydantic import BaseModel, Field
+
+
+class MoodPayload(BaseModel):
+    """Mood submission payload"""
+    mood_emoji: str = Field(..., description="Emoji representing the mood")
+    mood_color: str = Field(..., description="Hex color code for the mood")
+    intensity_0_10: int = Field(..., ge=0, le=10, description="Mood intensity from 0-10")
+    context_text: Optional[str] = Field(None, description="Optional context or note")
+    media_present: bool = Field(default=False, description="Whether media is attached")
+    time_bucket: Literal["morning", "afternoon", "evening", "late-night"] = Field(..., description="Time of day")
+    geo_hint: Optional[str] = Field(None, description="City or country hint")
+    user_locale: Literal["ar", "ar-darija", "fr", "en"] = Field(..., description="User's language/locale")
+    user_age_bucket: Literal["teen", "young-adult", "adult", "senior"] = Field(..., description="User's age group")
+    user_id: Optional[str] = Field(
+        None,
+        pattern=r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$",
+        description="User UUID; when set and a store is configured, the submission is persisted "
+                    "(requires a bearer access token for the same user)"
+    )
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "mood_emoji": "😌",
+                "mood_color": "#7FD1AE",
+                "intensity_0_10": 4,
+                "context_text": "petite promenade au bord de mer",
+                "media_present": True,
+                "time_bucket": "evening",
+                "geo_hint": "Casablanca",
+                "user_locale": "fr",
+                "user_age_bucket": "adult"
+            }
+        }
+
+
+class SubmissionResult(BaseModel):
+    """Stored submission with the user's updated gamification state"""
+    mood_id: str
+    streak_days: int
+    moodcoins: int
+    coins_awarded: int
+    new_unlocks: list[str]
+
+
+class ReflectionResponse(BaseModel):
+    """AI-generated reflection response"""
+    reflection_text: str = Field(..., max_length=360)
+    action_suggestion: str = Field(..., max_length=120)
+    share_caption: str = Field(..., max_length=90)
+    soundtrack_hint: str
+    tags: list[str] = Field(..., min_length=3, max_length=6)
+    safety_flag: Literal["ok", "elevate"]
+    submission: Optional[SubmissionResult] = None
+
+
+class BatchReflectionRequest(BaseModel):
+    """Batch of mood submissions (history import / backfill)"""
+    moods: list[MoodPayload] = Field(..., min_length=1, max_length=1000)
+
+
+class NotificationRequest(BaseModel):
+    """Notification generation request"""
+    user_locale: Literal["ar", "ar-darija", "fr", "en"]
+    theme: Literal["gentle_reminder", "streak_nudge", "evening_checkin", "milestone"]
+    days_streak: int = Field(default=0, ge=0)
+
+
+class NotificationResponse(BaseModel):
+    """Notification copy response"""
+    title: str = Field(..., max_length=80)
+    body: str = Field(..., max_length=80)
+
+
+class ReferralCaptionRequest(BaseModel):
+    """Referral caption generation request"""
+    user_locale: Literal["ar", "ar-darija", "fr", "en"]
+    mood_emoji: str
+    benefit: str = Field(default="Track your mood, get a tiny AI nudge")
+
+
+class ReferralCaptionResponse(BaseModel):
+    """Referral caption response"""
+    caption: str = Field(..., max_length=72)  # 12 words * 6 chars average
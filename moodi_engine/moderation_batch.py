@@ -0,0 +1,155 @@
+"""
+MOODI Engine - Moderation batching
+Coalesces concurrent moderation checks into array-input moderations.create calls
+
+Callers block on check(text) as before. A dispatcher thread collects texts
+for up to max_wait_ms (or until max_batch texts are queued), sends them as one
+request and hands each caller its own result. Batches are sent from a small
+pool, so a slow request does not hold up collecting the next batch.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from moodi_engine.backends import backend_for
+from moodi_engine.resilience import UpstreamUnavailable, resilience
+
+MODERATION_BATCHING = os.getenv("MOODI_MODERATION_BATCH", "1") == "1"
+
+
+def _create_with_shared_client(texts: List[str]) -> List[Any]:
+    return resilience.call(
+        "moderation", lambda timeout: backend_for("moderation").client().moderations.create(input=texts, timeout=timeout).results
+    )
+
+
+class ModerationBatcher:
+    """
+    Micro-batching front for the moderation endpoint
+
+    Args:
+        create: Callable taking a list of texts and returning one result per
+            text, in order (defaults to moderations.create on the moderation backend)
+        max_batch: Most texts per request
+        max_wait_ms: How long the first text of a batch waits for company
+        max_in_flight: Batches sent concurrently
+    """
+
+    def __init__(
+        self,
+        create: Optional[Callable[[List[str]], List[Any]]] = None,
+        max_batch: int = 32,
+        max_wait_ms: float = 5.0,
+        max_in_flight: int = 4,
+    ):
+        self.create = create or _create_with_shared_client
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000
+        self.max_in_flight = max_in_flight
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._dispatcher: Optional[threading.Thread] = None
+        self._sender: Optional[ThreadPoolExecutor] = None
+        self.metrics = {"texts": 0, "requests": 0, "failed_requests": 0, "timeouts": 0, "max_batch_seen": 0}
+
+    def _ensure_started(self) -> None:
+        if self._dispatcher is not None:
+            return
+        with self._lock:
+            if self._dispatcher is None:
+                self._sender = ThreadPoolExecutor(
+                    max_workers=self.max_in_flight, thread_name_prefix="moodi-moderation"
+                )
+                dispatcher = threading.Thread(target=self._run, name="moodi-moderation-batcher", daemon=True)
+                dispatcher.start()
+                self._dispatcher = dispatcher
+
+    def submit(self, text: str) -> Future:
+        """Queue a text; the future resolves to its moderation result"""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def check(self, text: str, timeout: Optional[float] = None) -> Any:
+        """
+        Moderation result for one text (raises what the batch request raised)
+
+        Args:
+            text: Text to moderate
+            timeout: Longest wait in seconds; defaults to the moderation
+                endpoint's deadline plus the batching window
+
+        Raises:
+            UpstreamUnavailable: No result within `timeout` (e.g. queued
+                behind stuck batches)
+        """
+        if timeout is None:
+            timeout = resilience.policy("moderation").deadline_s + self.max_wait_s
+        try:
+            return self.submit(text).result(timeout)
+        except FuturesTimeoutError:
+            with self._lock:
+                self.metrics["timeouts"] += 1
+            raise UpstreamUnavailable("moderation", f"no batched result within {timeout:.2f}s")
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait_s
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._sender.submit(self._send, batch)
+
+    def _send(self, batch: List[Tuple[str, Future]]) -> None:
+        # Identical texts in one window share a slot in the request
+        slots: Dict[str, int] = {}
+        for text, _ in batch:
+            slots.setdefault(text, len(slots))
+        with self._lock:
+            self.metrics["texts"] += len(batch)
+            self.metrics["requests"] += 1
+            self.metrics["max_batch_seen"] = max(self.metrics["max_batch_seen"], len(slots))
+
+        try:
+            results = self.create(list(slots))
+            if len(results) != len(slots):
+                raise ValueError(f"moderation returned {len(results)} results for {len(slots)} inputs")
+        except Exception as e:
+            with self._lock:
+                self.metrics["failed_requests"] += 1
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for text, future in batch:
+            future.set_result(results[slots[text]])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = self.metrics["requests"]
+            return {
+                **self.metrics,
+                "mean_batch": self.metrics["texts"] / requests if requests else 0.0,
+                "queued": self._queue.qsize(),
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait_s * 1000
+            }
+
+
+moderation_batcher = ModerationBatcher(
+    max_batch=int(os.getenv("MOODI_MODERATION_MAX_BATCH", "32")),
+    max_wait_ms=float(os.getenv("MOODI_MODERATION_MAX_WAIT_MS", "5")),
+    max_in_flight=int(os.getenv("MOODI_MODERATION_MAX_IN_FLIGHT", "4")),
+)
@@ -0,0 +1,183 @@
+"""
+MOODI Engine - Moderation cache
+Caches moderation and safety-classifier results keyed on a hash of the text
+
+Entries live in a pluggable backend: a bounded in-process LRU by default, or
+Redis (MOODI_MODERATION_CACHE_URL) so all workers share results. Flagged
+results get a shorter TTL so they are re-checked sooner.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def canonical_text(text: str) -> str:
+    """
+    NFC-normalize and collapse whitespace, nothing more
+
+    Case, accents and letter variants are kept: moderation scores the raw
+    text, so only encodings of the same text may share a verdict.
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def text_key(namespace: str, text: str) -> str:
+    """Cache key for `text` in `namespace` (same canonical text -> same key)"""
+    digest = hashlib.sha256(canonical_text(text).encode("utf-8")).hexdigest()
+    return f"moodi:{namespace}:{digest}"
+
+
+# ============================================================================
+# Backends
+# ============================================================================
+
+class CacheBackend:
+    """Interface for string key/value storage with per-entry TTL"""
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """Thread-safe LRU bounded to `max_keys`, per process"""
+
+    def __init__(self, max_keys: int = 50_000, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        with self._lock:
+            self._entries[key] = (self.clock() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend(CacheBackend):
+    """Shared across workers; redis is an optional dependency imported on first use"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self._client = None
+
+    def _redis(self):
+        if self._client is None:
+            import redis
+
+            self._client = redis.Redis.from_url(self.url, decode_responses=True)
+        return self._client
+
+    def get(self, key: str) -> Optional[str]:
+        return self._redis().get(key)
+
+    def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        self._redis().set(key, value, px=int(ttl_seconds * 1000))
+
+    def clear(self) -> None:
+        client = self._redis()
+        for key in client.scan_iter("moodi:*"):
+            client.delete(key)
+
+
+# ============================================================================
+# Cache
+# ============================================================================
+
+class ModerationCache:
+    """
+    Result cache for remote safety checks
+
+    Backend errors count as misses, so an unavailable Redis never blocks a
+    safety check.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl_seconds: float = 24 * 3600, flagged_ttl_seconds: float = 600):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.flagged_ttl_seconds = flagged_ttl_seconds
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, namespace: str, counter: str) -> None:
+        with self._lock:
+            counters = self._counters.setdefault(namespace, {"hits": 0, "misses": 0, "stores": 0, "errors": 0})
+            counters[counter] += 1
+
+    def get(self, namespace: str, text: str) -> Optional[Any]:
+        """Cached result for `text`, or None"""
+        try:
+            value = self.backend.get(text_key(namespace, text))
+        except Exception as e:
+            print(f"Moderation cache read failed: {e}")
+            self._count(namespace, "errors")
+            value = None
+        self._count(namespace, "misses" if value is None else "hits")
+        return json.loads(value) if value is not None else None
+
+    def put(self, namespace: str, text: str, result: Any, flagged: bool) -> None:
+        """Store a result; flagged results expire after flagged_ttl_seconds"""
+        ttl = self.flagged_ttl_seconds if flagged else self.ttl_seconds
+        try:
+            self.backend.set(text_key(namespace, text), json.dumps(result, ensure_ascii=False), ttl)
+            self._count(namespace, "stores")
+        except Exception as e:
+            print(f"Moderation cache write failed: {e}")
+            self._count(namespace, "errors")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            result = {"backend": type(self.backend).__name__}
+            for namespace, counters in self._counters.items():
+                lookups = counters["hits"] + counters["misses"]
+                result[namespace] = {**counters, "hit_rate": counters["hits"] / lookups if lookups else 0.0}
+            return result
+
+
+def _default_backend() -> CacheBackend:
+    url = os.getenv("MOODI_MODERATION_CACHE_URL")
+    if url:
+        return RedisBackend(url)
+    return MemoryBackend(max_keys=int(os.getenv("MOODI_MODERATION_CACHE_MAX_KEYS", "50000")))
+
+
+moderation_cache = ModerationCache(
+    _default_backend(),
+    ttl_seconds=float(os.getenv("MOODI_MODERATION_CACHE_TTL", str(24 * 3600))),
+    flagged_ttl_seconds=float(os.getenv("MOODI_MODERATION_CACHE_FLAGGED_TTL", "600")),
+)
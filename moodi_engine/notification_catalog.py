@@ -0,0 +1,248 @@
+"""
+MOODI Engine - Notification copy catalog
+Precomputed push-notification copy per (locale, theme, streak band), rotated on read
+
+Build the catalog offline with:
+    python -m moodi_engine.notification_catalog --out moodi_engine/data/notification_catalog.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+LOCALES = ["ar", "ar-darija", "fr", "en"]
+THEMES = ["gentle_reminder", "streak_nudge", "evening_checkin", "milestone"]
+
+# (band name, lowest streak, highest streak)
+STREAK_BANDS = [("0", 0, 0), ("1-2", 1, 2), ("3-6", 3, 6), ("7-13", 7, 13), ("14-29", 14, 29), ("30+", 30, 9999)]
+
+# Copy may contain this literal placeholder; it is replaced with the streak on read
+STREAK_PLACEHOLDER = "{streak}"
+MAX_COPY_LENGTH = 80
+VARIANTS_PER_KEY = 5
+
+DEFAULT_CATALOG_PATH = os.getenv(
+    "MOODI_NOTIFICATION_CATALOG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "notification_catalog.json")
+)
+
+CatalogKey = Tuple[str, str, str]
+
+
+def streak_band(days_streak: int) -> str:
+    """Map a streak count to its band name"""
+    for name, low, high in STREAK_BANDS:
+        if low <= days_streak <= high:
+            return name
+    return STREAK_BANDS[-1][0]
+
+
+def _fits(variant: Dict[str, Any], band: str) -> bool:
+    """True if both fields stay within MAX_COPY_LENGTH for every streak in the band"""
+    longest = str(next(high for name, _, high in STREAK_BANDS if name == band))
+    for field in ("title", "body"):
+        text = variant.get(field)
+        if not isinstance(text, str) or not text.strip():
+            return False
+        if len(text.replace(STREAK_PLACEHOLDER, longest)) > MAX_COPY_LENGTH:
+            return False
+    return True
+
+
+class NotificationCatalog:
+    """
+    In-memory notification copy catalog with round-robin rotation
+
+    Lookups are a dict access plus a string replace. Misses are remembered
+    in `pending` so a CatalogRefresher can fill them in the background.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._entries: Dict[CatalogKey, Dict[str, Any]] = {}
+        self._rotation: Dict[CatalogKey, Any] = {}
+        self._lock = threading.Lock()
+        self.pending = set()
+        self.on_miss: Optional[Callable[[], None]] = None
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_CATALOG_PATH) -> "NotificationCatalog":
+        """Load a catalog file; a missing file gives an empty catalog"""
+        catalog = cls(path)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as handle:
+                data = json.load(handle)
+            for entry in data.get("entries", []):
+                key = (entry["locale"], entry["theme"], entry["band"])
+                catalog.set_variants(key, entry["variants"], entry.get("generated_at"))
+        return catalog
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        with self._lock:
+            entries = [
+                {"locale": key[0], "theme": key[1], "band": key[2],
+                 "generated_at": entry["generated_at"], "variants": entry["variants"]}
+                for key, entry in sorted(self._entries.items())
+            ]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump({"entries": entries}, handle, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def set_variants(self, key: CatalogKey, variants: List[Dict[str, str]], generated_at: Optional[float] = None) -> None:
+        """Replace the variants for a key (invalid or over-long copy is dropped)"""
+        usable = [{"title": v["title"], "body": v["body"]} for v in variants if _fits(v, key[2])]
+        if not usable:
+            return
+        with self._lock:
+            self._entries[key] = {"variants": usable, "generated_at": generated_at or time.time()}
+            self._rotation[key] = itertools.count()
+            self.pending.discard(key)
+
+    def get(self, user_locale: str, theme: str, days_streak: int = 0) -> Optional[Dict[str, str]]:
+        """
+        Return the next copy variant for this locale/theme/streak, or None on a miss
+        """
+        key = (user_locale, theme, streak_band(days_streak))
+        entry = self._entries.get(key)
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+                is_new = key not in self.pending
+                self.pending.add(key)
+            if is_new and self.on_miss is not None:
+                self.on_miss()
+            return None
+
+        self.hits += 1
+        variants = entry["variants"]
+        variant = variants[next(self._rotation[key]) % len(variants)]
+        streak = str(days_streak)
+        return {
+            "title": variant["title"].replace(STREAK_PLACEHOLDER, streak),
+            "body": variant["body"].replace(STREAK_PLACEHOLDER, streak)
+        }
+
+    def pending_keys(self) -> List[CatalogKey]:
+        with self._lock:
+            return list(self.pending)
+
+    def stale_keys(self, max_age_s: float) -> List[CatalogKey]:
+        cutoff = time.time() - max_age_s
+        with self._lock:
+            return [key for key, entry in self._entries.items() if entry["generated_at"] < cutoff]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "keys": len(self._entries),
+            "pending": len(self.pending),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+# ============================================================================
+# Generation
+# ============================================================================
+
+def generate_variants(user_locale: str, theme: str, band: str, count: int = VARIANTS_PER_KEY) -> List[Dict[str, str]]:
+    """Ask the model for `count` copy variants for one catalog key"""
+    from moodi_engine.budgets import token_budget
+    from moodi_engine.engine import complete_json
+    from moodi_engine.prompts import NOTIFICATION_CATALOG_SYSTEM_PROMPT, build_notification_catalog_prompt
+
+    result = complete_json(
+        NOTIFICATION_CATALOG_SYSTEM_PROMPT,
+        build_notification_catalog_prompt(user_locale, theme, band, count),
+        temperature=0.9,
+        endpoint="notification_catalog",
+        max_tokens=token_budget("notification_catalog", user_locale, items=count)
+    )
+    return [v for v in result.get("variants", []) if isinstance(v, dict)]
+
+
+def build_catalog(
+    catalog: NotificationCatalog,
+    generate: Callable[[str, str, str], List[Dict[str, str]]] = generate_variants
+) -> NotificationCatalog:
+    """Fill every (locale, theme, band) key"""
+    for user_locale in LOCALES:
+        for theme in THEMES:
+            for band, _, _ in STREAK_BANDS:
+                try:
+                    catalog.set_variants((user_locale, theme, band), generate(user_locale, theme, band))
+                except Exception as e:
+                    print(f"Catalog generation failed for {user_locale}/{theme}/{band}: {e}")
+    return catalog
+
+
+class CatalogRefresher(threading.Thread):
+    """
+    Background thread that fills missed keys and regenerates stale ones
+
+    Wakes up every `interval_s`, or immediately after a catalog miss.
+    """
+
+    def __init__(
+        self,
+        catalog: NotificationCatalog,
+        interval_s: float = 6 * 3600,
+        max_age_s: float = 24 * 3600,
+        generate: Callable[[str, str, str], List[Dict[str, str]]] = generate_variants
+    ):
+        super().__init__(name="moodi-notification-catalog", daemon=True)
+        self.catalog = catalog
+        self.interval_s = interval_s
+        self.max_age_s = max_age_s
+        self.generate = generate
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        catalog.on_miss = self._wake.set
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            keys = self.catalog.pending_keys() + self.catalog.stale_keys(self.max_age_s)
+            changed = False
+            for key in keys:
+                if self._stopped.is_set():
+                    break
+                try:
+                    self.catalog.set_variants(key, self.generate(*key))
+                    changed = True
+                except Exception as e:
+                    print(f"Catalog refresh failed for {key}: {e}")
+            if changed and self.catalog.path:
+                try:
+                    self.catalog.save()
+                except OSError as e:
+                    print(f"Catalog save failed: {e}")
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+
+
+# Process-wide catalog shared by generate_notification and /api/notification
+notification_catalog = NotificationCatalog.load()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the notification copy catalog offline")
+    parser.add_argument("--out", default=DEFAULT_CATALOG_PATH)
+    args = parser.parse_args()
+
+    built = build_catalog(NotificationCatalog(args.out))
+    built.save()
+    print(json.dumps(built.stats(), indent=2))
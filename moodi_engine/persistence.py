@@ -0,0 +1,365 @@
+"""
+MOODI Engine - Persistence
+Async submission store for the FastAPI apps: asyncpg pool or an in-memory stand-in
+
+Each worker process owns one pool, so the total connection count is
+workers x MOODI_DB_POOL_MAX; size it against the database connection limit.
+Writes use fixed SQL text, which asyncpg prepares once per connection and
+reuses from its statement cache. Behind a transaction-mode pooler (PgBouncer,
+Supabase pooler) set MOODI_DB_STATEMENT_CACHE=0.
+
+asyncpg is an optional dependency and is imported when the pool opens.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from moodi_engine.gamification import unlock_catalog
+from moodi_engine.write_behind import WriteBehindBuffer
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+POOL_MIN_SIZE = int(os.getenv("MOODI_DB_POOL_MIN", "1"))
+POOL_MAX_SIZE = int(os.getenv("MOODI_DB_POOL_MAX", "10"))
+STATEMENT_CACHE_SIZE = int(os.getenv("MOODI_DB_STATEMENT_CACHE", "100"))
+
+# Reflection rows are written behind the response (0 writes them inline)
+REFLECTION_WRITE_BEHIND = os.getenv("MOODI_REFLECTION_WRITE_BEHIND", "1") == "1"
+WRITE_BEHIND_MAX_ROWS = int(os.getenv("MOODI_WRITE_BEHIND_ROWS", "500"))
+WRITE_BEHIND_MAX_DELAY_MS = float(os.getenv("MOODI_WRITE_BEHIND_MS", "250"))
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("MOODI_WRITE_BEHIND_MAX_PENDING", "10000"))
+WRITE_BEHIND_SPILL_DIR = os.getenv(
+    "MOODI_WRITE_BEHIND_SPILL_DIR", os.path.join(tempfile.gettempdir(), "moodi-write-behind")
+)
+
+SUBMIT_MOOD_SQL = """
+SELECT mood_id, streak_days, moodcoins, coins_awarded, new_unlocks
+FROM public.submit_mood($1::uuid, $2::jsonb, $3::jsonb, $4::text[], $5::int[])
+"""
+
+INSERT_REFLECTION_SQL = """
+INSERT INTO public.mood_reflections (mood_id, reflection_text, action_suggestion, share_caption,
+                                     soundtrack_hint, tags, safety_flag)
+VALUES ($1::uuid, $2, $3, $4, $5, $6::text[], $7)
+"""
+
+REFLECTION_COLUMNS = [
+    "mood_id", "reflection_text", "action_suggestion", "share_caption", "soundtrack_hint", "tags", "safety_flag"
+]
+
+UPSERT_UNLOCKS_SQL = """
+INSERT INTO public.user_unlocks (user_id, unlock_type)
+SELECT $1::uuid, unnest($2::text[])
+ON CONFLICT (user_id, unlock_type) DO NOTHING
+RETURNING unlock_type
+"""
+
+
+class UnknownUser(LookupError):
+    """The submitting user has no row in public.users"""
+
+
+# submit_mood() raises no_data_found for a user id without a profile row
+_NO_DATA_FOUND = "P0002"
+
+
+def _reflection_row(mood_id: str, reflection: Dict[str, Any]) -> Tuple:
+    return (
+        mood_id,
+        reflection["reflection_text"],
+        reflection["action_suggestion"],
+        reflection["share_caption"],
+        reflection.get("soundtrack_hint"),
+        list(reflection["tags"]),
+        reflection["safety_flag"]
+    )
+
+
+class _StoreMetrics:
+    """Call counts, errors and latency percentiles per operation"""
+
+    def __init__(self, window: int = 1024):
+        self._lock = threading.Lock()
+        self._window = window
+        self._calls: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._latencies: Dict[str, deque] = {}
+
+    def record(self, operation: str, latency_ms: float, ok: bool = True) -> None:
+        with self._lock:
+            self._calls[operation] = self._calls.get(operation, 0) + 1
+            if not ok:
+                self._errors[operation] = self._errors.get(operation, 0) + 1
+            self._latencies.setdefault(operation, deque(maxlen=self._window)).append(latency_ms)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            result = {}
+            for operation, calls in self._calls.items():
+                latencies = sorted(self._latencies[operation])
+                result[operation] = {
+                    "calls": calls,
+                    "errors": self._errors.get(operation, 0),
+                    "latency_ms_p50": latencies[len(latencies) // 2],
+                    "latency_ms_p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+                }
+            return result
+
+
+# ============================================================================
+# Postgres Store
+# ============================================================================
+
+class PostgresStore:
+    """Submission store on an asyncpg connection pool"""
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int = POOL_MIN_SIZE,
+        max_size: int = POOL_MAX_SIZE,
+        statement_cache_size: int = STATEMENT_CACHE_SIZE,
+    ):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.statement_cache_size = statement_cache_size
+        self._pool = None
+        self.metrics = _StoreMetrics()
+
+    async def open(self) -> None:
+        import asyncpg
+
+        self._pool = await asyncpg.create_pool(
+            self.dsn,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            statement_cache_size=self.statement_cache_size
+        )
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def _run(self, operation: str, method: str, *args, **kwargs):
+        started = time.perf_counter()
+        ok = False
+        try:
+            async with self._pool.acquire() as conn:
+                self.metrics.record("acquire", (time.perf_counter() - started) * 1000)
+                result = await getattr(conn, method)(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            self.metrics.record(operation, (time.perf_counter() - started) * 1000, ok)
+
+    async def submit(
+        self,
+        user_id: str,
+        mood_payload: Dict[str, Any],
+        reflection: Optional[Dict[str, Any]] = None,
+        unlocks: Sequence[Tuple[str, int]] = (),
+    ) -> Dict[str, Any]:
+        """
+        Store a mood (plus reflection and reached unlocks) with submit_mood()
+
+        Returns:
+            Dict with mood_id, streak_days, moodcoins, coins_awarded and new_unlocks
+
+        Raises:
+            UnknownUser: user_id has no profile row
+        """
+        unlocks = unlocks or unlock_catalog.items()
+        try:
+            record = await self._run(
+                "submit", "fetchrow", SUBMIT_MOOD_SQL,
+                user_id,
+                json.dumps(mood_payload, ensure_ascii=False),
+                json.dumps(reflection, ensure_ascii=False) if reflection is not None else None,
+                [unlock_type for unlock_type, _ in unlocks],
+                [threshold for _, threshold in unlocks]
+            )
+        except Exception as e:
+            if getattr(e, "sqlstate", None) == _NO_DATA_FOUND:
+                raise UnknownUser(f"Unknown user {user_id}") from e
+            raise
+        return {
+            "mood_id": str(record["mood_id"]),
+            "streak_days": record["streak_days"],
+            "moodcoins": record["moodcoins"],
+            "coins_awarded": record["coins_awarded"],
+            "new_unlocks": list(record["new_unlocks"])
+        }
+
+    async def insert_reflection(self, mood_id: str, reflection: Dict[str, Any]) -> None:
+        await self._run("insert_reflection", "execute", INSERT_REFLECTION_SQL, *_reflection_row(mood_id, reflection))
+
+    async def insert_reflections(self, rows: List[Dict[str, Any]]) -> None:
+        """COPY a batch of reflection rows ({'mood_id', reflection fields...})"""
+        await self._run(
+            "copy_reflections", "copy_records_to_table", "mood_reflections",
+            schema_name="public",
+            columns=REFLECTION_COLUMNS,
+            records=[_reflection_row(row["mood_id"], row) for row in rows]
+        )
+
+    async def grant_unlocks(self, user_id: str, unlock_types: Sequence[str]) -> List[str]:
+        if not unlock_types:
+            return []
+        records = await self._run("grant_unlocks", "fetch", UPSERT_UNLOCKS_SQL, user_id, list(unlock_types))
+        return [record["unlock_type"] for record in records]
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool health and per-operation metrics"""
+        pool = self._pool
+        return {
+            "backend": "postgres",
+            "open": pool is not None,
+            "size": pool.get_size() if pool is not None else 0,
+            "idle": pool.get_idle_size() if pool is not None else 0,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "operations": self.metrics.snapshot()
+        }
+
+
+# ============================================================================
+# In-Memory Store
+# ============================================================================
+
+class InMemoryStore:
+    """
+    Stand-in for PostgresStore (local runs and tests)
+
+    Applies the same rules as apply_mood_gamification() and submit_mood():
+    one daily reward per posting day, a streak bonus every third consecutive
+    day, and every reached unlock granted once.
+    """
+
+    def __init__(
+        self,
+        daily_coins: int = 5,
+        streak_bonus_coins: int = 5,
+        streak_bonus_interval: int = 3,
+        auto_create_users: bool = True,
+        clock=date.today,
+    ):
+        self.daily_coins = daily_coins
+        self.streak_bonus_coins = streak_bonus_coins
+        self.streak_bonus_interval = streak_bonus_interval
+        self.auto_create_users = auto_create_users
+        self.clock = clock
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.moods: List[Dict[str, Any]] = []
+        self.reflections: List[Dict[str, Any]] = []
+        self.unlocks: Dict[str, set] = {}
+        self.metrics = _StoreMetrics()
+
+    async def open(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    def add_user(self, user_id: str, streak_days: int = 0, moodcoins: int = 0, last_mood_date: Optional[date] = None) -> None:
+        self.users[user_id] = {"streak_days": streak_days, "moodcoins": moodcoins, "last_mood_date": last_mood_date}
+
+    async def submit(
+        self,
+        user_id: str,
+        mood_payload: Dict[str, Any],
+        reflection: Optional[Dict[str, Any]] = None,
+        unlocks: Sequence[Tuple[str, int]] = (),
+    ) -> Dict[str, Any]:
+        started = time.perf_counter()
+        if user_id not in self.users:
+            if not self.auto_create_users:
+                self.metrics.record("submit", (time.perf_counter() - started) * 1000, ok=False)
+                raise UnknownUser(f"Unknown user {user_id}")
+            self.add_user(user_id)
+        user = self.users[user_id]
+        mood_date = self.clock()
+        old_coins = user["moodcoins"]
+
+        last = user["last_mood_date"]
+        if last is None or last < mood_date:
+            consecutive = last is not None and (mood_date - last).days == 1
+            user["streak_days"] = user["streak_days"] + 1 if consecutive else 1
+            user["moodcoins"] += self.daily_coins
+            if consecutive and user["streak_days"] % self.streak_bonus_interval == 0:
+                user["moodcoins"] += self.streak_bonus_coins
+            user["last_mood_date"] = mood_date
+
+        mood_id = str(uuid.uuid4())
+        self.moods.append({"id": mood_id, "user_id": user_id, **mood_payload})
+        if reflection is not None:
+            self.reflections.append({"mood_id": mood_id, **reflection})
+
+        reached = [unlock_type for unlock_type, threshold in (unlocks or unlock_catalog.items()) if threshold <= user["moodcoins"]]
+        new_unlocks = await self.grant_unlocks(user_id, reached)
+
+        self.metrics.record("submit", (time.perf_counter() - started) * 1000)
+        return {
+            "mood_id": mood_id,
+            "streak_days": user["streak_days"],
+            "moodcoins": user["moodcoins"],
+            "coins_awarded": user["moodcoins"] - old_coins,
+            "new_unlocks": new_unlocks
+        }
+
+    async def insert_reflection(self, mood_id: str, reflection: Dict[str, Any]) -> None:
+        self.reflections.append({"mood_id": mood_id, **reflection})
+
+    async def insert_reflections(self, rows: List[Dict[str, Any]]) -> None:
+        self.reflections.extend(rows)
+
+    async def grant_unlocks(self, user_id: str, unlock_types: Sequence[str]) -> List[str]:
+        granted = self.unlocks.setdefault(user_id, set())
+        new_unlocks = [unlock_type for unlock_type in unlock_types if unlock_type not in granted]
+        granted.update(new_unlocks)
+        return new_unlocks
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "users": len(self.users),
+            "moods": len(self.moods),
+            "reflections": len(self.reflections),
+            "operations": self.metrics.snapshot()
+        }
+
+
+def create_store():
+    """
+    Store for this worker: PostgresStore when DATABASE_URL is set, InMemoryStore
+    when MOODI_STORE=memory, otherwise None (submissions are not persisted)
+    """
+    if DATABASE_URL:
+        return PostgresStore(DATABASE_URL)
+    if os.getenv("MOODI_STORE") == "memory":
+        return InMemoryStore()
+    return None
+
+
+def create_reflection_writer(store) -> Optional[WriteBehindBuffer]:
+    """
+    Write-behind buffer flushing reflection rows into `store`, or None when
+    there is no store or MOODI_REFLECTION_WRITE_BEHIND=0
+    """
+    if store is None or not REFLECTION_WRITE_BEHIND:
+        return None
+    return WriteBehindBuffer(
+        store.insert_reflections,
+        max_rows=WRITE_BEHIND_MAX_ROWS,
+        max_delay_ms=WRITE_BEHIND_MAX_DELAY_MS,
+        max_pending=WRITE_BEHIND_MAX_PENDING,
+        spill_dir=WRITE_BEHIND_SPILL_DIR,
+        name="mood_reflections"
+    )
@@ -0,0 +1,242 @@
+"""
+MOODI Engine - Safety pre-screen
+Local risk score for context_text, used to escalate and prioritize the remote safety checks
+
+Text is normalized (case, Latin accents, Arabic diacritics/hamza/ta marbuta,
+apostrophes), matched against one compiled pattern per risk tier for
+English, French, Arabic and Darija (Arabic script and Latin "arabizi"), and
+the tier counts go through a tiny logistic model with fixed weights:
+
+    clear      -> remote moderation (classifier only if moderation flags it)
+    ambiguous  -> the same
+    high       -> remote moderation and the safety classifier together, so
+                  the classifier's answer does not wait for moderation's
+
+A "clear" verdict only means the lexicon found nothing; plainly suicidal
+phrasings it has no entry for score "clear" too (see the held-out set in
+benchmarks/bench_prescreen.py). The verdict must therefore never be used to
+skip a remote check or to mark a text safe, only to escalate.
+"""
+
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+# MOODI_PRESCREEN=0 turns the early escalation off: every text still goes to
+# remote moderation, and the classifier only runs once moderation flags it
+PRESCREEN_ENABLED = os.getenv("MOODI_PRESCREEN", "1") == "1"
+
+CLEAR_BELOW = 0.25
+HIGH_FROM = 0.8
+
+# Logistic weights over the feature counts (hand-set; see
+# benchmarks/bench_prescreen.py for precision/recall on the fixture set)
+_BIAS = -4.0
+_WEIGHTS = {"high": 6.0, "medium": 3.2, "affect": 1.3, "unknown_script": 3.5, "long": 0.8}
+LONG_TEXT_CHARS = 280
+
+# ============================================================================
+# Lexicon
+# ============================================================================
+# Patterns are written in natural spelling and normalized like the input
+# before compiling, so "أريد أن أموت" also matches "اريد ان اموت". Only
+# lowercase regex escapes (\b, \s, \w) may be used.
+
+_LEXICON: Dict[str, List[str]] = {
+    # Self-harm or suicide intent, and violence against the user
+    "high": [
+        # en
+        r"\bkill(?:ing)?\s+my\s*self\b", r"\bsuicid\w*", r"\bend(?:ing)?\s+(?:it\s+all|my\s+life)\b",
+        r"\bwant(?:s|ed)?\s+to\s+die\b", r"\bhurt(?:ing)?\s+my\s*self\b", r"\bself[\s-]?harm\w*",
+        r"\bcut(?:ting)?\s+my\s*self\b", r"\boverdos\w*", r"\bno\s+reason\s+to\s+live\b",
+        r"\bbetter\s+off\s+dead\b", r"\bdon'?t\s+want\s+to\s+(?:live|be\s+alive|wake\s+up)\b",
+        r"\b(?:he|she|they)\s+(?:hit|hits|beat|beats|hurt|hurts)\s+me\b", r"\bkill\s+(?:him|her|them)\b",
+        # fr
+        r"\bme\s+suicider\b", r"\bveux\s+mourir\b", r"\benvie\s+de\s+mourir\b", r"\ben\s+finir\b",
+        r"\bme\s+tuer\b", r"\bme\s+faire\s+du\s+mal\b", r"\bscarif\w*", r"\bme\s+mutiler\b",
+        r"\bplus\s+envie\s+de\s+vivre\b", r"\bme\s+(?:frappe|frappent|bat|battent)\b", r"\bsurdose\b",
+        r"\b(?:le|la|les)\s+tuer\b",
+        # ar
+        r"انتحار", r"انتحر", r"أقتل\s+نفسي", r"أريد\s+أن\s+أموت", r"أؤذي\s+نفسي", r"إيذاء\s+النفس",
+        r"أجرح\s+نفسي", r"لا\s+أريد\s+أن\s+أعيش", r"يضربني", r"جرعة\s+زائدة", r"أنهي\s+حياتي",
+        # ar-darija (Arabic script)
+        r"بغيت\s+نموت", r"نقتل\s+راسي", r"نتنحر", r"[كت]يضربني", r"نجرح\s+راسي", r"ما\s*بغيتش\s+نعيش",
+        # ar-darija (arabizi)
+        r"\bbghit\s+nmout\b", r"\bn[9q]tel\s+rasi\b", r"\bntn?a?7ar\b", r"\bka[iy]e?d[ae]?r[ae]?bni\b",
+        r"\bma\s*bghitch\s+n3ich\b", r"\bnjre7\s+rasi\b",
+    ],
+    # Hopelessness, crisis, abuse or threats
+    "medium": [
+        # en
+        r"\bcan'?t\s+go\s+on\b", r"\bhopeless\w*", r"\bworthless\b", r"\bgive\s+up\s+on\s+(?:life|everything)\b",
+        r"\bno\s+way\s+out\b", r"\bpanic\s+attacks?\b", r"\bnobody\s+(?:cares|would\s+care|would\s+miss\s+me)\b",
+        r"\babus\w*", r"\bharass\w*", r"\bthreat\w*", r"\bcan'?t\s+take\s+it\s+anymore\b", r"\bdisappear\b",
+        r"\bempty\s+inside\b", r"\bdepress\w*", r"\bscared\s+(?:of|for)\s+my\s+(?:life|safety)\b",
+        # fr
+        r"\bj'?en\s+peux\s+plus\b", r"\bn'?en\s+peux\s+plus\b", r"\bdésesp\w*", r"\bsans\s+issue\b",
+        r"\bpersonne\s+ne\s+(?:m'aime|se\s+soucie)", r"\bdisparaître\b", r"\bcrises?\s+d'angoisse\b",
+        r"\bharcel\w*", r"\bmenac\w*", r"\bdépri\w*", r"\bdépress\w*", r"\bvide\s+à\s+l'intérieur\b",
+        r"\bje\s+ne\s+sers\s+à\s+rien\b", r"\bviolen\w*",
+        # ar
+        r"لا\s+أستطيع\s+الاستمرار", r"لا\s+معنى\s+لحياتي", r"\bيائس\w*", r"(?<!\w)[وفبلك]?(?:ال)?يأس", r"تحرش", r"يهددني",
+        r"تهديد", r"عنف", r"اكتئاب", r"مكتئب", r"لا\s+أحد\s+يهتم", r"نوبة\s+هلع", r"أختفي",
+        # ar-darija (Arabic script)
+        r"ما\s*بقيتش\s+قادر", r"عييت\s+من\s+(?:الحياة|الدنيا|كلشي)", r"مقنط", r"حتى\s+واحد\s+ما\s+كيهتم",
+        # ar-darija (arabizi)
+        r"\bma\s*b[9q]itch\s+[9q]ader\b", r"\b3yit\s+m[ae]?n\s+(?:l7ayat|dnya|kolchi)\b", r"\bm[9q]a?nn?at\b",
+        r"\b7ta\s+wa7ed\s+ma\s+kayhtam\b",
+    ],
+    # Negative affect that is normal on its own
+    "affect": [
+        # en
+        r"\bsad\b", r"\bcr(?:y|ying|ied)\b", r"\btired\b", r"\bexhausted\b", r"\blonely\b", r"\balone\b",
+        r"\banxi\w*", r"\bstress\w*", r"\bangry\b", r"\bhurt\b", r"\bbroken\b", r"\bmiserable\b",
+        r"\bawful\b", r"\bterrible\b", r"\bscared\b", r"\bafraid\b",
+        # fr
+        r"\btriste\w*", r"\bpleur\w*", r"\bfatigu\w*", r"\bépuisé\w*", r"\bseule?s?\b", r"\bangoiss\w*",
+        r"\bcolère\b", r"\banxi\w*", r"\bperdue?s?\b", r"\bpeur\b", r"\bmal\s+au\s+cœur\b", r"\bnulle?\b",
+        # ar
+        r"حزين", r"حزن", r"تعبان", r"متعب", r"وحيد", r"قلق", r"خائف", r"أبكي", r"بكيت", r"مضغوط", r"غاضب",
+        # ar-darija (Arabic script)
+        r"خايف", r"كنبكي", r"مقلق", r"زعفان", r"بوحدي", r"عيان",
+        # ar-darija (arabizi)
+        r"\b7zin\b", r"\b7azin\b", r"\bm[9q]all?e[9q]\b", r"\b3yan\b", r"\b3yit\b", r"\bbo7di\b",
+        r"\b[kt]anbki\b", r"\bkhay[ae]?f\b", r"\bz3fan\b",
+    ],
+}
+
+# ============================================================================
+# Normalization
+# ============================================================================
+
+# Latin accents and Arabic harakat, hamza above/below, madda, dagger alef
+_COMBINING = re.compile("[\u0300-\u036f\u064b-\u065f\u0670]")
+_FOLD = str.maketrans({
+    "\u0629": "\u0647",  # ta marbuta -> ha
+    "\u0649": "\u064a",  # alef maqsura -> ya
+    "\u0640": None,  # tatweel
+    "\u2019": "'", "\u2018": "'", "\u02bc": "'", "`": "'",
+    "\u0153": "oe",  # oe ligature (NFKD keeps it)
+})
+_WHITESPACE = re.compile(r"\s+")
+# Letters outside Latin and Arabic: the lexicon cannot judge them
+_UNKNOWN_SCRIPT = re.compile(r"[^\W\d_a-z\u00c0-\u024f\u0600-\u06ff\u0750-\u077f]")
+
+
+def normalize_text(text: str) -> str:
+    """Casefold, strip accents/diacritics and fold Arabic letter variants"""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = _COMBINING.sub("", text).translate(_FOLD)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _required_literal(pattern: str) -> Optional[str]:
+    """
+    Longest run of plain characters every match of `pattern` must contain
+
+    Only top-level characters outside groups and classes that carry no
+    quantifier count. Returns None when there is none (the pattern then
+    always runs).
+    """
+    best, run, depth, i = "", "", 0, 0
+    while i < len(pattern):
+        char = pattern[i]
+        following = pattern[i + 1] if i + 1 < len(pattern) else ""
+        if char == "\\":
+            run, i = "", i + 2
+            continue
+        if char == "[":
+            depth += 1
+        elif char == "]":
+            depth -= 1
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return None
+        elif depth == 0 and char not in ".^$?*+{}" and following not in ("?", "*", "+", "{"):
+            run += char
+            best = max(best, run, key=len)
+            i += 1
+            continue
+        run, i = "", i + 1
+    return best or None
+
+
+def _compile(lexicon: Dict[str, List[str]]) -> List[Tuple[Optional[str], str, "re.Pattern"]]:
+    """(required literal, tier, compiled pattern) for every lexicon entry"""
+    entries = []
+    for tier, patterns in lexicon.items():
+        for pattern in patterns:
+            if re.search(r"\\[A-Z]", pattern):
+                raise ValueError(f"Uppercase escape would be casefolded: {pattern}")
+            normalized = normalize_text(pattern)
+            entries.append((_required_literal(normalized), tier, re.compile(normalized)))
+    return entries
+
+
+# A substring test per entry is far cheaper than running one big alternation
+# at every position, and most texts contain none of the literals
+_ENTRIES = _compile(_LEXICON)
+
+# ============================================================================
+# Scoring
+# ============================================================================
+
+_stats_lock = threading.Lock()
+_verdicts: Counter = Counter()
+
+
+def prescreen(text: str) -> Dict[str, Any]:
+    """
+    Score a context_text locally
+
+    Returns:
+        Dictionary with 'verdict' ('clear', 'ambiguous' or 'high'), 'score'
+        (0-1), per-tier 'matches' and 'elapsed_us'
+    """
+    started = time.perf_counter()
+    normalized = normalize_text(text or "")
+    matches: Dict[str, List[str]] = {}
+    for literal, tier, pattern in _ENTRIES:
+        if literal is not None and literal not in normalized:
+            continue
+        for match in pattern.finditer(normalized):
+            matches.setdefault(tier, []).append(match.group())
+    features = {tier: len(matches.get(tier, ())) for tier in _LEXICON}
+    features["unknown_script"] = 1 if _UNKNOWN_SCRIPT.search(normalized) else 0
+    features["long"] = 1 if len(normalized) > LONG_TEXT_CHARS else 0
+
+    logit = _BIAS + sum(_WEIGHTS[name] * value for name, value in features.items())
+    score = 1.0 / (1.0 + math.exp(-logit))
+    if score >= HIGH_FROM:
+        verdict = "high"
+    elif score >= CLEAR_BELOW:
+        verdict = "ambiguous"
+    else:
+        verdict = "clear"
+
+    with _stats_lock:
+        _verdicts[verdict] += 1
+    return {
+        "verdict": verdict,
+        "score": round(score, 4),
+        "matches": matches,
+        "elapsed_us": (time.perf_counter() - started) * 1e6
+    }
+
+
+def stats() -> Dict[str, Any]:
+    """Verdict counts and the share of texts escalated early (classifier started with moderation)"""
+    with _stats_lock:
+        total = sum(_verdicts.values())
+        return {
+            **{verdict: _verdicts[verdict] for verdict in ("clear", "ambiguous", "high")},
+            "escalated_ratio": _verdicts["high"] / total if total else 0.0
+        }
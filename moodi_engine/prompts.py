@@ -0,0 +1,190 @@
+"""
+MOODI Engine - Prompts
+System prompts, the reflection response schema and prebuilt user-prompt templates
+"""
+
+import json
+from typing import Any, Dict
+
+# System prompt for the Mood Reflection Engine
+SYSTEM_PROMPT = """You are **MOODI Reflection Engine**, an emotion-first micro-coach. 
+Your job: transform a user's mood into a short, empathetic reflection + a tiny action.
+
+Non-negotiables:
+- **Max 60 words** for `reflection_text` (empathetic, human, specific to the mood, never generic).
+- Give **one** tiny, doable suggestion in `action_suggestion` (max 20 words).
+- Keep language and dialect = `user_locale` (support: ar, ar-darija, fr, en). If `user_locale` is `ar-darija`, reply in **Moroccan Darija** (Arabic script acceptable).
+- Add a short `share_caption` users can post publicly (≤ 15 words, uplifting).
+- For sound, give 1 `soundtrack_hint` (mood/genre; avoid trademarks where unsure).
+- Add 3–6 `tags` capturing emotion nuance (e.g., ["calm","gratitude","evening","alone"]).
+- **ALWAYS include `safety_flag`** in your response. Set it to "ok" for normal moods, or "elevate" if self-harm risk is detected.
+- Output **valid JSON** matching the provided schema—no extra keys, no prose outside JSON.
+
+Guardrails:
+- No medical/clinical claims. If self-harm risk is present, set `safety_flag: "elevate"` and set `action_suggestion` to seeking help (culturally appropriate hotline/close person), no coaching beyond that.
+- Never include PII. Never shame the user.
+- If mood media is present, you may reference it generically (e.g., "in your photo", "in your voice note"); never describe people or private details.
+
+Tone:
+- Warm, brief, non-therapeutic. Use everyday language.
+
+Required JSON fields: reflection_text, action_suggestion, share_caption, soundtrack_hint, tags, safety_flag"""
+
+NOTIFICATION_SYSTEM_PROMPT = """You write ultra-short, empathetic push notifications and microcopies for mood journaling apps.
+Rules: ≤ 80 characters, friendly, zero guilt. Match `user_locale`.
+Output JSON: {"title": "...", "body": "..."} with both ≤ 80 chars."""
+
+NOTIFICATION_CATALOG_SYSTEM_PROMPT = """You write ultra-short, empathetic push notifications and microcopies for mood journaling apps.
+Rules: ≤ 80 characters, friendly, zero guilt. Match `user_locale`.
+Write distinct variants for the given theme and streak band. Where you mention the streak, write the literal placeholder {streak} instead of a number.
+Output JSON: {"variants": [{"title": "...", "body": "..."}]} with every title and body ≤ 80 chars."""
+
+REFERRAL_CAPTION_SYSTEM_PROMPT = """Write a catchy share caption for social. ≤ 12 words. Match locale.
+Return JSON: {"caption":"..."} Only."""
+
+SAFETY_CLASSIFIER_SYSTEM_PROMPT = """You classify mood texts for safety escalation.
+If self-harm intent or severe distress is implied, return: {"safety_flag":"elevate"}
+Else return: {"safety_flag":"ok"}
+Only output valid JSON with key safety_flag."""
+
+REPAIR_SYSTEM_PROMPT = """You fix individual fields of a JSON object that broke their constraints.
+Rewrite only the listed fields so each one meets its constraint. Keep the language, dialect and tone of the object.
+Output JSON with exactly the listed keys and nothing else."""
+
+# JSON Schema for response validation
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "reflection_text": {"type": "string", "maxLength": 360},
+        "action_suggestion": {"type": "string", "maxLength": 120},
+        "share_caption": {"type": "string", "maxLength": 90},
+        "soundtrack_hint": {"type": "string"},
+        "tags": {"type": "array", "items": {"type": "string"}, "minItems": 3, "maxItems": 6},
+        "safety_flag": {"type": "string", "enum": ["ok", "elevate"]}
+    },
+    "required": ["reflection_text", "action_suggestion", "share_caption", "soundtrack_hint", "tags", "safety_flag"],
+    "additionalProperties": False
+}
+
+# Schemas of the other JSON outputs (enforced as strict response formats in
+# MOODI_STRUCTURED_OUTPUTS=strict mode, see moodi_engine.structured)
+NOTIFICATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string", "maxLength": 80},
+        "body": {"type": "string", "maxLength": 80}
+    },
+    "required": ["title", "body"],
+    "additionalProperties": False
+}
+
+NOTIFICATION_CATALOG_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "variants": {"type": "array", "items": NOTIFICATION_SCHEMA}
+    },
+    "required": ["variants"],
+    "additionalProperties": False
+}
+
+REFERRAL_CAPTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "caption": {"type": "string", "maxLength": 72}
+    },
+    "required": ["caption"],
+    "additionalProperties": False
+}
+
+SAFETY_CLASSIFIER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "safety_flag": {"type": "string", "enum": ["ok", "elevate"]}
+    },
+    "required": ["safety_flag"],
+    "additionalProperties": False
+}
+
+# User-prompt templates, built once at import. Static text goes before the
+# variable part so the cacheable prefix runs as far as possible.
+_REFLECTION_TEMPLATE = """Return a single JSON object that fits the schema for this mood payload:
+{payload}"""
+
+_NOTIFICATION_TEMPLATE = """user_locale="{user_locale}"
+theme="{theme}"
+days_streak={days_streak}"""
+
+_NOTIFICATION_CATALOG_TEMPLATE = """user_locale="{user_locale}"
+theme="{theme}"
+streak_band="{band}"
+variants={count}"""
+
+_REFERRAL_CAPTION_TEMPLATE = """user_locale="{user_locale}"
+mood_emoji="{mood_emoji}"
+benefit="{benefit}" """
+
+_SAFETY_CLASSIFIER_TEMPLATE = 'Text: """{text}"""'
+
+_REPAIR_TEMPLATE = """Fields to rewrite:
+{constraints}
+Current object:
+{current}"""
+
+
+# Payload fields that identify the submitter and never reach the model
+_NON_PROMPT_FIELDS = frozenset({"user_id"})
+
+
+def serialize_payload(mood_payload: Dict[str, Any]) -> str:
+    """
+    Compact, stable JSON for a mood payload
+
+    Keys are sorted, separators carry no whitespace, and null or blank
+    fields are dropped, so equal payloads always serialize to the same bytes.
+    Identifying fields such as user_id are left out.
+    """
+    compact = {}
+    for key, value in mood_payload.items():
+        if key in _NON_PROMPT_FIELDS:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+            if not value:
+                continue
+        if value is None:
+            continue
+        compact[key] = value
+    return json.dumps(compact, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def build_reflection_prompt(mood_payload: Dict[str, Any]) -> str:
+    """Build the user message that carries a mood payload"""
+    return _REFLECTION_TEMPLATE.format(payload=serialize_payload(mood_payload))
+
+
+def build_notification_prompt(user_locale: str, theme: str, days_streak: int = 0) -> str:
+    """Build the user message for notification copy"""
+    return _NOTIFICATION_TEMPLATE.format(user_locale=user_locale, theme=theme, days_streak=days_streak)
+
+
+def build_notification_catalog_prompt(user_locale: str, theme: str, band: str, count: int) -> str:
+    """Build the user message for one notification catalog key"""
+    return _NOTIFICATION_CATALOG_TEMPLATE.format(user_locale=user_locale, theme=theme, band=band, count=count)
+
+
+def build_referral_caption_prompt(user_locale: str, mood_emoji: str, benefit: str) -> str:
+    """Build the user message for a referral caption"""
+    return _REFERRAL_CAPTION_TEMPLATE.format(user_locale=user_locale, mood_emoji=mood_emoji, benefit=benefit)
+
+
+def build_safety_classifier_prompt(context_text: str) -> str:
+    """Build the user message for the secondary safety classifier"""
+    return _SAFETY_CLASSIFIER_TEMPLATE.format(text=context_text)
+
+
+def build_repair_prompt(constraints: Dict[str, str], current: Dict[str, Any]) -> str:
+    """Build the user message of a targeted re-ask for the broken fields only"""
+    return _REPAIR_TEMPLATE.format(
+        constraints="\n".join(f"- {field}: {rule}" for field, rule in constraints.items()),
+        current=json.dumps(current, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    )
@@ -0,0 +1,138 @@
+"""
+MOODI Engine - Reflection cache
+Pools of generated reflections keyed on a canonical mood payload
+"""
+
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Payload fields that make up the cache key. mood_color and geo_hint are
+# deliberately left out: they do not change the reflection we want to show.
+KEY_FIELDS = ("mood_emoji", "intensity_0_10", "time_bucket", "user_locale", "user_age_bucket", "media_present")
+
+
+def make_cache_key(mood_payload: Dict[str, Any]) -> Optional[str]:
+    """
+    Build the canonical cache key for a mood payload
+
+    Returns:
+        Key string, or None if the payload is not cacheable (it has a
+        non-empty context_text, or a key field is missing)
+    """
+    context_text = mood_payload.get("context_text")
+    if context_text and context_text.strip():
+        return None
+
+    parts = []
+    for field in KEY_FIELDS:
+        value = mood_payload.get(field)
+        if value is None and field != "media_present":
+            return None
+        if field == "mood_emoji":
+            # Drop variation selectors so "☺" and "☺️" share a key
+            value = value.strip().replace("\ufe0f", "")
+        elif field == "media_present":
+            value = "1" if value else "0"
+        parts.append(str(value))
+    return "|".join(parts)
+
+
+class ReflectionCache:
+    """
+    Thread-safe LRU cache holding a small pool of reflection variants per key
+
+    A key only serves hits once its pool holds `variants_per_key` live
+    entries; until then lookups miss so the caller generates another variant
+    and adds it. Each variant expires `ttl_seconds` after it was stored.
+    """
+
+    def __init__(
+        self,
+        max_keys: int = 4096,
+        variants_per_key: int = 4,
+        ttl_seconds: float = 6 * 3600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_keys = max_keys
+        self.variants_per_key = variants_per_key
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._pools: "OrderedDict[str, List[Tuple[float, Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+
+    def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Return a random live variant for `key`, or None on a miss"""
+        if key is None:
+            with self._lock:
+                self.bypasses += 1
+            return None
+
+        now = self._clock()
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is not None:
+                pool[:] = [entry for entry in pool if entry[0] > now]
+                if len(pool) >= self.variants_per_key:
+                    self._pools.move_to_end(key)
+                    self.hits += 1
+                    _, reflection = random.choice(pool)
+                    return _copy_reflection(reflection)
+            self.misses += 1
+            return None
+
+    def put(self, key: Optional[str], reflection: Dict[str, Any]) -> None:
+        """Add a freshly generated reflection to the pool for `key`"""
+        if key is None:
+            return
+
+        expires_at = self._clock() + self.ttl_seconds
+        with self._lock:
+            pool = self._pools.setdefault(key, [])
+            self._pools.move_to_end(key)
+            pool.append((expires_at, _copy_reflection(reflection)))
+            if len(pool) > self.variants_per_key:
+                # Keep the newest variants
+                del pool[0]
+            while len(self._pools) > self.max_keys:
+                self._pools.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pools.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "evictions": self.evictions,
+                "keys": len(self._pools),
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+def _copy_reflection(reflection: Dict[str, Any]) -> Dict[str, Any]:
+    copied = dict(reflection)
+    if isinstance(copied.get("tags"), list):
+        copied["tags"] = list(copied["tags"])
+    return copied
+
+
+# Process-wide cache shared by the reflection engine and the FastAPI apps
+reflection_cache = ReflectionCache(
+    max_keys=int(os.getenv("MOODI_REFLECTION_CACHE_KEYS", "4096")),
+    variants_per_key=int(os.getenv("MOODI_REFLECTION_CACHE_VARIANTS", "4")),
+    ttl_seconds=float(os.getenv("MOODI_REFLECTION_CACHE_TTL", str(6 * 3600))),
+)
@@ -0,0 +1,378 @@
+"""
+MOODI Engine - Output repair
+Deterministic fixes for near-miss model outputs, with a targeted re-ask as last resort
+
+Most invalid reflections miss by a little: 361 characters, seven tags, "OK"
+instead of "ok", an extra key. repair() fixes those from the schema alone.
+Only when a field cannot be fixed locally (missing, too few tags) is the model
+asked again, and then only for the broken fields, which costs a fraction of a
+full regeneration.
+"""
+
+import functools
+import os
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from moodi_engine.engine import DEFAULT_MODEL, acomplete_json, complete_json
+from moodi_engine.prompts import REPAIR_SYSTEM_PROMPT, RESPONSE_SCHEMA, build_repair_prompt
+from moodi_engine.structured import structured_outputs
+from moodi_engine.validation import compile_validator, validate_reflection
+
+REPAIR_REASK = os.getenv("MOODI_REPAIR_REASK", "1") == "1"
+REPAIR_TEMPERATURE = 0.2
+
+# Model spellings mapped onto enum values; unknown safety flags fail safe to "elevate"
+REFLECTION_ENUM_ALIASES = {
+    "safety_flag": {"okay": "ok", "safe": "ok", "elevated": "elevate", "escalate": "elevate"}
+}
+REFLECTION_ENUM_FALLBACKS = {"safety_flag": "elevate"}
+# Fields filled in when missing or unusable, and never re-asked: the re-ask
+# prompt does not carry the user's input, so it cannot judge safety
+REFLECTION_FIELD_DEFAULTS = {"safety_flag": "elevate"}
+
+_TRIM_PUNCTUATION = " \t\n,;:-–—"
+
+
+def trim_to_words(text: str, limit: int) -> str:
+    """Shorten text to at most `limit` characters, cutting at a word boundary"""
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    cut = text[:limit - 1]
+    space = cut.rfind(" ")
+    if space >= limit // 2:
+        cut = cut[:space]
+    return cut.rstrip(_TRIM_PUNCTUATION) + "…"
+
+
+def _normalize_key(key: str) -> str:
+    return key.strip().lower().replace("-", "_").replace(" ", "_")
+
+
+def _as_string(value: Any) -> Optional[str]:
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return " ".join(item.strip() for item in value)
+    return None
+
+
+def _as_string_list(value: Any) -> Optional[List[str]]:
+    if isinstance(value, str):
+        value = value.replace("#", ",").split(",")
+    if not isinstance(value, list):
+        return None
+    items, seen = [], set()
+    for item in value:
+        text = _as_string(item)
+        if not text:
+            continue
+        text = text.lstrip("#").strip()
+        if text and text.casefold() not in seen:
+            seen.add(text.casefold())
+            items.append(text)
+    return items
+
+
+def repair(
+    data: Any,
+    schema: Dict[str, Any],
+    enum_aliases: Optional[Dict[str, Dict[str, str]]] = None,
+    enum_fallbacks: Optional[Dict[str, str]] = None,
+    field_defaults: Optional[Dict[str, Any]] = None,
+) -> Tuple[Any, List[str]]:
+    """
+    Apply deterministic fixes to a parsed object against a flat object schema
+
+    Renames near-miss keys, drops unknown keys, coerces and trims strings to
+    maxLength at word boundaries, dedupes and clamps string arrays to
+    maxItems, normalizes enum casing (plus aliases/fallbacks) and fills
+    missing fields that have a default.
+
+    Returns:
+        Tuple of (repaired copy, list of applied fixes); a non-dict is
+        returned unchanged
+    """
+    if not isinstance(data, dict):
+        return data, []
+    enum_aliases = enum_aliases or {}
+    enum_fallbacks = enum_fallbacks or {}
+    field_defaults = field_defaults or {}
+    properties = schema.get("properties", {})
+    fixes: List[str] = []
+
+    repaired: Dict[str, Any] = {}
+    for key, value in data.items():
+        field = key if key in properties else _normalize_key(key)
+        if field not in properties:
+            fixes.append(f"dropped:{key}")
+            continue
+        if field != key:
+            if field in data:
+                fixes.append(f"dropped:{key}")
+                continue
+            fixes.append(f"renamed:{key}")
+        repaired[field] = value
+
+    for field, rule in properties.items():
+        if field not in repaired:
+            continue
+        value = repaired[field]
+        kind = rule.get("type")
+
+        if kind == "string":
+            text = _as_string(value)
+            if text is None:
+                del repaired[field]
+                fixes.append(f"dropped:{field}")
+                continue
+            if text != value:
+                fixes.append(f"coerced:{field}")
+            if "enum" in rule and text not in rule["enum"]:
+                folded = text.casefold()
+                allowed = {option.casefold(): option for option in rule["enum"]}
+                normalized = allowed.get(folded) or enum_aliases.get(field, {}).get(folded) or enum_fallbacks.get(field)
+                if normalized is None:
+                    repaired[field] = text
+                    continue
+                fixes.append(f"normalized:{field}")
+                text = normalized
+            if "maxLength" in rule and len(text) > rule["maxLength"]:
+                text = trim_to_words(text, rule["maxLength"])
+                fixes.append(f"trimmed:{field}")
+            repaired[field] = text
+
+        elif kind == "array" and rule.get("items", {}).get("type") == "string":
+            items = _as_string_list(value)
+            if items is None:
+                del repaired[field]
+                fixes.append(f"dropped:{field}")
+                continue
+            if items != value:
+                fixes.append(f"deduped:{field}")
+            if "maxItems" in rule and len(items) > rule["maxItems"]:
+                items = items[:rule["maxItems"]]
+                fixes.append(f"clamped:{field}")
+            repaired[field] = items
+
+    for field, default in field_defaults.items():
+        if field in properties and field not in repaired:
+            repaired[field] = default
+            fixes.append(f"defaulted:{field}")
+
+    return repaired, fixes
+
+
+def broken_fields(errors: List[str]) -> List[str]:
+    """Top-level field names referenced by validator error messages"""
+    fields = []
+    for error in errors:
+        if error.startswith("Missing required field: "):
+            field = error[len("Missing required field: "):]
+        else:
+            field = error.split(" ", 1)[0].split("[", 1)[0]
+        if field not in fields:
+            fields.append(field)
+    return fields
+
+
+def _constraint(rule: Dict[str, Any]) -> str:
+    kind = rule.get("type")
+    if "enum" in rule:
+        return "one of " + ", ".join(f'"{option}"' for option in rule["enum"])
+    if kind == "array":
+        return f"array of {rule.get('minItems', 0)}-{rule.get('maxItems', 'any')} distinct short strings"
+    if "maxLength" in rule:
+        return f"string of at most {rule['maxLength']} characters"
+    return "string"
+
+
+# ============================================================================
+# Repair pipeline with metrics
+# ============================================================================
+
+class OutputRepairer:
+    """
+    Validate -> deterministic repair -> targeted re-ask, for one response schema
+
+    Args:
+        schema: Flat object JSON schema the output must satisfy
+        validator: Compiled validator for `schema`
+        name: Label used for the re-ask endpoint ("<name>_repair") and metrics
+        enum_aliases: Extra spellings per enum field
+        enum_fallbacks: Value for unrecognized enum spellings per field
+        field_defaults: Value for missing or unusable fields; these are never
+            re-asked
+    """
+
+    def __init__(
+        self,
+        schema: Dict[str, Any],
+        validator: Optional[Callable[[Any], List[str]]] = None,
+        name: str = "reflection",
+        enum_aliases: Optional[Dict[str, Dict[str, str]]] = None,
+        enum_fallbacks: Optional[Dict[str, str]] = None,
+        field_defaults: Optional[Dict[str, Any]] = None,
+    ):
+        self.schema = schema
+        self.validator = validator or compile_validator(schema)
+        self.name = name
+        self.enum_aliases = enum_aliases
+        self.enum_fallbacks = enum_fallbacks
+        self.field_defaults = field_defaults or {}
+        self._lock = threading.Lock()
+        self._counters = Counter()
+        self._fixes = Counter()
+
+    def _count(self, counter: str, fixes: List[str] = ()) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+            self._fixes.update(fixes)
+
+    def _repair(self, data: Any) -> Tuple[Any, List[str], List[str]]:
+        repaired, fixes = repair(data, self.schema, self.enum_aliases, self.enum_fallbacks, self.field_defaults)
+        return repaired, fixes, self.validator(repaired)
+
+    def _reask_prompt(self, data: Dict[str, Any], errors: List[str]) -> Tuple[List[str], str]:
+        properties = self.schema.get("properties", {})
+        fields = [
+            field for field in broken_fields(errors) if field in properties and field not in self.field_defaults
+        ]
+        constraints = {field: _constraint(properties[field]) for field in fields}
+        return fields, build_repair_prompt(constraints, data)
+
+    def _merge(self, data: Dict[str, Any], fields: List[str], reply: Any) -> Tuple[Any, List[str], List[str]]:
+        if not isinstance(reply, dict):
+            return data, [], self.validator(data)
+        merged = {**data, **{field: reply[field] for field in fields if field in reply}}
+        return self._repair(merged)
+
+    def _first_pass(self, data: Any) -> Tuple[Any, List[str], bool]:
+        """(output, remaining errors, re-ask worthwhile)"""
+        errors = self.validator(data)
+        if not errors:
+            self._count("valid")
+            return data, [], False
+        repaired, fixes, errors = self._repair(data)
+        if not errors:
+            self._count("repaired", fixes)
+            return repaired, [], False
+        with self._lock:
+            self._fixes.update(fixes)
+        return repaired, errors, isinstance(repaired, dict)
+
+    def fix(
+        self, data: Any, reask: Optional[Callable[[str, str], Any]] = None, model: str = DEFAULT_MODEL
+    ) -> Tuple[Any, List[str]]:
+        """
+        Make `data` valid with as little model work as possible
+
+        Args:
+            data: Parsed model output
+            reask: Optional function (system_prompt, user_prompt) -> parsed
+                JSON for the targeted re-ask; None skips it
+            model: Model the re-ask runs on (for the structured-output metrics)
+
+        Returns:
+            Tuple of (best-effort output, remaining errors; empty when valid)
+        """
+        repaired, errors, worthwhile = self._first_pass(data)
+        if not errors:
+            return repaired, []
+        if reask is None or not worthwhile:
+            self._count("unrepaired")
+            return repaired, errors
+
+        fields, prompt = self._reask_prompt(repaired, errors)
+        structured_outputs.record_retry(self.name, model)
+        try:
+            reply = reask(REPAIR_SYSTEM_PROMPT, prompt)
+        except Exception as e:
+            print(f"{self.name} re-ask failed: {e}")
+            reply = None
+        return self._after_reask(repaired, fields, reply)
+
+    async def afix(self, data: Any, reask=None, model: str = DEFAULT_MODEL) -> Tuple[Any, List[str]]:
+        """Non-blocking variant of fix(); `reask` is a coroutine function"""
+        repaired, errors, worthwhile = self._first_pass(data)
+        if not errors:
+            return repaired, []
+        if reask is None or not worthwhile:
+            self._count("unrepaired")
+            return repaired, errors
+
+        fields, prompt = self._reask_prompt(repaired, errors)
+        structured_outputs.record_retry(self.name, model)
+        try:
+            reply = await reask(REPAIR_SYSTEM_PROMPT, prompt)
+        except Exception as e:
+            print(f"{self.name} re-ask failed: {e}")
+            reply = None
+        return self._after_reask(repaired, fields, reply)
+
+    def _after_reask(self, repaired: Dict[str, Any], fields: List[str], reply: Any) -> Tuple[Any, List[str]]:
+        merged, fixes, errors = self._merge(repaired, fields, reply)
+        self._count("reask_repaired" if not errors else "unrepaired", fixes)
+        with self._lock:
+            self._counters["reasks"] += 1
+        return merged, errors
+
+    def stats(self) -> Dict[str, Any]:
+        """Outcome counts; regenerations_avoided = outputs saved without a full new completion"""
+        with self._lock:
+            counters = dict(self._counters)
+            checked = sum(counters.get(key, 0) for key in ("valid", "repaired", "reask_repaired", "unrepaired"))
+            return {
+                "checked": checked,
+                "valid": counters.get("valid", 0),
+                "repaired": counters.get("repaired", 0),
+                "reasks": counters.get("reasks", 0),
+                "reask_repaired": counters.get("reask_repaired", 0),
+                "unrepaired": counters.get("unrepaired", 0),
+                "regenerations_avoided": counters.get("repaired", 0) + counters.get("reask_repaired", 0),
+                "fixes": dict(self._fixes)
+            }
+
+
+reflection_repairer = OutputRepairer(
+    RESPONSE_SCHEMA,
+    validate_reflection,
+    name="reflection",
+    enum_aliases=REFLECTION_ENUM_ALIASES,
+    enum_fallbacks=REFLECTION_ENUM_FALLBACKS,
+    field_defaults=REFLECTION_FIELD_DEFAULTS,
+)
+
+
+def _reask_reflection(system_prompt: str, user_prompt: str, model: str = DEFAULT_MODEL) -> Dict[str, Any]:
+    return complete_json(
+        system_prompt, user_prompt, temperature=REPAIR_TEMPERATURE, model=model, endpoint="reflection_repair"
+    )
+
+
+async def _areask_reflection(system_prompt: str, user_prompt: str, model: str = DEFAULT_MODEL) -> Dict[str, Any]:
+    return await acomplete_json(
+        system_prompt, user_prompt, temperature=REPAIR_TEMPERATURE, model=model, endpoint="reflection_repair"
+    )
+
+
+def fix_reflection(data: Any, model: str = DEFAULT_MODEL) -> Tuple[Any, List[str]]:
+    """
+    Repair a parsed reflection, re-asking for broken fields when MOODI_REPAIR_REASK is on
+
+    Args:
+        data: Parsed model output
+        model: Model that produced it; the re-ask runs on the same model
+    """
+    reask = functools.partial(_reask_reflection, model=model) if REPAIR_REASK else None
+    return reflection_repairer.fix(data, reask, model)
+
+
+async def afix_reflection(data: Any, model: str = DEFAULT_MODEL) -> Tuple[Any, List[str]]:
+    """Non-blocking variant of fix_reflection"""
+    reask = functools.partial(_areask_reflection, model=model) if REPAIR_REASK else None
+    return await reflection_repairer.afix(data, reask, model)
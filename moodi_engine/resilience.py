@@ -0,0 +1,610 @@
+"""
+MOODI Engine - Resilient upstream calls
+Per-endpoint deadlines, jittered retries, hedged requests and circuit breaking
+
+Every model/moderation call goes through `resilience.call` (blocking) or
+`resilience.acall` (async). The wrapped function receives the time left for
+the attempt and must pass it on as the request timeout. When the deadline,
+the retries or the circuit breaker give up, `UpstreamUnavailable` is raised
+and callers serve a cached or template fallback (or a 503).
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Status codes worth another attempt (timeouts, conflicts, rate limits, 5xx)
+RETRYABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+# Exception classes (matched by name, so openai/httpx are not imported here)
+_RETRYABLE_ERRORS = frozenset({
+    "APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError",
+    "ConnectError", "ConnectTimeout", "ReadTimeout", "ReadError", "RemoteProtocolError", "PoolTimeout",
+})
+
+
+class UpstreamUnavailable(Exception):
+    """The upstream could not answer within the endpoint's deadline/retry budget"""
+
+    def __init__(self, endpoint: str, message: str, retry_after_s: float = 1.0):
+        super().__init__(f"{endpoint}: {message}")
+        self.endpoint = endpoint
+        self.retry_after_s = retry_after_s
+
+
+class CircuitOpen(UpstreamUnavailable):
+    """The endpoint's circuit breaker is open; no request was sent"""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Whether another attempt may succeed (timeouts, connection errors, 429, 5xx)"""
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS
+    return any(cls.__name__ in _RETRYABLE_ERRORS for cls in type(exc).__mro__)
+
+
+def _is_timeout(exc: BaseException) -> bool:
+    return isinstance(exc, TimeoutError) or type(exc).__name__ in ("APITimeoutError", "ReadTimeout", "ConnectTimeout")
+
+
+def _retry_after_hint(exc: BaseException) -> float:
+    """Retry-After seconds sent with a 429/503, or 0"""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return 0.0
+    try:
+        return float(headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+# ============================================================================
+# Policies
+# ============================================================================
+
+class CallPolicy:
+    """
+    Deadline and retry/hedge settings for one endpoint
+
+    Args:
+        deadline_s: Budget for the whole call, retries included
+        max_attempts: Attempts before giving up (1 disables retries)
+        backoff_base_s: First retry waits up to this long (full jitter, doubling)
+        backoff_cap_s: Upper bound of a single backoff
+        hedge: Send a duplicate request once an attempt outlives the recent p95
+        hedge_min_delay_s: Never hedge earlier than this
+    """
+
+    def __init__(
+        self,
+        deadline_s: float,
+        max_attempts: int = 3,
+        backoff_base_s: float = 0.1,
+        backoff_cap_s: float = 2.0,
+        hedge: bool = True,
+        hedge_min_delay_s: float = 0.05,
+    ):
+        self.deadline_s = deadline_s
+        self.max_attempts = max_attempts
+        self.backoff_base_s = backoff_base_s
+        self.backoff_cap_s = backoff_cap_s
+        self.hedge = hedge
+        self.hedge_min_delay_s = hedge_min_delay_s
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_cap_s, self.backoff_base_s * (2 ** attempt)))
+
+
+def _deadline(endpoint: str, default_s: float) -> float:
+    """Deadline from MOODI_DEADLINE_<ENDPOINT>_MS, e.g. MOODI_DEADLINE_REFLECTION_MS"""
+    value = os.getenv(f"MOODI_DEADLINE_{endpoint.upper()}_MS")
+    return float(value) / 1000 if value else default_s
+
+
+DEFAULT_POLICIES: Dict[str, CallPolicy] = {
+    "reflection": CallPolicy(_deadline("reflection", 12.0)),
+    # Only covers opening the stream; a stream that already produced output is not retried
+    "reflection_stream": CallPolicy(_deadline("reflection_stream", 8.0), hedge=False),
+    # Targeted re-ask for the broken fields of a reflection (moodi_engine.repair)
+    "reflection_repair": CallPolicy(_deadline("reflection_repair", 5.0), max_attempts=2),
+    "notification": CallPolicy(_deadline("notification", 6.0)),
+    "notification_catalog": CallPolicy(_deadline("notification_catalog", 30.0), hedge=False),
+    "referral_caption": CallPolicy(_deadline("referral_caption", 6.0)),
+    "safety_classifier": CallPolicy(_deadline("safety_classifier", 5.0)),
+    "moderation": CallPolicy(_deadline("moderation", 4.0)),
+    "default": CallPolicy(_deadline("default", 15.0)),
+}
+
+
+# ============================================================================
+# Circuit breaker
+# ============================================================================
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failed attempts
+
+    While open, calls are rejected for `reset_timeout_s`; then a single probe
+    is let through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_s: float = 10.0, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and self.clock() - self._opened_at >= self.reset_timeout_s:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def record_neutral(self) -> None:
+        """
+        An attempt that says nothing about the upstream's health (e.g. a 400
+        for a bad request): counts neither way, but frees a half-open probe
+        """
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "open":
+                # Attempts that were in flight when it opened do not extend the open period
+                return
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.opened += 1
+                self.state = "open"
+                self._opened_at = self.clock()
+                self._probing = False
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self.state != "open":
+                return 1.0
+            return max(1.0, self.reset_timeout_s - (self.clock() - self._opened_at))
+
+
+# ============================================================================
+# Hedge watchdog
+# ============================================================================
+
+class _Watchdog:
+    """One daemon thread running callbacks once they are due (hedge launches for blocking calls)"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, delay: float, callback: Callable[[], None]) -> list:
+        """Run callback after `delay` seconds unless cancelled; returns the handle for cancel()"""
+        entry = [time.monotonic() + delay, next(self._seq), callback]
+        with self._cond:
+            heapq.heappush(self._heap, entry)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="moodi-hedge-watchdog", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return entry
+
+    def cancel(self, entry: list) -> None:
+        with self._cond:
+            entry[2] = None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    due_in = self._heap[0][0] - time.monotonic()
+                    if due_in <= 0:
+                        callback = heapq.heappop(self._heap)[2]
+                        break
+                    self._cond.wait(due_in)
+            if callback is not None:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"Hedge launch failed: {e}")
+
+
+class _Hedge:
+    """Hand-off between a blocking primary attempt and the hedge the watchdog may launch for it"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._finished = False
+        self.future = None
+
+    def launch(self, submit: Callable[[], Any]) -> None:
+        with self._lock:
+            if not self._finished:
+                self.future = submit()
+
+    def finish(self):
+        """Mark the primary done; returns the hedge future, if one was launched"""
+        with self._lock:
+            self._finished = True
+            return self.future
+
+
+# ============================================================================
+# Call wrapper
+# ============================================================================
+
+class _EndpointState:
+    """Breaker, latency window and counters of one endpoint"""
+
+    def __init__(self, policy: CallPolicy, breaker: CircuitBreaker, min_samples: int):
+        self.policy = policy
+        self.breaker = breaker
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=512)
+        self._hedge_delay: Optional[float] = None
+        self._since_refresh = 0
+        self.counters = {
+            "calls": 0, "successes": 0, "failures": 0, "retries": 0, "timeouts": 0,
+            "rejected": 0, "hedges": 0, "hedge_wins": 0, "hedge_abandoned": 0, "fallbacks": 0
+        }
+
+    def record_latency(self, seconds: float) -> None:
+        self.latencies.append(seconds)
+        self._since_refresh += 1
+        if len(self.latencies) < self.min_samples:
+            return
+        # p95 is recomputed every 32 samples rather than on every call
+        if self._hedge_delay is None or self._since_refresh >= 32:
+            ordered = sorted(self.latencies)
+            self._hedge_delay = max(self.policy.hedge_min_delay_s, ordered[int(0.95 * (len(ordered) - 1))])
+            self._since_refresh = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        return self._hedge_delay if self.policy.hedge else None
+
+
+class Resilience:
+    """
+    Process-wide call wrapper keyed by endpoint name
+
+    Args:
+        policies: CallPolicy per endpoint ("default" covers unknown names)
+        failure_threshold: Consecutive failed attempts that open a breaker
+        reset_timeout_s: How long an open breaker rejects calls
+        hedge_ratio: Most hedged requests as a fraction of calls
+        hedge_min_samples: Successful attempts needed before hedging starts
+        hedge_workers: Threads for the hedges of blocking calls. The primary
+            request runs on the caller's thread, so a hedge only takes over
+            when the primary fails or times out. A blocking request cannot be
+            cancelled once it is running, so a hedge nobody waits for keeps
+            its thread until its own timeout, which is at most the attempt's
+            remaining deadline. These are counted as `hedge_abandoned`; no
+            new hedge is sent while half of the threads are held by them.
+    """
+
+    def __init__(
+        self,
+        policies: Optional[Dict[str, CallPolicy]] = None,
+        failure_threshold: int = 5,
+        reset_timeout_s: float = 10.0,
+        hedge_ratio: float = 0.1,
+        hedge_min_samples: int = 20,
+        hedge_workers: int = 32,
+    ):
+        self.policies = dict(policies or DEFAULT_POLICIES)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.hedge_ratio = hedge_ratio
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_workers = hedge_workers
+        self._lock = threading.Lock()
+        self._states: Dict[str, _EndpointState] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._watchdog = _Watchdog()
+        self._abandoned_in_flight = 0
+
+    def _state(self, endpoint: str) -> _EndpointState:
+        state = self._states.get(endpoint)
+        if state is None:
+            with self._lock:
+                state = self._states.get(endpoint)
+                if state is None:
+                    policy = self.policies.get(endpoint) or self.policies["default"]
+                    breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout_s)
+                    state = self._states[endpoint] = _EndpointState(policy, breaker, self.hedge_min_samples)
+        return state
+
+    def policy(self, endpoint: str) -> CallPolicy:
+        """Policy an endpoint's calls run under"""
+        return self._state(endpoint).policy
+
+    def set_policy(self, endpoint: str, policy: CallPolicy) -> None:
+        """Replace an endpoint's policy (drops its breaker and latency history)"""
+        with self._lock:
+            self.policies[endpoint] = policy
+            self._states.pop(endpoint, None)
+
+    def _count(self, state: _EndpointState, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            state.counters[counter] += amount
+
+    def _take_hedge(self, state: _EndpointState) -> bool:
+        with self._lock:
+            if state.counters["hedges"] >= self.hedge_ratio * state.counters["calls"]:
+                return False
+            if self._abandoned_in_flight >= self.hedge_workers // 2:
+                return False
+            state.counters["hedges"] += 1
+            return True
+
+    def _abandon(self, state: _EndpointState, future) -> None:
+        """Drop a blocking request nobody waits for: cancel it if queued, else track it until it ends"""
+        if future.cancel() or future.done():
+            return
+        with self._lock:
+            state.counters["hedge_abandoned"] += 1
+            self._abandoned_in_flight += 1
+        future.add_done_callback(self._abandoned_done)
+
+    def _abandoned_done(self, _future) -> None:
+        with self._lock:
+            self._abandoned_in_flight -= 1
+
+    def record_fallback(self, endpoint: str) -> None:
+        """Count a response served from a fallback instead of the upstream"""
+        self._count(self._state(endpoint), "fallbacks")
+
+    def _begin(self, endpoint: str, state: _EndpointState) -> None:
+        self._count(state, "calls")
+        if not state.breaker.allow():
+            self._count(state, "rejected")
+            raise CircuitOpen(endpoint, "circuit open", state.breaker.retry_after())
+
+    def _failed(self, endpoint: str, state: _EndpointState, error: Optional[BaseException]) -> UpstreamUnavailable:
+        self._count(state, "failures")
+        if error is None:
+            message = "deadline exceeded"
+        else:
+            message = f"gave up after {type(error).__name__}" + (f": {error}" if str(error) else "")
+        return UpstreamUnavailable(endpoint, message, state.breaker.retry_after())
+
+    # ------------------------------------------------------------------
+    # Blocking calls
+    # ------------------------------------------------------------------
+
+    def call(self, endpoint: str, fn: Callable[[float], T]) -> T:
+        """
+        Run fn(timeout_s) under the endpoint's deadline, retry, hedge and breaker policy
+
+        Raises:
+            UpstreamUnavailable: Deadline or attempts exhausted, or circuit open
+            Exception: Non-retryable errors from fn, unchanged
+        """
+        state = self._state(endpoint)
+        policy = state.policy
+        deadline = time.monotonic() + policy.deadline_s
+        self._begin(endpoint, state)
+
+        error: Optional[BaseException] = None
+        for attempt in range(policy.max_attempts):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if attempt:
+                if not state.breaker.allow():
+                    break
+                self._count(state, "retries")
+            started = time.monotonic()
+            try:
+                result = self._attempt(state, fn, remaining)
+            except Exception as e:
+                if not is_retryable(e):
+                    state.breaker.record_neutral()
+                    raise
+                error = e
+                state.breaker.record_failure()
+                if _is_timeout(e):
+                    self._count(state, "timeouts")
+                pause = max(policy.backoff(attempt), _retry_after_hint(e))
+                if attempt + 1 < policy.max_attempts and time.monotonic() + pause < deadline:
+                    time.sleep(pause)
+                continue
+            state.breaker.record_success()
+            state.record_latency(time.monotonic() - started)
+            self._count(state, "successes")
+            return result
+        raise self._failed(endpoint, state, error)
+
+    def _attempt(self, state: _EndpointState, fn: Callable[[float], T], timeout: float) -> T:
+        delay = state.hedge_delay()
+        if delay is None or delay >= timeout:
+            return fn(timeout)
+
+        # The primary runs here; the pool is only used if the watchdog finds
+        # it still running after `delay` and the hedge budget allows one
+        started = time.monotonic()
+        hedge = _Hedge()
+        entry = self._watchdog.schedule(delay, lambda: self._launch_hedge(state, hedge, fn, timeout - delay))
+        try:
+            result = fn(timeout)
+        except Exception as e:
+            self._watchdog.cancel(entry)
+            future = hedge.finish()
+            if future is None:
+                raise
+            if not is_retryable(e):
+                self._abandon(state, future)
+                raise
+            # The hedge may still answer within this attempt's timeout
+            try:
+                result = future.result(timeout=max(0.0, timeout - (time.monotonic() - started)))
+            except FuturesTimeoutError:
+                self._abandon(state, future)
+                raise e
+            except Exception:
+                raise e
+            self._count(state, "hedge_wins")
+            return result
+        self._watchdog.cancel(entry)
+        future = hedge.finish()
+        if future is not None:
+            self._abandon(state, future)
+        return result
+
+    def _launch_hedge(self, state: _EndpointState, hedge: _Hedge, fn: Callable[[float], T], timeout: float) -> None:
+        """Watchdog callback: send the hedge to the pool if the primary is still running"""
+        def submit():
+            if not self._take_hedge(state):
+                return None
+            if self._executor is None:
+                with self._lock:
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(self.hedge_workers, thread_name_prefix="moodi-hedge")
+            return self._executor.submit(fn, timeout)
+
+        hedge.launch(submit)
+
+    # ------------------------------------------------------------------
+    # Async calls
+    # ------------------------------------------------------------------
+
+    async def acall(self, endpoint: str, fn: Callable[[float], Awaitable[T]]) -> T:
+        """Non-blocking variant of call(); losing hedged requests are cancelled"""
+        state = self._state(endpoint)
+        policy = state.policy
+        deadline = time.monotonic() + policy.deadline_s
+        self._begin(endpoint, state)
+
+        error: Optional[BaseException] = None
+        for attempt in range(policy.max_attempts):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if attempt:
+                if not state.breaker.allow():
+                    break
+                self._count(state, "retries")
+            started = time.monotonic()
+            try:
+                result = await self._aattempt(state, fn, remaining)
+            except Exception as e:
+                if not is_retryable(e):
+                    state.breaker.record_neutral()
+                    raise
+                error = e
+                state.breaker.record_failure()
+                if _is_timeout(e):
+                    self._count(state, "timeouts")
+                pause = max(policy.backoff(attempt), _retry_after_hint(e))
+                if attempt + 1 < policy.max_attempts and time.monotonic() + pause < deadline:
+                    await asyncio.sleep(pause)
+                continue
+            state.breaker.record_success()
+            state.record_latency(time.monotonic() - started)
+            self._count(state, "successes")
+            return result
+        raise self._failed(endpoint, state, error)
+
+    async def _aattempt(self, state: _EndpointState, fn: Callable[[float], Awaitable[T]], timeout: float) -> T:
+        delay = state.hedge_delay()
+        if delay is None or delay >= timeout:
+            return await asyncio.wait_for(fn(timeout), timeout)
+
+        started = time.monotonic()
+        primary = asyncio.ensure_future(fn(timeout))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not self._take_hedge(state):
+            return await asyncio.wait_for(primary, max(0.0, timeout - (time.monotonic() - started)))
+        hedge = asyncio.ensure_future(fn(timeout - delay))
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                left = timeout - (time.monotonic() - started)
+                if left <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=left, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count(state, "hedge_wins")
+                        return task.result()
+                    error = task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+        if error is not None and not pending:
+            raise error
+        raise TimeoutError(f"attempt exceeded {timeout:.2f}s")
+
+    # ------------------------------------------------------------------
+    # Introspection
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            states = dict(self._states)
+        result = {}
+        for endpoint, state in states.items():
+            delay = state.hedge_delay()
+            result[endpoint] = {
+                **state.counters,
+                "breaker": state.breaker.state,
+                "breaker_opened": state.breaker.opened,
+                "deadline_ms": state.policy.deadline_s * 1000,
+                "hedge_delay_ms": delay * 1000 if delay is not None else None
+            }
+        return result
+
+    def abandoned_in_flight(self) -> int:
+        """Blocking requests still running that nobody waits for"""
+        with self._lock:
+            return self._abandoned_in_flight
+
+    def reset(self) -> None:
+        """Forget breakers, latency history and counters"""
+        with self._lock:
+            self._states.clear()
+
+
+resilience = Resilience(
+    failure_threshold=int(os.getenv("MOODI_BREAKER_FAILURES", "5")),
+    reset_timeout_s=float(os.getenv("MOODI_BREAKER_RESET_S", "10")),
+    hedge_ratio=float(os.getenv("MOODI_HEDGE_RATIO", "0.1")),
+)
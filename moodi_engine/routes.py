@@ -0,0 +1,412 @@
+"""
+MOODI Engine - API routes
+Endpoints shared by the FastAPI app (fastapi_endpoint.py) and the Vercel entrypoint (api/main.py)
+
+Both apps pass `lifespan` to FastAPI and include `router`; only the health
+check and how the app is served differ between them.
+"""
+
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, FastAPI, Header, HTTPException, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import ValidationError
+import json
+import math
+import os
+import time
+from typing import Optional
+
+from moodi_engine import acomplete, acomplete_json, astream_completion, aclose_async_client, usage_tracker
+from moodi_engine.auth import AuthError, authenticated_user
+from moodi_engine.backends import aclose_backends, backends
+from moodi_engine.batch import fan_out
+from moodi_engine.budgets import budget_table, stream_limits, token_budget
+from moodi_engine.fallbacks import FALLBACK_NOTIFICATION, fallback_caption, fallback_reflection
+from moodi_engine.models import (
+    BatchReflectionRequest,
+    MoodPayload,
+    NotificationRequest,
+    NotificationResponse,
+    ReferralCaptionRequest,
+    ReferralCaptionResponse,
+    ReflectionResponse,
+)
+from moodi_engine.notification_catalog import CatalogRefresher, notification_catalog
+from moodi_engine.persistence import UnknownUser, create_reflection_writer, create_store
+from moodi_engine.repair import afix_reflection, reflection_repairer
+from moodi_engine.resilience import UpstreamUnavailable, resilience
+from moodi_engine.routing import classify, router_stats
+from moodi_engine.structured import structured_outputs
+from moodi_engine.validation import SchemaValidationError, decode_reflection
+from moodi_engine.write_behind import BufferFull
+from moodi_engine.prompts import (
+    NOTIFICATION_SYSTEM_PROMPT,
+    REFERRAL_CAPTION_SYSTEM_PROMPT,
+    SYSTEM_PROMPT,
+    build_notification_prompt,
+    build_referral_caption_prompt,
+    build_reflection_prompt,
+)
+from moodi_engine.reflection_cache import make_cache_key, reflection_cache
+from moodi_engine.streaming import IncrementalJSONObjectParser
+from moodi_engine.structured import OUTPUT_SCHEMAS
+
+
+# Background refresh of the notification copy catalog (0 disables it)
+NOTIFICATION_REFRESH_INTERVAL_S = float(os.getenv("MOODI_NOTIFICATION_REFRESH_S", str(6 * 3600)))
+
+
+# Submission store for this worker (None when persistence is not configured)
+# and the write-behind buffer that keeps reflection inserts off the request path
+submission_store = create_store()
+reflection_writer = create_reflection_writer(submission_store)
+
+# Upstream calls in flight per batch request
+BATCH_MAX_CONCURRENCY = int(os.getenv("MOODI_BATCH_MAX_CONCURRENCY", "16"))
+
+# Serve a template reflection (X-Moodi-Fallback header) instead of a 503 when the model is unavailable
+REFLECTION_FALLBACK = os.getenv("MOODI_REFLECTION_FALLBACK", "1") == "1"
+
+# Streamed reflections running this far past their schema are cut off and repaired
+REFLECTION_STREAM_LIMITS = stream_limits(OUTPUT_SCHEMAS["reflection_stream"].schema)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background workers and the store pool; release connection pools on shutdown"""
+    refresher = None
+    if NOTIFICATION_REFRESH_INTERVAL_S > 0:
+        refresher = CatalogRefresher(notification_catalog, interval_s=NOTIFICATION_REFRESH_INTERVAL_S)
+        refresher.start()
+    if submission_store is not None:
+        await submission_store.open()
+    if reflection_writer is not None:
+        await reflection_writer.start()
+    yield
+    if refresher is not None:
+        refresher.stop()
+    # Drain buffered reflections before the pool goes away
+    if reflection_writer is not None:
+        await reflection_writer.close()
+    if submission_store is not None:
+        await submission_store.close()
+    await aclose_async_client()
+    await aclose_backends()
+
+
+router = APIRouter()
+
+
+# ============================================================================
+# API Endpoints
+# ============================================================================
+
+@router.get("/api/metrics")
+async def metrics():
+    """Per-endpoint token usage/latency and cache counters for this worker"""
+    return {
+        "usage": usage_tracker.snapshot(),
+        "reflection_cache": reflection_cache.stats(),
+        "notification_catalog": notification_catalog.stats(),
+        "persistence": submission_store.stats() if submission_store is not None else None,
+        "reflection_writer": reflection_writer.stats() if reflection_writer is not None else None,
+        "resilience": resilience.stats(),
+        "repair": reflection_repairer.stats(),
+        "structured_outputs": structured_outputs.stats(),
+        "backends": backends(),
+        "routing": router_stats.stats(),
+        "token_budgets": budget_table()
+    }
+
+
+def _http_error(error: Exception) -> HTTPException:
+    """
+    503 (with Retry-After) when the model is unavailable, 502 for invalid
+    model output, 401/403 for bad credentials, 404 for an unknown user, else 500
+    """
+    if isinstance(error, AuthError):
+        headers = {"WWW-Authenticate": "Bearer"} if error.status_code == 401 else None
+        return HTTPException(status_code=error.status_code, detail=str(error), headers=headers)
+    if isinstance(error, UnknownUser):
+        return HTTPException(status_code=404, detail=str(error))
+    if isinstance(error, UpstreamUnavailable):
+        return HTTPException(
+            status_code=503, detail=str(error), headers={"Retry-After": str(math.ceil(error.retry_after_s))}
+        )
+    if isinstance(error, (SchemaValidationError, ValidationError)):
+        return HTTPException(status_code=502, detail=f"Invalid model output: {error}")
+    return HTTPException(status_code=500, detail=str(error))
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _reflect(payload: MoodPayload) -> dict:
+    """Generate (or serve from cache) a reflection for one mood payload, validated against RESPONSE_SCHEMA"""
+    mood = payload.model_dump()
+    route = classify(mood)
+    started = time.perf_counter()
+    
+    # Serve payloads without context_text from the reflection cache
+    cache_key = make_cache_key(mood)
+    cached = reflection_cache.get(cache_key)
+    if cached is not None:
+        router_stats.record(route, "cache", (time.perf_counter() - started) * 1000)
+        return cached
+    if route.template:
+        router_stats.record(route, "template", (time.perf_counter() - started) * 1000)
+        return fallback_reflection(mood)
+    
+    # Call OpenAI API (non-blocking) on the routed model
+    result, usage = await acomplete(
+        SYSTEM_PROMPT,
+        build_reflection_prompt(mood),
+        temperature=0.7,
+        model=route.model,
+        endpoint="reflection",
+        max_tokens=route.max_tokens
+    )
+    router_stats.record(route, "model", (time.perf_counter() - started) * 1000, usage)
+    # Near misses are repaired instead of regenerated
+    result, errors = await afix_reflection(result, route.model)
+    if errors:
+        raise SchemaValidationError(errors)
+    if result["safety_flag"] == "ok":
+        reflection_cache.put(cache_key, result)
+    return result
+
+
+async def _store_submission(user_id: str, payload: MoodPayload, row: dict) -> dict:
+    """Store the mood now; the reflection row goes through the write-behind buffer when enabled"""
+    mood = payload.model_dump(exclude={"user_id"})
+    if reflection_writer is None:
+        return await submission_store.submit(user_id, mood, row)
+    
+    stored = await submission_store.submit(user_id, mood)
+    try:
+        await reflection_writer.put({"mood_id": stored["mood_id"], **row})
+    except BufferFull:
+        # Backpressure: write this one inline instead of dropping it
+        await submission_store.insert_reflection(stored["mood_id"], row)
+    return stored
+
+
+@router.post("/api/reflection", response_model=ReflectionResponse)
+async def generate_reflection(payload: MoodPayload, authorization: Optional[str] = Header(None)):
+    """
+    Generate AI reflection for a mood submission
+    
+    This is the primary endpoint that transforms user mood data into
+    empathetic reflections with actionable suggestions. When the payload
+    carries a user_id and a store is configured, the mood and reflection are
+    stored in the same request and `submission` holds the updated streak,
+    coins and new unlocks. Storing requires a Supabase access token for that
+    user (`Authorization: Bearer ...`; 401/403 otherwise, checked before any
+    model call) and an existing profile row (404 otherwise). If the model is unavailable, a template reflection
+    is served with an `X-Moodi-Fallback: template` header (or a 503 when
+    MOODI_REFLECTION_FALLBACK=0).
+    
+    The reflection was already checked against RESPONSE_SCHEMA, so it is
+    returned as-is instead of being validated again through response_model.
+    """
+    headers = {}
+    try:
+        user_id = None
+        if payload.user_id and submission_store is not None:
+            user_id = authenticated_user(authorization, payload.user_id)
+        try:
+            reflection = await _reflect(payload)
+        except UpstreamUnavailable:
+            if not REFLECTION_FALLBACK:
+                raise
+            resilience.record_fallback("reflection")
+            headers["X-Moodi-Fallback"] = "template"
+            reflection = fallback_reflection(payload.model_dump())
+        if user_id is not None:
+            reflection = {**reflection, "submission": await _store_submission(user_id, payload, reflection)}
+        return JSONResponse(reflection, headers=headers)
+        
+    except Exception as e:
+        raise _http_error(e)
+
+
+@router.post("/api/reflection/stream")
+async def stream_reflection(payload: MoodPayload):
+    """
+    Stream an AI reflection as Server-Sent Events
+    
+    Each top-level field is sent as a `field` event ({"field", "value"}) as
+    soon as it closes in the model output. Fields are held back until
+    `safety_flag` is known; the model is asked to write it first, so this
+    normally costs nothing. A final `done` event carries the schema-validated
+    reflection. If validation fails an `error` event is sent instead and
+    clients should discard the fields already received. If the model is
+    unavailable before any field was sent, the template reflection is
+    streamed and the `done` event carries `"fallback": true`. A field that
+    runs well past its schema limit stops the model early; what arrived is
+    trimmed and the missing fields are re-asked by the repair stage.
+    """
+    async def events():
+        mood = payload.model_dump()
+        route = classify(mood)
+        started = time.perf_counter()
+        cache_key = make_cache_key(mood)
+        cached = reflection_cache.get(cache_key)
+        if cached is None and route.template:
+            cached = fallback_reflection(mood)
+        if cached is not None:
+            router_stats.record(route, "template" if route.template else "cache", (time.perf_counter() - started) * 1000)
+            for field, value in cached.items():
+                yield _sse("field", {"field": field, "value": value})
+            yield _sse("done", cached)
+            return
+        
+        user_prompt = build_reflection_prompt(mood) + "\nWrite the safety_flag key first."
+        parser = IncrementalJSONObjectParser(REFLECTION_STREAM_LIMITS)
+        fields = {}
+        held = []
+        safety_known = False
+        try:
+            deltas = astream_completion(
+                SYSTEM_PROMPT, user_prompt, temperature=0.7, model=route.model,
+                endpoint="reflection_stream", max_tokens=route.max_tokens
+            )
+            try:
+                async for delta in deltas:
+                    for field, value in parser.feed(delta):
+                        safety_known = safety_known or field == "safety_flag"
+                        fields[field] = value
+                        held.append((field, value))
+                    if safety_known:
+                        for field, value in held:
+                            yield _sse("field", {"field": field, "value": value})
+                        held = []
+                    if parser.exceeded is not None:
+                        break
+            finally:
+                # Closes the upstream stream when we stopped early
+                await deltas.aclose()
+            
+            if parser.exceeded is not None:
+                # Everything after this point would be trimmed anyway
+                pending = parser.pending()
+                if pending is not None:
+                    fields[pending[0]] = pending[1]
+                reflection, errors = fields, ["stream cut off: " + str(parser.exceeded)]
+            else:
+                # Schema validation still runs on the complete object
+                reflection, errors = decode_reflection(parser.text)
+            if errors:
+                # done carries the repaired object; it supersedes the streamed fields
+                reflection, errors = await afix_reflection(reflection, route.model)
+            if errors:
+                raise SchemaValidationError(errors)
+        except UpstreamUnavailable as e:
+            if not REFLECTION_FALLBACK or parser.text:
+                yield _sse("error", {"detail": str(e), "retry_after_s": e.retry_after_s})
+                return
+            resilience.record_fallback("reflection_stream")
+            fallback = fallback_reflection(payload.model_dump())
+            for field, value in fallback.items():
+                yield _sse("field", {"field": field, "value": value})
+            yield _sse("done", {**fallback, "fallback": True})
+            return
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+        
+        for field, value in held:
+            yield _sse("field", {"field": field, "value": value})
+        if reflection["safety_flag"] == "ok":
+            reflection_cache.put(cache_key, reflection)
+        # Stream usage is recorded per endpoint by the engine, not per tier
+        router_stats.record(route, "model", (time.perf_counter() - started) * 1000)
+        yield _sse("done", reflection)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/api/reflections/batch")
+async def generate_reflections_batch(request: BatchReflectionRequest):
+    """
+    Generate reflections for a batch of mood submissions
+    
+    Identical payloads are generated once. Results stream back as NDJSON,
+    one line per input in completion order:
+    {"index": 0, "reflection": {...}} or {"index": 3, "error": "..."}
+    """
+    async def stream():
+        async for index, reflection, error in fan_out(
+            request.moods,
+            _reflect,
+            key=lambda payload: payload.model_dump_json(exclude={"user_id"}),
+            max_concurrency=BATCH_MAX_CONCURRENCY
+        ):
+            if error is None:
+                line = {"index": index, "reflection": reflection}
+            else:
+                line = {"index": index, "error": str(error)}
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@router.post("/api/notification", response_model=NotificationResponse)
+async def generate_notification(request: NotificationRequest, response: Response):
+    """
+    Generate push notification copy
+    
+    Creates ultra-short, empathetic notification text for mood reminders.
+    """
+    # Precomputed copy first; the model is only the fallback on a miss
+    cached = notification_catalog.get(request.user_locale, request.theme, request.days_streak)
+    if cached is not None:
+        return NotificationResponse(**cached)
+    
+    try:
+        result = await acomplete_json(
+            NOTIFICATION_SYSTEM_PROMPT,
+            build_notification_prompt(request.user_locale, request.theme, request.days_streak),
+            temperature=0.7,
+            endpoint="notification",
+            max_tokens=token_budget("notification", request.user_locale)
+        )
+        return NotificationResponse(**result)
+        
+    except UpstreamUnavailable:
+        resilience.record_fallback("notification")
+        response.headers["X-Moodi-Fallback"] = "template"
+        return NotificationResponse(**FALLBACK_NOTIFICATION)
+    except Exception as e:
+        raise _http_error(e)
+
+
+@router.post("/api/referral-caption", response_model=ReferralCaptionResponse)
+async def generate_referral_caption(request: ReferralCaptionRequest, response: Response):
+    """
+    Generate social share caption for referrals
+    
+    Creates catchy, short captions for social media sharing.
+    """
+    try:
+        result = await acomplete_json(
+            REFERRAL_CAPTION_SYSTEM_PROMPT,
+            build_referral_caption_prompt(request.user_locale, request.mood_emoji, request.benefit),
+            temperature=0.8,
+            endpoint="referral_caption",
+            max_tokens=token_budget("referral_caption", request.user_locale)
+        )
+        return ReferralCaptionResponse(caption=result.get("caption", fallback_caption(request.user_locale)))
+        
+    except UpstreamUnavailable:
+        resilience.record_fallback("referral_caption")
+        response.headers["X-Moodi-Fallback"] = "template"
+        return ReferralCaptionResponse(caption=fallback_caption(request.user_locale))
+    except Exception as e:
+        raise _http_error(e)
@@ -0,0 +1,159 @@
+"""
+MOODI Engine - Reflection routing
+Picks a model tier per mood payload from its intensity and whether the user wrote anything
+
+    trivial  no context_text, low intensity: served from the reflection
+             cache; a miss is generated on the routine tier (filling the
+             cache pool) or, with MOODI_ROUTER_TRIVIAL=template, answered
+             from the template copy without a model call
+    routine  no context_text, intensity up to the routine limit:
+             cheaper/faster model, tighter token budget
+    full     any context_text, and intense moods with or without it: the
+             full model
+
+Free text is never routed below the full model. The local pre-screen cannot
+clear a text (it misses plenty of self-harm phrasing), and /api/reflection
+runs no remote moderation, so the model's own safety_flag is the only safety
+signal on that path and has to come from the full model.
+
+max_tokens is the reflection's token budget for the payload's locale
+(moodi_engine.budgets); the routine and trivial tiers use a smaller headroom
+over the schema size than the full tier.
+
+Thresholds and models come from the environment so they can be tuned
+against the per-tier latency/cost numbers on /api/metrics.
+"""
+
+import os
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from moodi_engine.budgets import token_budget
+from moodi_engine.engine import DEFAULT_MODEL
+from moodi_engine.metrics import UsageTracker, estimate_cost
+
+ROUTER_ENABLED = os.getenv("MOODI_ROUTER", "1") == "1"
+TRIVIAL_MODE = os.getenv("MOODI_ROUTER_TRIVIAL", "cache")  # "cache" or "template"
+
+ROUTINE_MODEL = os.getenv("MOODI_ROUTINE_MODEL", "gpt-4.1-nano")
+ROUTINE_BUDGET_HEADROOM = float(os.getenv("MOODI_ROUTINE_BUDGET_HEADROOM", "1.15"))
+FULL_MODEL = os.getenv("MOODI_FULL_MODEL", DEFAULT_MODEL)
+
+# Complexity thresholds
+TRIVIAL_MAX_INTENSITY = int(os.getenv("MOODI_ROUTER_TRIVIAL_MAX_INTENSITY", "4"))
+ROUTINE_MAX_INTENSITY = int(os.getenv("MOODI_ROUTER_ROUTINE_MAX_INTENSITY", "7"))
+
+TIERS = ("trivial", "routine", "full")
+
+
+class Route:
+    """Routing decision for one payload"""
+
+    __slots__ = ("tier", "model", "max_tokens", "template", "reasons")
+
+    def __init__(self, tier: str, model: str, max_tokens: Optional[int], template: bool, reasons: List[str]):
+        self.tier = tier
+        self.model = model
+        self.max_tokens = max_tokens
+        self.template = template
+        self.reasons = reasons
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"tier": self.tier, "model": self.model, "max_tokens": self.max_tokens, "reasons": self.reasons}
+
+
+def classify(mood_payload: Dict[str, Any]) -> Route:
+    """
+    Pick a payload's tier from its intensity and context_text
+
+    Returns:
+        Route with the tier, the model and max_tokens to call, whether a
+        trivial miss is served from the template copy, and the reasons
+    """
+    locale = mood_payload.get("user_locale")
+    full_budget = token_budget("reflection", locale)
+    if not ROUTER_ENABLED:
+        return Route("full", FULL_MODEL, full_budget, False, ["router disabled"])
+
+    context_text = (mood_payload.get("context_text") or "").strip()
+    intensity = mood_payload.get("intensity_0_10") or 0
+    routine_budget = token_budget("reflection", locale, ROUTINE_BUDGET_HEADROOM)
+    routine = Route("routine", ROUTINE_MODEL, routine_budget, False, [])
+
+    if not context_text:
+        if intensity <= TRIVIAL_MAX_INTENSITY:
+            return Route("trivial", ROUTINE_MODEL, routine_budget, TRIVIAL_MODE == "template", ["no context, low intensity"])
+        # Intense moods get the full model whether or not the user wrote anything
+        if intensity > ROUTINE_MAX_INTENSITY:
+            return Route("full", FULL_MODEL, full_budget, False, ["no context", f"intensity {intensity}"])
+        routine.reasons.append("no context")
+        return routine
+
+    # Free text may carry risk the pre-screen cannot see; see the module docstring
+    return Route("full", FULL_MODEL, full_budget, False, ["context text"])
+
+
+class RouterStats:
+    """Per-tier request counts, how they were served, latency, tokens and estimated cost"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._usage = UsageTracker()
+        self._served: Dict[str, Counter] = {tier: Counter() for tier in TIERS}
+        self._cost: Dict[str, float] = {tier: 0.0 for tier in TIERS}
+        self._reasons: Counter = Counter()
+
+    def record(
+        self, route: Route, served_by: str, latency_ms: float, usage: Optional[Dict[str, int]] = None
+    ) -> None:
+        """
+        Args:
+            route: Decision the request was handled under
+            served_by: "cache", "template" or "model"
+            latency_ms: Time to produce the reflection
+            usage: Token usage when the model was called
+        """
+        with self._lock:
+            self._served[route.tier][served_by] += 1
+            self._reasons.update(route.reasons)
+            if usage is not None:
+                self._cost[route.tier] += estimate_cost(route.model, usage)
+        self._usage.record(
+            route.tier, usage or {"prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}, latency_ms
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        usage = self._usage.snapshot()
+        with self._lock:
+            tiers = {}
+            for tier in TIERS:
+                requests = sum(self._served[tier].values())
+                tier_usage = usage.get(tier, {})
+                tiers[tier] = {
+                    "requests": requests,
+                    "served_by": dict(self._served[tier]),
+                    "prompt_tokens": tier_usage.get("prompt_tokens", 0),
+                    "completion_tokens": tier_usage.get("completion_tokens", 0),
+                    "cost_usd": round(self._cost[tier], 6),
+                    "cost_per_request_usd": self._cost[tier] / requests if requests else 0.0,
+                    "latency_p50_ms": tier_usage.get("latency_p50_ms", 0.0),
+                    "latency_p95_ms": tier_usage.get("latency_p95_ms", 0.0)
+                }
+            return {
+                "enabled": ROUTER_ENABLED,
+                "models": {"routine": ROUTINE_MODEL, "full": FULL_MODEL},
+                "tiers": tiers,
+                "reasons": dict(self._reasons)
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._usage.reset()
+            for tier in TIERS:
+                self._served[tier].clear()
+                self._cost[tier] = 0.0
+            self._reasons.clear()
+
+
+router_stats = RouterStats()
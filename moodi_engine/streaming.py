@@ -0,0 +1,146 @@
+"""
+MOODI Engine - Streaming JSON
+Incremental parser that reports top-level JSON object fields as soon as they close
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class OutputLimitExceeded:
+    """A streamed field ("*" for the whole object) that ran past its character limit"""
+
+    __slots__ = ("field", "length", "limit")
+
+    def __init__(self, field: str, length: int, limit: int):
+        self.field = field
+        self.length = length
+        self.limit = limit
+
+    def __str__(self) -> str:
+        return f"{self.field} reached {self.length} characters (limit {self.limit})"
+
+
+class IncrementalJSONObjectParser:
+    """
+    Feed a streamed JSON object chunk by chunk and collect completed fields
+
+    Only top-level fields are reported; nested arrays/objects are returned
+    whole once their closing bracket arrives.
+
+    Example:
+        parser = IncrementalJSONObjectParser()
+        parser.feed('{"a": "x", "b"')   # -> [("a", "x")]
+        parser.feed(': [1, 2]}')        # -> [("b", [1, 2])]
+
+    Args:
+        limits: Optional raw-character limits per top-level field, with "*"
+            for the whole object (see moodi_engine.budgets.stream_limits);
+            once one is passed, `exceeded` is set so the caller can stop
+            the stream instead of paying for the rest
+    """
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None):
+        self.limits = limits or {}
+        self.exceeded: Optional[OutputLimitExceeded] = None
+        self.text = ""
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expecting_key = False
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self._value_kind: Optional[str] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Append a chunk and return the fields completed by it"""
+        self.text += chunk
+        completed: List[Tuple[str, Any]] = []
+        text = self.text
+
+        for i in range(self._pos, len(text)):
+            char = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        if self._key_start is not None:
+                            self._key = json.loads(text[self._key_start:i + 1])
+                            self._key_start = None
+                        elif self._value_kind == "string":
+                            self._emit(completed, text[self._value_start:i + 1])
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    if self._expecting_key:
+                        self._key_start = i
+                    elif self._value_start is None:
+                        self._value_start, self._value_kind = i, "string"
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._expecting_key = True
+                elif self._depth == 2 and self._value_start is None:
+                    self._value_start, self._value_kind = i, "container"
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._value_kind == "container":
+                    self._emit(completed, text[self._value_start:i + 1])
+                elif self._depth == 0:
+                    if self._value_kind == "scalar":
+                        self._emit(completed, text[self._value_start:i])
+                    self.done = True
+            elif self._depth == 1:
+                if char == ":":
+                    self._expecting_key = False
+                elif char == ",":
+                    if self._value_kind == "scalar":
+                        self._emit(completed, text[self._value_start:i])
+                    self._expecting_key = True
+                    self._value_start = self._value_kind = None
+                elif not char.isspace() and not self._expecting_key and self._value_start is None:
+                    self._value_start, self._value_kind = i, "scalar"
+
+        self._pos = len(text)
+        if self.limits and not self.done and self.exceeded is None:
+            self.exceeded = self._check_limits()
+        return completed
+
+    def _check_limits(self) -> Optional[OutputLimitExceeded]:
+        total = self.limits.get("*")
+        if total is not None and len(self.text) > total:
+            return OutputLimitExceeded("*", len(self.text), total)
+        if self._value_start is None or self._value_kind == "emitted":
+            return None
+        limit = self.limits.get(self._key)
+        length = len(self.text) - self._value_start
+        if limit is not None and length > limit:
+            return OutputLimitExceeded(self._key, length, limit)
+        return None
+
+    def pending(self) -> Optional[Tuple[str, Any]]:
+        """The top-level string value still streaming, closed off where it stands"""
+        if not self._in_string or self._depth != 1 or self._value_kind != "string":
+            return None
+        raw = self.text[self._value_start:]
+        # Drop a half-received escape (a trailing \\ or \\uXXX) before closing the string
+        for cut in range(len(raw), max(len(raw) - 6, 0), -1):
+            try:
+                return self._key, json.loads(raw[:cut] + '"')
+            except ValueError:
+                continue
+        return None
+
+    def _emit(self, completed: List[Tuple[str, Any]], raw: str) -> None:
+        completed.append((self._key, json.loads(raw)))
+        self._value_kind = "emitted"
@@ -0,0 +1,220 @@
+"""
+MOODI Engine - Structured outputs
+Strict json_schema response formats per endpoint, with json_object fallback and per-mode output metrics
+
+In "json_object" mode (the default) the schema is only described in the
+system prompt. In "strict" mode (MOODI_STRUCTURED_OUTPUTS=strict) endpoints
+with a schema send it as a strict `json_schema` response format, so the
+model is constrained to the right keys, types and enums.
+
+Strict mode accepts a subset of JSON schema: every property must be required,
+objects must set additionalProperties false, and length/count limits
+(maxLength, minItems, ...) are not accepted. Those limits are moved into the
+field descriptions instead and are still enforced locally by the compiled
+validators and moodi_engine.repair.
+
+A model or deployment that rejects json_schema is remembered and served
+with json_object from then on, without failing the request.
+"""
+
+import copy
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+from moodi_engine.prompts import (
+    NOTIFICATION_CATALOG_SCHEMA,
+    NOTIFICATION_SCHEMA,
+    REFERRAL_CAPTION_SCHEMA,
+    RESPONSE_SCHEMA,
+    SAFETY_CLASSIFIER_SCHEMA,
+)
+from moodi_engine.validation import compile_validator, validate_reflection
+
+STRUCTURED_OUTPUTS = os.getenv("MOODI_STRUCTURED_OUTPUTS", "json_object")
+
+JSON_OBJECT_FORMAT = {"type": "json_object"}
+
+# Keywords strict mode accepts; everything else is stripped
+_STRICT_KEYWORDS = frozenset({
+    "type", "properties", "required", "additionalProperties", "items", "enum", "description", "anyOf", "$defs", "$ref"
+})
+
+
+def _describe(schema: Dict[str, Any]) -> Optional[str]:
+    """Stripped limits as a field description the model still reads"""
+    limits = []
+    if "maxLength" in schema:
+        limits.append(f"at most {schema['maxLength']} characters")
+    if "minLength" in schema:
+        limits.append(f"at least {schema['minLength']} characters")
+    if "minItems" in schema and "maxItems" in schema:
+        limits.append(f"{schema['minItems']}-{schema['maxItems']} items")
+    elif "minItems" in schema:
+        limits.append(f"at least {schema['minItems']} items")
+    elif "maxItems" in schema:
+        limits.append(f"at most {schema['maxItems']} items")
+    parts = [schema["description"]] if schema.get("description") else []
+    if limits:
+        parts.append(", ".join(limits))
+    return "; ".join(parts) or None
+
+
+def strict_schema(schema: Dict[str, Any], first: tuple = ()) -> Dict[str, Any]:
+    """
+    Convert a validation schema into one strict mode accepts
+
+    Args:
+        schema: JSON schema dict (not modified)
+        first: Top-level properties to move to the front; strict outputs
+            follow property order, so this controls what streams first
+
+    Returns:
+        Schema with unsupported keywords stripped (limits kept as
+        descriptions), all properties required and additionalProperties false
+    """
+    converted = {key: copy.deepcopy(value) for key, value in schema.items() if key in _STRICT_KEYWORDS}
+    description = _describe(schema)
+    if description:
+        converted["description"] = description
+
+    if schema.get("type") == "object":
+        properties = schema.get("properties", {})
+        order = [field for field in first if field in properties]
+        order += [field for field in properties if field not in order]
+        converted["properties"] = {field: strict_schema(properties[field]) for field in order}
+        converted["required"] = order
+        converted["additionalProperties"] = False
+    if "items" in schema:
+        converted["items"] = strict_schema(schema["items"])
+    return converted
+
+
+class OutputSchema:
+    """Response schema of one endpoint: local validator plus its strict response format"""
+
+    def __init__(
+        self,
+        name: str,
+        schema: Dict[str, Any],
+        validator: Optional[Callable[[Any], List[str]]] = None,
+        first: tuple = (),
+    ):
+        self.name = name
+        self.schema = schema
+        self.validator = validator or compile_validator(schema, f"validate_{name}")
+        self.response_format = {
+            "type": "json_schema",
+            "json_schema": {"name": name, "strict": True, "schema": strict_schema(schema, first)}
+        }
+
+
+# Endpoint name -> schema of its output. The stream asks for safety_flag first
+# so held-back fields can be released early.
+_reflection_stream = OutputSchema("reflection", RESPONSE_SCHEMA, validate_reflection, first=("safety_flag",))
+OUTPUT_SCHEMAS: Dict[str, OutputSchema] = {
+    "reflection": OutputSchema("reflection", RESPONSE_SCHEMA, validate_reflection),
+    "reflection_stream": _reflection_stream,
+    "notification": OutputSchema("notification", NOTIFICATION_SCHEMA),
+    "notification_catalog": OutputSchema("notification_catalog", NOTIFICATION_CATALOG_SCHEMA),
+    "referral_caption": OutputSchema("referral_caption", REFERRAL_CAPTION_SCHEMA),
+    "safety_classifier": OutputSchema("safety_classifier", SAFETY_CLASSIFIER_SCHEMA),
+}
+
+
+def is_unsupported_error(exc: BaseException) -> bool:
+    """Whether a request failed because the model/deployment does not support json_schema"""
+    if getattr(exc, "status_code", None) != 400:
+        return False
+    message = str(exc).lower()
+    return "json_schema" in message or "response_format" in message
+
+
+class StructuredOutputs:
+    """
+    Chooses the response format per call and records output quality per mode
+
+    Args:
+        mode: "strict" or "json_object"
+    """
+
+    def __init__(self, mode: str = "json_object"):
+        self.mode = mode
+        self._unsupported: set = set()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"outputs": 0, "invalid": 0, "unparseable": 0, "retries": 0}
+        )
+        self._downgrades = 0
+
+    def mode_for(self, endpoint: str, model: str) -> str:
+        """Response format mode a call to `endpoint` on `model` uses"""
+        if self.mode == "strict" and endpoint in OUTPUT_SCHEMAS and model not in self._unsupported:
+            return "strict"
+        return "json_object"
+
+    def response_format(self, endpoint: str, model: str) -> Dict[str, Any]:
+        if self.mode_for(endpoint, model) == "strict":
+            return OUTPUT_SCHEMAS[endpoint].response_format
+        return JSON_OBJECT_FORMAT
+
+    def mark_unsupported(self, model: str, exc: BaseException) -> None:
+        """Serve `model` with json_object from now on"""
+        with self._lock:
+            if model not in self._unsupported:
+                self._unsupported.add(model)
+                self._downgrades += 1
+                print(f"Strict structured outputs unsupported for {model}, using json_object: {exc}")
+
+    def record_output(self, endpoint: str, mode: str, data: Any) -> None:
+        """Validate a decoded output against its endpoint schema and count the result"""
+        output_schema = OUTPUT_SCHEMAS.get(endpoint)
+        if output_schema is None:
+            return
+        invalid = bool(output_schema.validator(data))
+        with self._lock:
+            counters = self._counters[mode]
+            counters["outputs"] += 1
+            counters["invalid"] += invalid
+
+    def record_unparseable(self, endpoint: str, mode: str) -> None:
+        """An output that was not valid JSON at all"""
+        if endpoint not in OUTPUT_SCHEMAS:
+            return
+        with self._lock:
+            counters = self._counters[mode]
+            counters["outputs"] += 1
+            counters["invalid"] += 1
+            counters["unparseable"] += 1
+
+    def record_retry(self, endpoint: str, model: str) -> None:
+        """A follow-up completion spent on an invalid output (moodi_engine.repair re-asks)"""
+        with self._lock:
+            self._counters[self.mode_for(endpoint, model)]["retries"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            modes = {}
+            for mode, counters in self._counters.items():
+                outputs = counters["outputs"]
+                modes[mode] = {
+                    **counters,
+                    "invalid_rate": counters["invalid"] / outputs if outputs else 0.0,
+                    "retry_rate": counters["retries"] / outputs if outputs else 0.0
+                }
+            return {
+                "mode": self.mode,
+                "unsupported_models": sorted(self._unsupported),
+                "downgrades": self._downgrades,
+                "modes": modes
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._unsupported.clear()
+            self._downgrades = 0
+
+
+structured_outputs = StructuredOutputs(STRUCTURED_OUTPUTS)
@@ -0,0 +1,56 @@
+"""
+MOODI Engine - Mood submissions
+Stores a mood, its reflection and earned unlocks through submit_mood() in one round trip
+
+The database function locks the user row, so streak and coin updates read
+the current state instead of a caller-supplied (possibly stale) profile.
+"""
+
+import json
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+SUBMIT_MOOD_SQL = """
+SELECT mood_id, streak_days, moodcoins, coins_awarded, new_unlocks
+FROM public.submit_mood(%s::uuid, %s::jsonb, %s::jsonb, %s::text[], %s::int[])
+"""
+
+
+def submit_mood(
+    conn,
+    user_id: str,
+    mood_payload: Dict[str, Any],
+    reflection: Optional[Dict[str, Any]] = None,
+    unlocks: Sequence[Tuple[str, int]] = (),
+) -> Dict[str, Any]:
+    """
+    Insert a mood and apply gamification in a single transaction
+
+    Args:
+        conn: psycopg2 connection
+        user_id: User UUID
+        mood_payload: Mood fields (keys the moods table does not have are ignored)
+        reflection: Validated reflection to store, or None to skip
+        unlocks: (unlock_type, coin_threshold) catalog entries
+
+    Returns:
+        Dict with mood_id, streak_days, moodcoins, coins_awarded and
+        new_unlocks (only unlocks granted by this submission)
+    """
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute(SUBMIT_MOOD_SQL, (
+                user_id,
+                json.dumps(mood_payload, ensure_ascii=False),
+                json.dumps(reflection, ensure_ascii=False) if reflection is not None else None,
+                [unlock_type for unlock_type, _ in unlocks],
+                [threshold for _, threshold in unlocks]
+            ))
+            mood_id, streak_days, moodcoins, coins_awarded, new_unlocks = cur.fetchone()
+
+    return {
+        "mood_id": str(mood_id),
+        "streak_days": streak_days,
+        "moodcoins": moodcoins,
+        "coins_awarded": coins_awarded,
+        "new_unlocks": list(new_unlocks)
+    }
@@ -0,0 +1,184 @@
+"""
+MOODI Engine - Response validation
+Validators compiled from JSON schemas (RESPONSE_SCHEMA) into one-pass Python checks
+
+compile_validator() turns a schema into the source of a single function that
+walks the parsed JSON once and returns a list of error messages (empty when
+valid). The engine, validate_response() and the API endpoints all use the
+same compiled reflection validator, so there is one set of rules.
+"""
+
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from moodi_engine.prompts import RESPONSE_SCHEMA
+
+try:
+    import orjson
+except ImportError:  # optional: faster decoding
+    orjson = None
+
+
+class SchemaValidationError(ValueError):
+    """Model output that does not match its response schema"""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def loads(raw) -> Any:
+    """Decode JSON text (str or bytes) with orjson when installed"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+# ============================================================================
+# Schema compiler
+# ============================================================================
+
+_TYPE_CHECKS = {
+    "string": ("isinstance({v}, str)", "a string"),
+    "array": ("isinstance({v}, list)", "an array"),
+    "object": ("isinstance({v}, dict)", "an object"),
+    "boolean": ("isinstance({v}, bool)", "a boolean"),
+    "integer": ("(isinstance({v}, int) and not isinstance({v}, bool))", "an integer"),
+    "number": ("(isinstance({v}, (int, float)) and not isinstance({v}, bool))", "a number"),
+}
+
+
+class _Compiler:
+    """Emits the body of a validator function, one line at a time"""
+
+    def __init__(self):
+        self.lines: List[str] = []
+        self.constants: Dict[str, Any] = {}
+        self._names = 0
+
+    def name(self, prefix: str) -> str:
+        self._names += 1
+        return f"{prefix}{self._names}"
+
+    def emit(self, indent: int, line: str) -> None:
+        self.lines.append("    " * indent + line)
+
+    def node(self, schema: Dict[str, Any], var: str, label: str, indent: int) -> None:
+        """Checks for value `var`; messages name it by `label`, a Python expression"""
+        kind = schema.get("type")
+        if kind in _TYPE_CHECKS:
+            check, noun = _TYPE_CHECKS[kind]
+            self.emit(indent, f"if not {check.format(v=var)}:")
+            self.emit(indent + 1, f"errors.append('%s must be {noun}' % ({label},))")
+            self.emit(indent, "else:")
+            indent += 1
+        start = len(self.lines)
+
+        if "enum" in schema:
+            allowed = self.name("_enum")
+            self.constants[allowed] = frozenset(schema["enum"])
+            choices = " or ".join(repr(value) for value in schema["enum"])
+            self.emit(indent, f"if {var} not in {allowed}:")
+            self.emit(indent + 1, f"errors.append(\"%s must be {choices}, got '%s'\" % ({label}, {var}))")
+
+        if kind == "string":
+            if "maxLength" in schema:
+                limit = schema["maxLength"]
+                self.emit(indent, f"if len({var}) > {limit}:")
+                self.emit(indent + 1, f"errors.append('%s too long: %d chars (max {limit})' % ({label}, len({var})))")
+            if "minLength" in schema:
+                limit = schema["minLength"]
+                self.emit(indent, f"if len({var}) < {limit}:")
+                self.emit(indent + 1, f"errors.append('%s too short: %d chars (min {limit})' % ({label}, len({var})))")
+
+        if kind == "array":
+            low, high = schema.get("minItems"), schema.get("maxItems")
+            if low is not None or high is not None:
+                bounds = " and ".join(
+                    part for part in (
+                        f"len({var}) >= {low}" if low is not None else "",
+                        f"len({var}) <= {high}" if high is not None else "",
+                    ) if part
+                )
+                span = f"{low if low is not None else 0}-{high}" if high is not None else f"at least {low}"
+                self.emit(indent, f"if not ({bounds}):")
+                self.emit(indent + 1, f"errors.append('%s must have {span} items, got %d' % ({label}, len({var})))")
+            if "items" in schema:
+                index, item = self.name("_i"), self.name("_item")
+                self.emit(indent, f"for {index}, {item} in enumerate({var}):")
+                self.node(schema["items"], item, f"'%s[%d]' % ({label}, {index})", indent + 1)
+
+        if kind == "object":
+            self.object(schema, var, label, indent)
+
+        if len(self.lines) == start:
+            self.emit(indent, "pass")
+
+    def object(self, schema: Dict[str, Any], var: str, label: Optional[str], indent: int) -> None:
+        properties = schema.get("properties", {})
+
+        # Fields of the top-level object are named bare, nested ones as parent.field
+        def field_label(field: str) -> str:
+            return repr(field) if label is None else f"{label} + {'.' + field!r}"
+
+        for field in schema.get("required", []):
+            self.emit(indent, f"if {field!r} not in {var}:")
+            self.emit(indent + 1, f"errors.append('Missing required field: %s' % ({field_label(field)},))")
+        if schema.get("additionalProperties") is False:
+            known = self.name("_known")
+            self.constants[known] = frozenset(properties)
+            key = self.name("_key")
+            self.emit(indent, f"if len({var}) > {len(properties)} or not {var}.keys() <= {known}:")
+            self.emit(indent + 1, f"for {key} in {var}:")
+            self.emit(indent + 2, f"if {key} not in {known}:")
+            self.emit(indent + 3, f"errors.append('Unexpected field: %s' % ({field_label('') + ' + ' if label else ''}{key},))")
+        for field, subschema in properties.items():
+            value = self.name("_v")
+            self.emit(indent, f"{value} = {var}.get({field!r}, _MISSING)")
+            self.emit(indent, f"if {value} is not _MISSING:")
+            self.node(subschema, value, field_label(field), indent + 1)
+
+
+def compile_validator(schema: Dict[str, Any], name: str = "validate") -> Callable[[Any], List[str]]:
+    """
+    Compile a JSON schema into a one-pass validator
+
+    Supports the keywords our schemas use: type, properties, required,
+    additionalProperties (false), enum, minLength/maxLength, items and
+    minItems/maxItems. The top level must be an object.
+
+    Args:
+        schema: JSON schema dict
+        name: Function name (shows up in tracebacks)
+
+    Returns:
+        Function taking parsed JSON and returning a list of error messages
+    """
+    compiler = _Compiler()
+    compiler.emit(1, "errors = []")
+    compiler.emit(1, "if not isinstance(data, dict):")
+    compiler.emit(2, "return ['response must be an object']")
+    compiler.object(schema, "data", None, 1)
+    compiler.emit(1, "return errors")
+    source = f"def {name}(data):\n" + "\n".join(compiler.lines) + "\n"
+
+    namespace: Dict[str, Any] = {"_MISSING": object(), **compiler.constants}
+    exec(compile(source, f"<schema validator {name}>", "exec"), namespace)
+    validator = namespace[name]
+    validator.source = source
+    return validator
+
+
+# Shared reflection validator
+validate_reflection = compile_validator(RESPONSE_SCHEMA, "validate_reflection")
+
+
+def decode_reflection(raw) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Decode model output and validate it against RESPONSE_SCHEMA in one step
+
+    Returns:
+        Tuple of (parsed object, list of errors)
+    """
+    data = loads(raw)
+    return data, validate_reflection(data)
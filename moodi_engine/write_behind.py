@@ -0,0 +1,425 @@
+"""
+MOODI Engine - Write-behind buffer
+Batches rows off the request path and flushes them every N rows or M milliseconds
+
+Every accepted row is first appended to a local spill segment (JSONL). A
+segment is deleted only after all of its rows were flushed, so rows survive a
+crash and are replayed by the next worker that starts with the same spill
+directory. Live segments are flock()ed by their writer, so workers sharing a
+directory never replay each other's open segments. Lines that cannot be
+decoded on replay (a row torn by the crash) are moved to <segment>.corrupt.
+
+Segments are append-only. Progress through a partly flushed segment is kept
+in <segment>.offset (the number of leading lines already flushed), written to
+a temp file, fsynced and renamed into place, so a crash at any point leaves
+either the old or the new offset and never loses unflushed rows.
+
+A segment whose flush keeps failing is retried with backoff. After
+max_attempts failures its head chunk is flushed one row at a time and rows
+that fail with a non-transient error (e.g. a foreign key violation for a
+deleted user) go to <name>.dead.jsonl, so one bad row cannot block every
+later segment.
+"""
+
+import asyncio
+import fcntl
+import glob
+import json
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from moodi_engine.resilience import is_retryable
+
+
+class BufferFull(Exception):
+    """Raised by put() when the buffer stays at max_pending for put_timeout_s"""
+
+
+def _read_offset(path: str) -> int:
+    try:
+        with open(path, encoding="utf-8") as handle:
+            return int(handle.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _write_offset(path: str, offset: int) -> None:
+    """Replace the offset file atomically (temp file, fsync, rename)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        handle.write(str(offset))
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+
+
+class _Segment:
+    """
+    Rows of one flush batch and their spill file
+
+    The open handle holds an exclusive flock for as long as the rows are
+    outstanding; discard() deletes the file once they are flushed. `lines`
+    holds the file line of each outstanding row.
+    """
+
+    def __init__(
+        self,
+        path: str = "",
+        handle=None,
+        rows: Optional[List[Dict[str, Any]]] = None,
+        lines: Optional[List[int]] = None,
+    ):
+        self.path = path
+        self.handle = handle
+        self.rows: List[Dict[str, Any]] = rows if rows is not None else []
+        self.lines: List[int] = lines if lines is not None else list(range(len(self.rows)))
+        self.next_line = self.lines[-1] + 1 if self.lines else 0
+        self.attempts = 0
+
+    @property
+    def offset_path(self) -> str:
+        return f"{self.path}.offset"
+
+    def append(self, row: Dict[str, Any], fsync: bool) -> None:
+        self.rows.append(row)
+        self.lines.append(self.next_line)
+        self.next_line += 1
+        if self.handle is not None:
+            self.handle.write(json.dumps(row, ensure_ascii=False) + "\n")
+            self.handle.flush()
+            if fsync:
+                os.fsync(self.handle.fileno())
+
+    def drop_flushed(self, count: int) -> None:
+        """Forget the first `count` rows so a later retry does not repeat them"""
+        offset = self.lines[count - 1] + 1
+        self.rows = self.rows[count:]
+        self.lines = self.lines[count:]
+        if self.path and self.rows:
+            _write_offset(self.offset_path, offset)
+
+    def release(self) -> None:
+        """Close the file (and its lock), keeping it on disk for a later replay"""
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+    def discard(self) -> None:
+        if self.path:
+            # The segment goes first: a leftover offset file is harmless, a
+            # segment without its offset would be replayed from the start
+            for path in (self.path, self.offset_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        self.release()
+
+
+class WriteBehindBuffer:
+    """
+    Async write-behind buffer with size/time flushing, backpressure and a spill file
+
+    Args:
+        flush: Coroutine that writes a list of rows (e.g. multi-row INSERT/COPY)
+        max_rows: Flush as soon as this many rows are buffered
+        max_delay_ms: Flush rows at the latest this long after they were buffered
+        max_pending: Rows buffered or being flushed before put() waits
+        put_timeout_s: How long put() waits for room before raising BufferFull
+        spill_dir: Directory for spill segments (None keeps rows in memory only)
+        fsync: fsync every row (survives power loss, not just process crashes)
+        name: Prefix of the spill segment files
+        max_attempts: Failed flushes of a segment before its rows are tried
+            one by one and rejected ones dead-lettered
+        is_transient: Whether a flush error may go away on its own (such
+            rows are never dead-lettered)
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[List[Dict[str, Any]]], Awaitable[None]],
+        max_rows: int = 500,
+        max_delay_ms: float = 250.0,
+        max_pending: int = 10_000,
+        put_timeout_s: float = 1.0,
+        spill_dir: Optional[str] = None,
+        fsync: bool = False,
+        name: str = "rows",
+        max_attempts: int = 5,
+        is_transient: Callable[[BaseException], bool] = is_retryable,
+    ):
+        self.flush = flush
+        self.max_rows = max_rows
+        self.max_delay_s = max_delay_ms / 1000
+        self.max_pending = max_pending
+        self.put_timeout_s = put_timeout_s
+        self.spill_dir = spill_dir
+        self.fsync = fsync
+        self.name = name
+        self.max_attempts = max_attempts
+        self.is_transient = is_transient
+        self._segment: Optional[_Segment] = None
+        self._oldest: Optional[float] = None
+        self._retry: List[_Segment] = []
+        self._retry_at = 0.0
+        self._pending = 0
+        self._wake: Optional[asyncio.Event] = None
+        self._room: Optional[asyncio.Condition] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.metrics = {
+            "accepted": 0, "flushed": 0, "flushes": 0, "failures": 0,
+            "replayed": 0, "rejected": 0, "corrupt": 0, "dead_lettered": 0,
+            "last_flush_ms": 0.0
+        }
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self) -> None:
+        """Replay segments left by crashed workers and start the flusher"""
+        self._wake = asyncio.Event()
+        self._room = asyncio.Condition()
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            self._retry = self._orphaned_segments()
+            replayed = sum(len(segment.rows) for segment in self._retry)
+            self._pending += replayed
+            self.metrics["replayed"] += replayed
+        self._segment = self._new_segment()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self, timeout_s: float = 10.0) -> None:
+        """
+        Flush what is buffered and stop (the FastAPI lifespan drain hook)
+
+        Rows that cannot be flushed within `timeout_s` stay in their spill
+        segments and are replayed on the next start.
+        """
+        if self._task is None:
+            return
+        self._closing = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout_s)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+        self._task = None
+        for segment in self._retry:
+            segment.release()
+        if self._segment.rows:
+            self._segment.release()
+        else:
+            self._segment.discard()
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    async def put(self, row: Dict[str, Any]) -> None:
+        """
+        Buffer one row, waiting while max_pending rows are outstanding
+
+        Raises:
+            BufferFull: No room within put_timeout_s (or the buffer is closing)
+        """
+        if self._closing or self._task is None:
+            self.metrics["rejected"] += 1
+            raise BufferFull(f"{self.name} buffer is not accepting rows")
+        if self._pending >= self.max_pending:
+            async with self._room:
+                try:
+                    await asyncio.wait_for(
+                        self._room.wait_for(lambda: self._pending < self.max_pending), self.put_timeout_s
+                    )
+                except asyncio.TimeoutError:
+                    self.metrics["rejected"] += 1
+                    raise BufferFull(f"{self.name} buffer holds {self._pending} rows") from None
+
+        self._segment.append(row, self.fsync)
+        self._pending += 1
+        self.metrics["accepted"] += 1
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+            self._wake.set()
+        elif len(self._segment.rows) >= self.max_rows:
+            self._wake.set()
+
+    # ------------------------------------------------------------------
+    # Flusher
+    # ------------------------------------------------------------------
+
+    def _due_in(self) -> Optional[float]:
+        """Seconds until the next flush is due (None: nothing to flush)"""
+        now = time.monotonic()
+        if len(self._segment.rows) >= self.max_rows:
+            return 0.0
+        due = []
+        if self._oldest is not None:
+            due.append(self._oldest + self.max_delay_s - now)
+        if self._retry:
+            due.append(self._retry_at - now)
+        return min(due) if due else None
+
+    async def _run(self) -> None:
+        backoff = self.max_delay_s
+        while True:
+            while not self._closing:
+                self._wake.clear()
+                due = self._due_in()
+                if due is not None and due <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._wake.wait(), due)
+                except asyncio.TimeoutError:
+                    pass
+
+            # Swap segments without awaiting: the batch is exactly what was spilled into it
+            if self._segment.rows:
+                self._retry.append(self._segment)
+                self._segment = self._new_segment()
+                self._oldest = None
+
+            failed = False
+            while self._retry and not failed:
+                segment = self._retry[0]
+                try:
+                    await self._flush_segment(segment)
+                except Exception as e:
+                    failed = True
+                    segment.attempts += 1
+                    self.metrics["failures"] += 1
+                    print(f"Write-behind flush of {len(segment.rows)} {self.name} failed: {e}")
+                    if segment.attempts >= self.max_attempts:
+                        failed = not await self._isolate(segment)
+                else:
+                    self._retry.pop(0)
+
+            if failed:
+                self._retry_at = time.monotonic() + backoff
+                backoff = min(backoff * 2, 5.0)
+            else:
+                backoff = self.max_delay_s
+            if self._closing and (failed or not (self._retry or self._segment.rows)):
+                return
+
+    async def _flush_segment(self, segment: _Segment) -> None:
+        while segment.rows:
+            chunk = segment.rows[:self.max_rows]
+            started = time.perf_counter()
+            await self.flush(chunk)
+            self.metrics["last_flush_ms"] = (time.perf_counter() - started) * 1000
+            self.metrics["flushes"] += 1
+            self.metrics["flushed"] += len(chunk)
+            await self._drop(segment, len(chunk))
+        segment.discard()
+
+    async def _drop(self, segment: _Segment, count: int) -> None:
+        segment.drop_flushed(count)
+        self._pending -= count
+        async with self._room:
+            self._room.notify_all()
+
+    async def _isolate(self, segment: _Segment) -> bool:
+        """
+        Flush the head chunk of a failing segment one row at a time
+
+        Returns:
+            True when the chunk is cleared (flushed or dead-lettered); False
+            when a row failed with a transient error and the segment should
+            wait for the next retry
+        """
+        for row in segment.rows[:self.max_rows]:
+            try:
+                await self.flush([row])
+            except Exception as e:
+                if self.is_transient(e):
+                    return False
+                self._dead_letter(row, e)
+            else:
+                self.metrics["flushes"] += 1
+                self.metrics["flushed"] += 1
+            await self._drop(segment, 1)
+        segment.attempts = 0
+        return True
+
+    def _dead_letter(self, row: Dict[str, Any], error: BaseException) -> None:
+        self.metrics["dead_lettered"] += 1
+        print(f"Write-behind dead-lettered a {self.name} row: {type(error).__name__}: {error}")
+        if not self.spill_dir:
+            return
+        path = os.path.join(self.spill_dir, f"{self.name}.dead.jsonl")
+        with open(path, "a", encoding="utf-8") as handle:
+            handle.write(json.dumps({"row": row, "error": f"{type(error).__name__}: {error}"}, ensure_ascii=False) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+
+    # ------------------------------------------------------------------
+    # Spill segments
+    # ------------------------------------------------------------------
+
+    def _new_segment(self) -> _Segment:
+        if not self.spill_dir:
+            return _Segment()
+        path = os.path.join(self.spill_dir, f"{self.name}-{os.getpid()}-{uuid.uuid4().hex}.jsonl")
+        handle = open(path, "a+", encoding="utf-8")
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return _Segment(path, handle)
+
+    def _orphaned_segments(self) -> List[_Segment]:
+        """Segments in spill_dir that no live writer holds a lock on"""
+        segments = []
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, f"{self.name}-*.jsonl"))):
+            handle = open(path, "r+", encoding="utf-8")
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                handle.close()
+                continue
+            rows, lines = self._decode_segment(path, handle, _read_offset(f"{path}.offset"))
+            segment = _Segment(path, handle, rows, lines)
+            if rows:
+                segments.append(segment)
+            else:
+                segment.discard()
+        return segments
+
+    def _decode_segment(self, path: str, handle, offset: int = 0):
+        """
+        Outstanding rows of a spill segment and their line numbers
+
+        The first `offset` lines were flushed already; undecodable lines are
+        appended to <path>.corrupt.
+        """
+        rows, lines, corrupt = [], [], []
+        for number, line in enumerate(handle.buffer):
+            if number < offset or not line.strip():
+                continue
+            try:
+                row = json.loads(line.decode("utf-8"))
+            except ValueError:
+                row = None
+            if isinstance(row, dict):
+                rows.append(row)
+                lines.append(number)
+            else:
+                corrupt.append(line if line.endswith(b"\n") else line + b"\n")
+        if corrupt:
+            with open(f"{path}.corrupt", "ab") as quarantine:
+                quarantine.writelines(corrupt)
+            self.metrics["corrupt"] += len(corrupt)
+            print(f"Write-behind moved {len(corrupt)} undecodable {self.name} lines to {path}.corrupt")
+        return rows, lines
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.metrics,
+            "pending": self._pending,
+            "buffered": len(self._segment.rows) if self._segment is not None else 0,
+            "retry_segments": len(self._retry),
+            "max_pending": self.max_pending
+        }
+
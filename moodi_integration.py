@@ -5,15 +5,38 @@ Complete end-to-end flow with gamification logic
 
 import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, date, timedelta
-from typing import Optional, Dict, Any
-from openai import OpenAI
+from typing import Optional, Dict, Any, Callable, Iterable, Iterator, List, Tuple
+
+from moodi_engine import complete_json
+from moodi_engine.backends import backend_for
+from moodi_engine.budgets import token_budget
+from moodi_engine.fallbacks import FALLBACK_NOTIFICATION, fallback_caption, fallback_reflection
+from moodi_engine.gamification import replay_moods, unlock_catalog
+from moodi_engine.prompts import (
+    NOTIFICATION_SYSTEM_PROMPT,
+    REFERRAL_CAPTION_SYSTEM_PROMPT,
+    SAFETY_CLASSIFIER_SYSTEM_PROMPT,
+    build_notification_prompt,
+    build_referral_caption_prompt,
+    build_safety_classifier_prompt,
+)
+from moodi_engine.moderation_batch import MODERATION_BATCHING, moderation_batcher
+from moodi_engine.moderation_cache import moderation_cache
+from moodi_engine.notification_catalog import notification_catalog
+from moodi_engine.prescreen import PRESCREEN_ENABLED, prescreen
+from moodi_engine.resilience import UpstreamUnavailable, resilience
+from moodi_engine.submissions import submit_mood
+from moodi_engine.validation import SchemaValidationError
 
 # Import the reflection API
 from moodi_reflection_api import generate_mood_reflection, validate_response
 
-# Initialize OpenAI client
-client = OpenAI()
+# Shared worker pool so moderation and reflection calls overlap
+PIPELINE_WORKERS = int(os.getenv("MOODI_PIPELINE_WORKERS", "16"))
+_pipeline_executor = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="moodi-pipeline")
 
 
 # ============================================================================
@@ -24,57 +47,74 @@ def check_content_safety(text: str) -> Dict[str, Any]:
     """
     Check content for safety issues using OpenAI Moderation API
     
+    Results for a normalized text are reused from the moderation cache.
+    Concurrent checks are coalesced into one array-input request by
+    moderation_batcher (MOODI_MODERATION_BATCH=0 sends one request per text).
+    
+    If the API cannot be reached the check fails safe: the text counts as
+    flagged.
+    
     Returns:
-        Dictionary with 'flagged' boolean and 'categories' dict
+        Dictionary with 'flagged' boolean and 'categories' dict (plus
+        'unavailable' when the API did not answer)
     """
+    cached = moderation_cache.get("moderation", text)
+    if cached is not None:
+        return cached
+    
     try:
-        response = client.moderations.create(input=text)
-        result = response.results[0]
+        if MODERATION_BATCHING:
+            result = moderation_batcher.check(text)
+        else:
+            result = resilience.call(
+                "moderation",
+                lambda timeout: backend_for("moderation").client().moderations.create(input=text, timeout=timeout).results[0]
+            )
         
-        return {
+        moderation = {
             "flagged": result.flagged,
             "categories": result.categories.model_dump(),
             "category_scores": result.category_scores.model_dump()
         }
+        moderation_cache.put("moderation", text, moderation, flagged=moderation["flagged"])
+        return moderation
     except Exception as e:
         print(f"Moderation check failed: {e}")
-        return {"flagged": False, "categories": {}}
+        resilience.record_fallback("moderation")
+        return {"flagged": True, "categories": {}, "unavailable": True}
 
 
 def classify_safety_risk(context_text: str) -> str:
     """
     Optional secondary classifier for safety escalation
     
+    Fails safe: when the classifier cannot answer, the text is escalated.
+    
     Returns:
         'ok' or 'elevate'
     """
     if not context_text or len(context_text.strip()) == 0:
         return 'ok'
     
-    system_prompt = """You classify mood texts for safety escalation.
-If self-harm intent or severe distress is implied, return: {"safety_flag":"elevate"}
-Else return: {"safety_flag":"ok"}
-Only output valid JSON with key safety_flag."""
-    
-    user_prompt = f'Text: """{context_text}"""'
+    cached = moderation_cache.get("safety_classifier", context_text)
+    if cached is not None:
+        return cached
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini",
+        result = complete_json(
+            SAFETY_CLASSIFIER_SYSTEM_PROMPT,
+            build_safety_classifier_prompt(context_text),
             temperature=0.3,
-            response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
+            endpoint="safety_classifier"
         )
-        
-        result = json.loads(response.choices[0].message.content)
-        return result.get("safety_flag", "ok")
+        safety_flag = result.get("safety_flag", "ok")
+        moderation_cache.put("safety_classifier", context_text, safety_flag, flagged=safety_flag == "elevate")
+        return safety_flag
         
     except Exception as e:
         print(f"Safety classification failed: {e}")
-        return "ok"
+        resilience.record_fallback("safety_classifier")
+        return "elevate"
 
 
 # ============================================================================
@@ -94,6 +134,9 @@ class GamificationEngine:
     UNLOCK_CUSTOM_GRADIENT = 50
     UNLOCK_VOICE_REFLECTION = 120
     
+    # Shared catalog (defaults match the thresholds above; MOODI_UNLOCK_CATALOG replaces it)
+    unlock_catalog = unlock_catalog
+    
     @staticmethod
     def calculate_streak(last_mood_date: Optional[date], current_date: date) -> int:
         """
@@ -148,22 +191,39 @@ class GamificationEngine:
         return 0
     
     @staticmethod
-    def check_unlocks(total_coins: int) -> list:
+    def check_unlocks(total_coins: int, previous_coins: int = 0) -> list:
         """
-        Check which features should be unlocked
+        Check which features are unlocked by reaching `total_coins`
+        
+        Args:
+            total_coins: Coin balance after this submission
+            previous_coins: Coin balance before it (0 returns every reached unlock)
         
         Returns:
-            List of unlock types
+            List of newly crossed unlock types, lowest threshold first
         """
-        unlocks = []
-        
-        if total_coins >= GamificationEngine.UNLOCK_CUSTOM_GRADIENT:
-            unlocks.append("custom_gradient")
-        
-        if total_coins >= GamificationEngine.UNLOCK_VOICE_REFLECTION:
-            unlocks.append("voice_reflection")
+        return GamificationEngine.unlock_catalog.crossed(previous_coins, total_coins)
+    
+    @staticmethod
+    def replay(user_ids, mood_dates) -> Dict[str, Any]:
+        """
+        Recompute streaks, coin ledgers and unlock events for a whole mood history
         
-        return unlocks
+        Args:
+            user_ids: Column of user ids, one per mood
+            mood_dates: Column of mood dates, one per mood
+            
+        Returns:
+            Dict of NumPy arrays (see moodi_engine.gamification.replay_moods)
+        """
+        return replay_moods(
+            user_ids,
+            mood_dates,
+            daily_coins=GamificationEngine.DAILY_POST_COINS,
+            streak_bonus_coins=GamificationEngine.STREAK_BONUS_COINS,
+            streak_bonus_interval=GamificationEngine.STREAK_BONUS_INTERVAL,
+            unlocks=GamificationEngine.unlock_catalog.items()
+        )
 
 
 # ============================================================================
@@ -182,31 +242,25 @@ def generate_notification(user_locale: str, theme: str, days_streak: int = 0) ->
     Returns:
         Dictionary with 'title' and 'body'
     """
-    system_prompt = """You write ultra-short, empathetic push notifications and microcopies for mood journaling apps.
-Rules: ≤ 80 characters, friendly, zero guilt. Match `user_locale`.
-Output JSON: {"title": "...", "body": "..."} with both ≤ 80 chars."""
-    
-    user_prompt = f"""user_locale="{user_locale}"
-theme="{theme}"
-days_streak={days_streak}"""
+    # Precomputed copy first; the model is only the fallback on a miss
+    cached = notification_catalog.get(user_locale, theme, days_streak)
+    if cached is not None:
+        return cached
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini",
+        result = complete_json(
+            NOTIFICATION_SYSTEM_PROMPT,
+            build_notification_prompt(user_locale, theme, days_streak),
             temperature=0.7,
-            response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
+            endpoint="notification",
+            max_tokens=token_budget("notification", user_locale)
         )
-        
-        result = json.loads(response.choices[0].message.content)
         return result
         
     except Exception as e:
         print(f"Notification generation failed: {e}")
-        return {"title": "MOODI", "body": "How are you feeling today?"}
+        resilience.record_fallback("notification")
+        return dict(FALLBACK_NOTIFICATION)
 
 
 # ============================================================================
@@ -220,46 +274,119 @@ def generate_referral_caption(user_locale: str, mood_emoji: str, benefit: str) -
     Returns:
         Caption string
     """
-    system_prompt = """Write a catchy share caption for social. ≤ 12 words. Match locale.
-Return JSON: {"caption":"..."} Only."""
-    
-    user_prompt = f"""user_locale="{user_locale}"
-mood_emoji="{mood_emoji}"
-benefit="{benefit}" """
-    
     try:
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini",
+        result = complete_json(
+            REFERRAL_CAPTION_SYSTEM_PROMPT,
+            build_referral_caption_prompt(user_locale, mood_emoji, benefit),
             temperature=0.8,
-            response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
+            endpoint="referral_caption",
+            max_tokens=token_budget("referral_caption", user_locale)
         )
-        
-        result = json.loads(response.choices[0].message.content)
-        return result.get("caption", "Check out MOODI!")
+        return result.get("caption", fallback_caption(user_locale))
         
     except Exception as e:
         print(f"Caption generation failed: {e}")
-        return "Check out MOODI!"
+        resilience.record_fallback("referral_caption")
+        return fallback_caption(user_locale)
 
 
 # ============================================================================
 # Complete Integration Workflow
 # ============================================================================
 
-def process_mood_submission(mood_payload: Dict, user_data: Dict) -> Dict[str, Any]:
+def _timed(func: Callable, *args) -> Tuple[Any, float]:
+    """Run func(*args) and return (value, elapsed_ms)"""
+    started = time.perf_counter()
+    value = func(*args)
+    return value, (time.perf_counter() - started) * 1000
+
+
+def _run_reflection_stage(mood_payload: Dict, timings: Dict[str, float]) -> Dict[str, Any]:
+    """
+    Moderation + reflection stage shared by single and batch submissions
+    
+    Every context text goes to remote moderation, and to the secondary
+    classifier if moderation flags it. The local pre-screen only escalates:
+    texts it scores high-risk run moderation and the classifier side by side
+    instead of one after the other. Remote checks start together with
+    reflection generation. If safety escalates, the in-flight reflection
+    is cancelled or discarded so no coaching copy reaches an at-risk user.
+    
+    Returns:
+        Dictionary with 'reflection' (None if escalated or invalid),
+        'safety_check', 'prescreen', 'safety_flag' (when classified),
+        'fallback' (template reflection served) and 'errors'
+    """
+    stage = {"reflection": None, "safety_check": None, "errors": []}
+    
+    context_text = mood_payload.get("context_text", "")
+    reflection_future = _pipeline_executor.submit(_timed, generate_mood_reflection, mood_payload)
+    verdict = "ambiguous"
+    if context_text and PRESCREEN_ENABLED:
+        screen, timings["prescreen_ms"] = _timed(prescreen, context_text)
+        stage["prescreen"] = screen
+        verdict = screen["verdict"]
+    
+    moderation_future = None
+    classifier_future = None
+    if context_text:
+        moderation_future = _pipeline_executor.submit(_timed, check_content_safety, context_text)
+        if verdict == "high":
+            classifier_future = _pipeline_executor.submit(_timed, classify_safety_risk, context_text)
+    
+    if moderation_future is not None:
+        moderation, timings["moderation_ms"] = moderation_future.result()
+        stage["safety_check"] = moderation
+        
+        if moderation["flagged"] and classifier_future is None:
+            # Secondary classifier only on the flagged path
+            classifier_future = _pipeline_executor.submit(_timed, classify_safety_risk, context_text)
+        
+        if classifier_future is not None:
+            safety_flag, timings["classification_ms"] = classifier_future.result()
+            stage["safety_flag"] = safety_flag
+            
+            if safety_flag == "elevate":
+                reflection_future.cancel()
+                stage["errors"].append("Safety concern detected - escalation required")
+                return stage
+    
+    try:
+        reflection, timings["reflection_ms"] = reflection_future.result()
+    except UpstreamUnavailable as e:
+        # Model unreachable: template copy in the user's locale
+        print(f"Reflection unavailable, serving template: {e}")
+        resilience.record_fallback("reflection")
+        reflection = fallback_reflection(mood_payload)
+        stage["fallback"] = True
+    except SchemaValidationError as e:
+        stage["errors"].extend(e.errors)
+        return stage
+    
+    # Validate reflection
+    is_valid, errors = validate_response(reflection)
+    if not is_valid:
+        stage["errors"].extend(errors)
+        return stage
+    
+    stage["reflection"] = reflection
+    return stage
+
+
+def process_mood_submission(mood_payload: Dict, user_data: Dict, conn=None) -> Dict[str, Any]:
     """
     Complete end-to-end mood processing workflow
     
     Args:
         mood_payload: Mood data from user
         user_data: Current user profile data (streak_days, moodcoins, last_mood_date, etc.)
+        conn: Optional psycopg2 connection. When given (and user_data has 'id'),
+            the mood, reflection and unlocks are stored with submit_mood() and
+            streak/coins come from the locked user row instead of user_data
         
     Returns:
-        Complete result with reflection, coins awarded, streak updates, etc.
+        Complete result with reflection, coins awarded, streak updates, stage
+        timings, etc.
     """
     result = {
         "success": False,
@@ -270,34 +397,40 @@ def process_mood_submission(mood_payload: Dict, user_data: Dict) -> Dict[str, An
         "new_streak": user_data.get("streak_days", 0),
         "new_coin_total": user_data.get("moodcoins", 0),
         "unlocks": [],
-        "errors": []
+        "errors": [],
+        "timings": {}
     }
+    timings = result["timings"]
+    pipeline_started = time.perf_counter()
     
     try:
-        # Step 1: Pre-check with OpenAI Moderation
-        context_text = mood_payload.get("context_text", "")
-        if context_text:
-            moderation = check_content_safety(context_text)
-            result["safety_check"] = moderation
-            
-            if moderation["flagged"]:
-                # Optional: Run secondary classifier
-                safety_flag = classify_safety_risk(context_text)
-                result["safety_flag"] = safety_flag
-                
-                if safety_flag == "elevate":
-                    result["errors"].append("Safety concern detected - escalation required")
+        # Step 1 & 2: Moderation and AI Reflection (concurrent)
+        stage = _run_reflection_stage(mood_payload, timings)
+        result.update(stage)
         
-        # Step 2: Generate AI Reflection
-        reflection = generate_mood_reflection(mood_payload)
-        
-        # Validate reflection
-        is_valid, errors = validate_response(reflection)
-        if not is_valid:
-            result["errors"].extend(errors)
+        # Invalid reflection; an escalated one is discarded but the post still counts
+        if stage["reflection"] is None and stage.get("safety_flag") != "elevate":
             return result
         
-        result["reflection"] = reflection
+        # Steps 3-5 in the database: one round trip, current state under a row lock
+        if conn is not None and user_data.get("id"):
+            started = time.perf_counter()
+            stored = submit_mood(
+                conn,
+                user_data["id"],
+                mood_payload,
+                reflection=stage["reflection"],
+                unlocks=GamificationEngine.unlock_catalog.items()
+            )
+            timings["persist_ms"] = (time.perf_counter() - started) * 1000
+            result["mood_id"] = stored["mood_id"]
+            result["coins_awarded"] = stored["coins_awarded"]
+            result["streak_updated"] = stored["coins_awarded"] > 0
+            result["new_streak"] = stored["streak_days"]
+            result["new_coin_total"] = stored["moodcoins"]
+            result["unlocks"] = stored["new_unlocks"]
+            result["success"] = True
+            return result
         
         # Step 3: Update Streak
         current_date = date.today()
@@ -339,16 +472,68 @@ def process_mood_submission(mood_payload: Dict, user_data: Dict) -> Dict[str, An
         result["new_coin_total"] = user_data.get("moodcoins", 0) + result["coins_awarded"]
         
         # Step 5: Check Unlocks
-        result["unlocks"] = GamificationEngine.check_unlocks(result["new_coin_total"])
+        result["unlocks"] = GamificationEngine.check_unlocks(
+            result["new_coin_total"], user_data.get("moodcoins", 0)
+        )
         
         result["success"] = True
         
     except Exception as e:
         result["errors"].append(f"Processing error: {str(e)}")
     
+    finally:
+        # Critical path vs. what the same calls would cost back to back
+        timings["total_ms"] = (time.perf_counter() - pipeline_started) * 1000
+        timings["sequential_ms"] = sum(
+            timings.get(name, 0.0) for name in ("moderation_ms", "classification_ms", "reflection_ms")
+        )
+    
     return result
 
 
+def process_mood_submissions(
+    batch: Iterable[Dict],
+    max_concurrency: int = 8
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Moderate and reflect a batch of mood payloads (history import / backfill)
+    
+    Identical payloads are processed once. Gamification is not applied here:
+    imported moods get their streaks and coins from the database on insert.
+    
+    Args:
+        batch: Mood payloads
+        max_concurrency: Maximum payloads processed at the same time
+        
+    Yields:
+        (index, result) pairs in completion order, where result has
+        'success', 'reflection', 'safety_check', 'errors' and 'timings'
+    """
+    payloads = list(batch)
+    groups: Dict[str, List[int]] = {}
+    for index, mood_payload in enumerate(payloads):
+        key = json.dumps(mood_payload, sort_keys=True, ensure_ascii=False, default=str)
+        groups.setdefault(key, []).append(index)
+    
+    def run(indices: List[int]) -> Tuple[List[int], Dict[str, Any]]:
+        timings: Dict[str, float] = {}
+        try:
+            item = _run_reflection_stage(payloads[indices[0]], timings)
+        except Exception as e:
+            item = {"reflection": None, "safety_check": None, "errors": [f"Processing error: {str(e)}"]}
+        item["success"] = item["reflection"] is not None
+        item["timings"] = timings
+        return indices, item
+    
+    # Separate pool: each item itself waits on _pipeline_executor tasks
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="moodi-batch") as executor:
+        futures = [executor.submit(run, indices) for indices in groups.values()]
+        for future in as_completed(futures):
+            indices, item = future.result()
+            for index in indices:
+                yield index, item
+
+
 # ============================================================================
 # Testing & Examples
 # ============================================================================
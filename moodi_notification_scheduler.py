@@ -0,0 +1,264 @@
+"""
+MOODI Notification Scheduler
+Worker that drains due rows from the notifications table and hands them to a push sender
+
+Run with: python moodi_notification_scheduler.py --dsn "$DATABASE_URL" [--workers 4]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from moodi_engine.notification_catalog import NotificationCatalog, generate_variants, notification_catalog, streak_band
+from moodi_integration import generate_notification
+
+# Claims due, unsent rows and leases them for CLAIM_LEASE_S. SKIP LOCKED lets
+# several workers drain the queue side by side without blocking on each
+# other's batches; the row locks only last for this statement's transaction,
+# and the lease (claimed_until) keeps other workers off the rows while copy is
+# generated and sent. A worker that dies mid-batch leaves rows whose lease
+# simply expires. The inner WHERE clause matches idx_notifications_scheduled.
+CLAIM_SQL = """
+UPDATE public.notifications AS n
+SET claimed_until = NOW() + make_interval(secs => %s)
+FROM public.users u
+WHERE u.id = n.user_id
+  AND n.id IN (
+    SELECT id FROM public.notifications
+    WHERE is_sent = FALSE AND scheduled_for <= NOW()
+      AND (claimed_until IS NULL OR claimed_until < NOW())
+    ORDER BY scheduled_for
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+  )
+RETURNING n.id, n.user_id, n.notification_type, n.title, n.body, u.locale, u.streak_days
+"""
+
+MARK_SENT_SQL = """
+UPDATE public.notifications AS n
+SET is_sent = TRUE, sent_at = NOW(), title = v.title, body = v.body
+FROM (VALUES %s) AS v(id, title, body)
+WHERE n.id = v.id::uuid
+"""
+
+# Undelivered rows go back to the queue right away instead of waiting out the lease
+RELEASE_SQL = """
+UPDATE public.notifications SET claimed_until = NULL WHERE id = ANY(%s::uuid[])
+"""
+
+CLAIM_LEASE_S = 300
+
+
+# ============================================================================
+# Push Senders
+# ============================================================================
+
+class PushSender:
+    """Interface for delivering a batch of notifications"""
+
+    def send(self, messages: List[Dict[str, Any]]) -> List[str]:
+        """
+        Deliver messages ({'id', 'user_id', 'title', 'body'})
+
+        Returns:
+            Ids of the messages that were delivered
+        """
+        raise NotImplementedError
+
+
+class LoggingPushSender(PushSender):
+    """Prints messages instead of delivering them (local runs)"""
+
+    def send(self, messages: List[Dict[str, Any]]) -> List[str]:
+        for message in messages:
+            print(f"[push] {message['user_id']}: {message['title']} | {message['body']}")
+        return [message["id"] for message in messages]
+
+
+# ============================================================================
+# Scheduler
+# ============================================================================
+
+def fill_missing_copy(
+    rows: List[Dict[str, Any]],
+    catalog: NotificationCatalog = notification_catalog,
+    generate: Callable[[str, str, str], List[Dict[str, str]]] = generate_variants
+) -> int:
+    """
+    Fill empty title/body in place
+
+    Copy comes from the catalog, so every row gets its own streak substituted
+    and the variants rotate across the batch. A catalog miss generates raw
+    variants once per (locale, theme, streak band) and stores them in the
+    catalog; if that fails, copy is generated per exact streak.
+
+    Returns:
+        Number of distinct copy generations
+    """
+    attempted = set()
+    per_streak: Dict[Tuple[str, str, int], Dict[str, str]] = {}
+    for row in rows:
+        if row["title"] and row["body"]:
+            continue
+        streak = row.get("streak_days") or 0
+        user_locale, theme = row.get("locale") or "fr", row["notification_type"]
+        copy = catalog.get(user_locale, theme, streak)
+        key = (user_locale, theme, streak_band(streak))
+        if copy is None and key not in attempted:
+            attempted.add(key)
+            try:
+                catalog.set_variants(key, generate(*key))
+            except Exception as e:
+                print(f"Catalog generation failed for {user_locale}/{theme}/{key[2]}: {e}")
+            copy = catalog.get(user_locale, theme, streak)
+        if copy is None:
+            if (user_locale, theme, streak) not in per_streak:
+                per_streak[(user_locale, theme, streak)] = generate_notification(user_locale, theme, streak)
+            copy = per_streak[(user_locale, theme, streak)]
+        row["title"] = row["title"] or copy["title"]
+        row["body"] = row["body"] or copy["body"]
+    return len(attempted) + len(per_streak)
+
+
+class NotificationScheduler:
+    """Claims due notifications in batches, fills copy, sends and marks them sent"""
+
+    def __init__(self, conn, sender: PushSender, batch_size: int = 500, lease_s: float = CLAIM_LEASE_S):
+        self.conn = conn
+        self.sender = sender
+        self.batch_size = batch_size
+        self.lease_s = lease_s
+        self.metrics = {"batches": 0, "claimed": 0, "sent": 0, "generated": 0, "elapsed_s": 0.0}
+
+    def run_once(self) -> int:
+        """
+        Process one batch
+
+        Claiming and marking are two short transactions; copy generation and
+        sending happen between them, with no row locks held.
+
+        Returns:
+            Number of rows claimed (0 when nothing is due)
+        """
+        from psycopg2.extras import execute_values
+
+        started = time.perf_counter()
+        with self.conn:
+            with self.conn.cursor() as cur:
+                cur.execute(CLAIM_SQL, (self.lease_s, self.batch_size))
+                columns = [column[0] for column in cur.description]
+                rows = [dict(zip(columns, record)) for record in cur.fetchall()]
+        if not rows:
+            return 0
+
+        for row in rows:
+            row["id"] = str(row["id"])
+            row["user_id"] = str(row["user_id"])
+        delivered = set()
+        try:
+            self.metrics["generated"] += fill_missing_copy(rows)
+            delivered = set(self.sender.send(
+                [{"id": r["id"], "user_id": r["user_id"], "title": r["title"], "body": r["body"]} for r in rows]
+            ))
+        finally:
+            sent = [(r["id"], r["title"], r["body"]) for r in rows if r["id"] in delivered]
+            undelivered = [r["id"] for r in rows if r["id"] not in delivered]
+            with self.conn:
+                with self.conn.cursor() as cur:
+                    if sent:
+                        execute_values(cur, MARK_SENT_SQL, sent, page_size=self.batch_size)
+                    if undelivered:
+                        cur.execute(RELEASE_SQL, (undelivered,))
+
+        self.metrics["batches"] += 1
+        self.metrics["claimed"] += len(rows)
+        self.metrics["sent"] += len(sent)
+        self.metrics["elapsed_s"] += time.perf_counter() - started
+        return len(rows)
+
+    def run(self, idle_sleep_s: float = 5.0, max_idle_polls: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Drain batches until stopped (or until `max_idle_polls` empty polls in a row)
+
+        Returns:
+            Throughput metrics
+        """
+        idle_polls = 0
+        while max_idle_polls is None or idle_polls < max_idle_polls:
+            if self.run_once():
+                idle_polls = 0
+            else:
+                idle_polls += 1
+                time.sleep(idle_sleep_s)
+        return self.throughput()
+
+    def throughput(self) -> Dict[str, Any]:
+        elapsed = self.metrics["elapsed_s"]
+        return {
+            **self.metrics,
+            "rows_per_s": self.metrics["sent"] / elapsed if elapsed else 0.0,
+            "avg_batch_ms": elapsed * 1000 / self.metrics["batches"] if self.metrics["batches"] else 0.0
+        }
+
+
+def _worker(dsn: str, batch_size: int, idle_sleep_s: float, max_idle_polls: Optional[int], results) -> None:
+    import psycopg2
+
+    conn = psycopg2.connect(dsn)
+    try:
+        scheduler = NotificationScheduler(conn, LoggingPushSender(), batch_size=batch_size)
+        metrics = scheduler.run(idle_sleep_s=idle_sleep_s, max_idle_polls=max_idle_polls)
+        results.put({"pid": os.getpid(), **metrics})
+    finally:
+        conn.close()
+
+
+# ============================================================================
+# Command Line
+# ============================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drain due notifications")
+    parser.add_argument("--dsn", default=os.getenv("DATABASE_URL"), help="Postgres connection string")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--idle-sleep", type=float, default=5.0)
+    parser.add_argument("--drain", action="store_true", help="Exit once the queue is empty")
+    args = parser.parse_args()
+
+    max_idle_polls = 1 if args.drain else None
+    results = multiprocessing.Queue()
+    started = time.perf_counter()
+    processes = [
+        multiprocessing.Process(
+            target=_worker,
+            args=(args.dsn, args.batch_size, args.idle_sleep, max_idle_polls, results)
+        )
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+
+    # Drain the queue before joining: a worker does not exit until its result
+    # has been flushed to the pipe, so joining first can deadlock
+    per_worker = []
+    while len(per_worker) < len(processes):
+        try:
+            per_worker.append(results.get(timeout=1.0))
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                break
+    for process in processes:
+        process.join()
+    wall_s = time.perf_counter() - started
+    total_sent = sum(worker["sent"] for worker in per_worker)
+    print(json.dumps({
+        "workers": per_worker,
+        "total_sent": total_sent,
+        "wall_s": wall_s,
+        "rows_per_s": total_sent / wall_s if wall_s else 0.0
+    }, indent=2))
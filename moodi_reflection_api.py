@@ -4,53 +4,22 @@ Core AI endpoint for mood reflection generation
 """
 
 import json
-import os
-from openai import OpenAI
+import time
 
-# Initialize OpenAI client (API key already configured in environment)
-client = OpenAI()
+from moodi_engine import DEFAULT_MODEL, complete
+from moodi_engine.fallbacks import fallback_reflection
+from moodi_engine.prompts import SYSTEM_PROMPT, build_reflection_prompt
+from moodi_engine.repair import fix_reflection
+from moodi_engine.reflection_cache import make_cache_key, reflection_cache
+from moodi_engine.resilience import UpstreamUnavailable
+from moodi_engine.routing import classify, router_stats
+from moodi_engine.validation import SchemaValidationError, validate_reflection
 
-# System prompt for the Mood Reflection Engine
-SYSTEM_PROMPT = """You are **MOODI Reflection Engine**, an emotion-first micro-coach. 
-Your job: transform a user's mood into a short, empathetic reflection + a tiny action.
+REFLECTION_MODEL = DEFAULT_MODEL
+REFLECTION_TEMPERATURE = 0.7
 
-Non-negotiables:
-- **Max 60 words** for `reflection_text` (empathetic, human, specific to the mood, never generic).
-- Give **one** tiny, doable suggestion in `action_suggestion` (max 20 words).
-- Keep language and dialect = `user_locale` (support: ar, ar-darija, fr, en). If `user_locale` is `ar-darija`, reply in **Moroccan Darija** (Arabic script acceptable).
-- Add a short `share_caption` users can post publicly (≤ 15 words, uplifting).
-- For sound, give 1 `soundtrack_hint` (mood/genre; avoid trademarks where unsure).
-- Add 3–6 `tags` capturing emotion nuance (e.g., ["calm","gratitude","evening","alone"]).
-- **ALWAYS include `safety_flag`** in your response. Set it to "ok" for normal moods, or "elevate" if self-harm risk is detected.
-- Output **valid JSON** matching the provided schema—no extra keys, no prose outside JSON.
 
-Guardrails:
-- No medical/clinical claims. If self-harm risk is present, set `safety_flag: "elevate"` and set `action_suggestion` to seeking help (culturally appropriate hotline/close person), no coaching beyond that.
-- Never include PII. Never shame the user.
-- If mood media is present, you may reference it generically (e.g., "in your photo", "in your voice note"); never describe people or private details.
-
-Tone:
-- Warm, brief, non-therapeutic. Use everyday language.
-
-Required JSON fields: reflection_text, action_suggestion, share_caption, soundtrack_hint, tags, safety_flag"""
-
-# JSON Schema for response validation
-RESPONSE_SCHEMA = {
-    "type": "object",
-    "properties": {
-        "reflection_text": {"type": "string", "maxLength": 360},
-        "action_suggestion": {"type": "string", "maxLength": 120},
-        "share_caption": {"type": "string", "maxLength": 90},
-        "soundtrack_hint": {"type": "string"},
-        "tags": {"type": "array", "items": {"type": "string"}, "minItems": 3, "maxItems": 6},
-        "safety_flag": {"type": "string", "enum": ["ok", "elevate"]}
-    },
-    "required": ["reflection_text", "action_suggestion", "share_caption", "soundtrack_hint", "tags", "safety_flag"],
-    "additionalProperties": False
-}
-
-
-def generate_mood_reflection(mood_payload: dict) -> dict:
+def generate_mood_reflection(mood_payload: dict, use_cache: bool = True) -> dict:
     """
     Generate AI reflection for a given mood payload
     
@@ -65,75 +34,73 @@ def generate_mood_reflection(mood_payload: dict) -> dict:
             - geo_hint
             - user_locale
             - user_age_bucket
+        use_cache: Serve payloads without context_text from the reflection cache
+    
+    The payload is routed first (moodi_engine.routing): trivial payloads are
+    served from the cache or template copy, routine ones go to the cheaper
+    model with a tighter token budget, complex or risky ones to the full model.
     
     Returns:
         Dictionary with reflection_text, action_suggestion, share_caption, 
         soundtrack_hint, tags, and safety_flag
+    
+    Raises:
+        UpstreamUnavailable: The model could not be reached within the
+            reflection deadline (callers serve a fallback)
+        SchemaValidationError: The output is still invalid after repair
     """
     
-    # Build user prompt with the mood payload
-    user_prompt = f"""You will receive a mood payload:
-
-{json.dumps(mood_payload, indent=2, ensure_ascii=False)}
-
-Return a single JSON object that fits the schema."""
+    route = classify(mood_payload)
+    started = time.perf_counter()
+    
+    # Payloads without context_text collapse to a small key space
+    cache_key = make_cache_key(mood_payload) if use_cache else None
+    if cache_key is not None:
+        cached = reflection_cache.get(cache_key)
+        if cached is not None:
+            router_stats.record(route, "cache", (time.perf_counter() - started) * 1000)
+            return cached
+    if route.template:
+        router_stats.record(route, "template", (time.perf_counter() - started) * 1000)
+        return fallback_reflection(mood_payload)
     
     try:
-        # Call OpenAI API with structured output
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini",
-            temperature=0.7,
-            response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt}
-            ]
+        # Call OpenAI API (shared, lazily created client)
+        result, usage = complete(
+            SYSTEM_PROMPT,
+            build_reflection_prompt(mood_payload),
+            temperature=REFLECTION_TEMPERATURE,
+            model=route.model,
+            endpoint="reflection",
+            max_tokens=route.max_tokens
         )
+        router_stats.record(route, "model", (time.perf_counter() - started) * 1000, usage)
+        # Near misses (too long, extra tags, "OK") are repaired instead of regenerated
+        result, errors = fix_reflection(result, route.model)
+        if errors:
+            raise SchemaValidationError(errors)
         
-        # Parse the JSON response
-        result = json.loads(response.choices[0].message.content)
+        # Only non-escalated reflections are reused for other users
+        if cache_key is not None and result["safety_flag"] == "ok":
+            reflection_cache.put(cache_key, result)
         
         return result
         
+    except (UpstreamUnavailable, SchemaValidationError):
+        # Callers serve a fallback for the first, report the second
+        raise
     except Exception as e:
         raise Exception(f"Error generating mood reflection: {str(e)}")
 
 
 def validate_response(response: dict) -> tuple[bool, list]:
     """
-    Validate response against schema requirements
+    Validate response against RESPONSE_SCHEMA (compiled, see moodi_engine.validation)
     
     Returns:
         Tuple of (is_valid, list_of_errors)
     """
-    errors = []
-    
-    # Check required fields
-    required_fields = ["reflection_text", "action_suggestion", "share_caption", 
-                      "soundtrack_hint", "tags", "safety_flag"]
-    for field in required_fields:
-        if field not in response:
-            errors.append(f"Missing required field: {field}")
-    
-    # Validate field constraints
-    if "reflection_text" in response and len(response["reflection_text"]) > 360:
-        errors.append(f"reflection_text too long: {len(response['reflection_text'])} chars (max 360)")
-    
-    if "action_suggestion" in response and len(response["action_suggestion"]) > 120:
-        errors.append(f"action_suggestion too long: {len(response['action_suggestion'])} chars (max 120)")
-    
-    if "share_caption" in response and len(response["share_caption"]) > 90:
-        errors.append(f"share_caption too long: {len(response['share_caption'])} chars (max 90)")
-    
-    if "tags" in response:
-        if not isinstance(response["tags"], list):
-            errors.append("tags must be an array")
-        elif len(response["tags"]) < 3 or len(response["tags"]) > 6:
-            errors.append(f"tags must have 3-6 items, got {len(response['tags'])}")
-    
-    if "safety_flag" in response and response["safety_flag"] not in ["ok", "elevate"]:
-        errors.append(f"safety_flag must be 'ok' or 'elevate', got '{response['safety_flag']}'")
-    
+    errors = validate_reflection(response)
     return (len(errors) == 0, errors)
 
 
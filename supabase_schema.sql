@@ -107,9 +107,13 @@ CREATE TABLE IF NOT EXISTS public.notifications (
   notification_type TEXT NOT NULL, -- 'gentle_reminder', 'streak_nudge', 'evening_checkin', 'milestone'
   title TEXT NOT NULL,
   body TEXT NOT NULL,
-  is_sent BOOLEAN DEFAULT FALSE
+  is_sent BOOLEAN DEFAULT FALSE,
+  claimed_until TIMESTAMP WITH TIME ZONE -- lease held by a scheduler worker while it sends
 );
 
+-- Added after the first release; re-running this migration upgrades existing databases
+ALTER TABLE public.notifications ADD COLUMN IF NOT EXISTS claimed_until TIMESTAMP WITH TIME ZONE;
+
 -- Indexes for notification management
 CREATE INDEX IF NOT EXISTS idx_notifications_user_id ON public.notifications(user_id);
 CREATE INDEX IF NOT EXISTS idx_notifications_scheduled ON public.notifications(scheduled_for) WHERE is_sent = FALSE;
@@ -118,106 +122,136 @@ CREATE INDEX IF NOT EXISTS idx_notifications_scheduled ON public.notifications(s
 -- Functions and Triggers
 -- ============================================================================
 
--- Function to update streak when a new mood is posted
-CREATE OR REPLACE FUNCTION update_user_streak()
+-- Replaced by apply_mood_gamification() below; dropped so re-running this
+-- migration upgrades existing databases
+DROP TRIGGER IF EXISTS trigger_update_streak ON public.moods;
+DROP TRIGGER IF EXISTS trigger_award_coins ON public.moods;
+DROP TRIGGER IF EXISTS trigger_streak_bonus ON public.users;
+DROP FUNCTION IF EXISTS update_user_streak();
+DROP FUNCTION IF EXISTS award_daily_moodcoins();
+DROP FUNCTION IF EXISTS award_streak_bonus();
+
+-- Function to update streak and award MoodCoins when a new mood is posted.
+-- One UPDATE per insert: the SET expressions read the pre-update row, so the
+-- streak, the daily coins (5, once per day) and the streak bonus (5 every
+-- 3 consecutive days) are all decided in a single write to the user row.
+CREATE OR REPLACE FUNCTION apply_mood_gamification()
 RETURNS TRIGGER AS $$
 DECLARE
-  last_date DATE;
-  current_date DATE;
+  mood_date DATE := DATE(NEW.created_at);
 BEGIN
-  -- Get the user's last mood date
-  SELECT last_mood_date INTO last_date
-  FROM public.users
-  WHERE id = NEW.user_id;
-  
-  current_date := DATE(NEW.created_at);
-  
-  -- Update streak logic
-  IF last_date IS NULL THEN
-    -- First mood ever
-    UPDATE public.users
-    SET streak_days = 1, last_mood_date = current_date
-    WHERE id = NEW.user_id;
-  ELSIF last_date = current_date THEN
-    -- Same day, no streak change
-    NULL;
-  ELSIF last_date = current_date - INTERVAL '1 day' THEN
-    -- Consecutive day, increment streak
-    UPDATE public.users
-    SET streak_days = streak_days + 1, last_mood_date = current_date
-    WHERE id = NEW.user_id;
-  ELSE
-    -- Streak broken, reset to 1
-    UPDATE public.users
-    SET streak_days = 1, last_mood_date = current_date
-    WHERE id = NEW.user_id;
+  -- Bulk imports recompute gamification set-wise after loading
+  IF current_setting('moodi.skip_gamification', true) = 'on' THEN
+    RETURN NEW;
   END IF;
   
+  UPDATE public.users
+  SET
+    streak_days = CASE
+      WHEN last_mood_date = mood_date - 1 THEN streak_days + 1  -- Consecutive day
+      ELSE 1                                                   -- First mood ever or streak broken
+    END,
+    moodcoins = moodcoins + 5 + CASE
+      WHEN last_mood_date = mood_date - 1 AND (streak_days + 1) % 3 = 0 THEN 5
+      ELSE 0
+    END,
+    last_mood_date = mood_date
+  WHERE id = NEW.user_id
+    -- Same day (or back-dated) posts change nothing
+    AND (last_mood_date IS NULL OR last_mood_date < mood_date);
+  
   RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
 
--- Trigger to automatically update streak on mood insert
-DROP TRIGGER IF EXISTS trigger_update_streak ON public.moods;
-CREATE TRIGGER trigger_update_streak
+-- Trigger to apply streak and coin updates on mood insert
+DROP TRIGGER IF EXISTS trigger_mood_gamification ON public.moods;
+CREATE TRIGGER trigger_mood_gamification
   AFTER INSERT ON public.moods
   FOR EACH ROW
-  EXECUTE FUNCTION update_user_streak();
-
--- Function to award MoodCoins for daily posts
-CREATE OR REPLACE FUNCTION award_daily_moodcoins()
-RETURNS TRIGGER AS $$
+  EXECUTE FUNCTION apply_mood_gamification();
+
+-- One-round-trip mood submission: locks the user row, inserts the mood (the
+-- trigger above applies streak and coins), stores the reflection when given
+-- and grants every catalog unlock the new balance reaches. Concurrent posts
+-- by the same user queue on the row lock, so a day is only rewarded once.
+CREATE OR REPLACE FUNCTION submit_mood(
+  p_user_id UUID,
+  p_mood JSONB,
+  p_reflection JSONB DEFAULT NULL,
+  p_unlock_types TEXT[] DEFAULT '{}',
+  p_unlock_thresholds INT[] DEFAULT '{}'
+)
+RETURNS TABLE (mood_id UUID, streak_days INT, moodcoins INT, coins_awarded INT, new_unlocks TEXT[]) AS $$
 DECLARE
-  last_date DATE;
-  current_date DATE;
+  v_old_coins INT;
+  v_mood_id UUID;
+  v_streak INT;
+  v_coins INT;
+  v_unlocks TEXT[];
 BEGIN
-  SELECT last_mood_date INTO last_date
-  FROM public.users
-  WHERE id = NEW.user_id;
+  -- Through PostgREST a caller may only post as themselves. Direct
+  -- connections carry no JWT (auth.uid() is NULL); the API verifies the
+  -- caller's access token before calling.
+  IF auth.uid() IS NOT NULL AND auth.uid() <> p_user_id THEN
+    RAISE EXCEPTION 'submit_mood for another user' USING ERRCODE = 'insufficient_privilege';
+  END IF;
   
-  current_date := DATE(NEW.created_at);
+  SELECT u.moodcoins INTO v_old_coins
+  FROM public.users u
+  WHERE u.id = p_user_id
+  FOR UPDATE;
   
-  -- Award 5 coins for daily post (only once per day)
-  IF last_date IS NULL OR last_date < current_date THEN
-    UPDATE public.users
-    SET moodcoins = moodcoins + 5
-    WHERE id = NEW.user_id;
+  IF NOT FOUND THEN
+    RAISE EXCEPTION 'Unknown user %', p_user_id USING ERRCODE = 'no_data_found';
   END IF;
   
-  RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
--- Trigger to award coins on mood insert
-DROP TRIGGER IF EXISTS trigger_award_coins ON public.moods;
-CREATE TRIGGER trigger_award_coins
-  AFTER INSERT ON public.moods
-  FOR EACH ROW
-  EXECUTE FUNCTION award_daily_moodcoins();
-
--- Function to award streak bonus coins (every 3 days)
-CREATE OR REPLACE FUNCTION award_streak_bonus()
-RETURNS TRIGGER AS $$
-BEGIN
-  -- Award 5 bonus coins every 3 days of streak
-  IF NEW.streak_days % 3 = 0 AND NEW.streak_days > 0 THEN
-    UPDATE public.users
-    SET moodcoins = moodcoins + 5
-    WHERE id = NEW.id;
+  INSERT INTO public.moods (user_id, mood_emoji, mood_color, intensity_0_10, context_text,
+                            media_present, time_bucket, geo_hint)
+  VALUES (
+    p_user_id,
+    p_mood->>'mood_emoji',
+    p_mood->>'mood_color',
+    (p_mood->>'intensity_0_10')::INT,
+    p_mood->>'context_text',
+    COALESCE((p_mood->>'media_present')::BOOLEAN, FALSE),
+    p_mood->>'time_bucket',
+    p_mood->>'geo_hint'
+  )
+  RETURNING id INTO v_mood_id;
+  
+  SELECT u.streak_days, u.moodcoins INTO v_streak, v_coins
+  FROM public.users u
+  WHERE u.id = p_user_id;
+  
+  IF p_reflection IS NOT NULL THEN
+    INSERT INTO public.mood_reflections (mood_id, reflection_text, action_suggestion, share_caption,
+                                         soundtrack_hint, tags, safety_flag)
+    VALUES (
+      v_mood_id,
+      p_reflection->>'reflection_text',
+      p_reflection->>'action_suggestion',
+      p_reflection->>'share_caption',
+      p_reflection->>'soundtrack_hint',
+      ARRAY(SELECT jsonb_array_elements_text(p_reflection->'tags')),
+      p_reflection->>'safety_flag'
+    );
   END IF;
   
-  RETURN NEW;
+  WITH granted AS (
+    INSERT INTO public.user_unlocks (user_id, unlock_type)
+    SELECT p_user_id, catalog.unlock_type
+    FROM unnest(p_unlock_types, p_unlock_thresholds) AS catalog(unlock_type, threshold)
+    WHERE catalog.threshold <= v_coins
+    ON CONFLICT (user_id, unlock_type) DO NOTHING
+    RETURNING unlock_type
+  )
+  SELECT COALESCE(array_agg(granted.unlock_type), '{}') INTO v_unlocks FROM granted;
+  
+  RETURN QUERY SELECT v_mood_id, v_streak, v_coins, v_coins - v_old_coins, v_unlocks;
 END;
 $$ LANGUAGE plpgsql;
 
--- Trigger to award streak bonus
-DROP TRIGGER IF EXISTS trigger_streak_bonus ON public.users;
-CREATE TRIGGER trigger_streak_bonus
-  AFTER UPDATE OF streak_days ON public.users
-  FOR EACH ROW
-  WHEN (NEW.streak_days > OLD.streak_days)
-  EXECUTE FUNCTION award_streak_bonus();
-
 -- Function to award referral coins
 CREATE OR REPLACE FUNCTION award_referral_coins()
 RETURNS TRIGGER AS $$
@@ -0,0 +1,25 @@
+"""
+Shared test setup
+
+Modules read their configuration from the environment at import time, so it
+is set here, before any test module imports them: every model call goes to
+the offline template backend and submissions to the in-memory store.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TEST_ENV = {
+    "OPENAI_API_KEY": "test",
+    "MOODI_BACKEND": "template",
+    "MOODI_STORE": "memory",
+    "MOODI_NOTIFICATION_REFRESH_S": "0",
+    "SUPABASE_JWT_SECRET": "test-jwt-secret",
+}
+for key, value in TEST_ENV.items():
+    os.environ[key] = value
+for key in ("DATABASE_URL", "MOODI_BACKEND_RECORD", "MOODI_MODERATION_CACHE_URL"):
+    os.environ.pop(key, None)
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from moodi_engine.auth import AuthError, authenticated_user, encode_token, verify_token
+
+SECRET = "test-jwt-secret"
+USER = "3f0c6a52-8d4e-4a7b-9c1e-2b5d7f9a0c11"
+
+
+def claims(**overrides):
+    return {"sub": USER, "aud": "authenticated", "exp": time.time() + 300, **overrides}
+
+
+def test_valid_token_returns_claims():
+    assert verify_token(encode_token(claims(), SECRET), SECRET)["sub"] == USER
+
+
+def test_forged_signature_is_rejected():
+    with pytest.raises(AuthError):
+        verify_token(encode_token(claims(), "other-secret"), SECRET)
+
+
+def test_tampered_payload_is_rejected():
+    header, _, signature = encode_token(claims(), SECRET).split(".")
+    payload = encode_token(claims(sub="someone-else"), SECRET).split(".")[1]
+    with pytest.raises(AuthError):
+        verify_token(f"{header}.{payload}.{signature}", SECRET)
+
+
+def test_expired_token_is_rejected():
+    with pytest.raises(AuthError, match="expired"):
+        verify_token(encode_token(claims(exp=time.time() - 3600), SECRET), SECRET)
+
+
+def test_wrong_audience_is_rejected():
+    with pytest.raises(AuthError, match="audience"):
+        verify_token(encode_token(claims(aud="anon"), SECRET), SECRET)
+
+
+def test_unsigned_token_is_rejected():
+    token = encode_token(claims(), SECRET)
+    header = "eyJhbGciOiJub25lIiwidHlwIjoiSldUIn0"  # {"alg":"none","typ":"JWT"}
+    with pytest.raises(AuthError):
+        verify_token(header + token[token.index("."):], SECRET)
+
+
+def test_authenticated_user_checks_user_id():
+    header = "Bearer " + encode_token(claims(), SECRET)
+    assert authenticated_user(header, USER.upper()) == USER
+    with pytest.raises(AuthError) as raised:
+        authenticated_user(header, "0c6a52f3-8d4e-4a7b-9c1e-2b5d7f9a0c11")
+    assert raised.value.status_code == 403
+    with pytest.raises(AuthError) as raised:
+        authenticated_user(None, USER)
+    assert raised.value.status_code == 401
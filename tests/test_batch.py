@@ -0,0 +1,75 @@
+import asyncio
+
+from moodi_engine.batch import fan_out
+
+
+def collect(items, worker, **kwargs):
+    async def run():
+        return [result async for result in fan_out(items, worker, **kwargs)]
+    return asyncio.run(run())
+
+
+def test_every_index_gets_its_result():
+    async def double(item):
+        await asyncio.sleep(0.001 * (5 - item))
+        return item * 2
+
+    results = collect([1, 2, 3, 4], double)
+    assert sorted((index, value) for index, value, _ in results) == [(0, 2), (1, 4), (2, 6), (3, 8)]
+    # Completion order, not input order
+    assert [index for index, _, _ in results] == [3, 2, 1, 0]
+
+
+def test_identical_items_are_processed_once():
+    calls = []
+
+    async def worker(item):
+        calls.append(item)
+        return item.upper()
+
+    results = collect(["a", "b", "a", "a"], worker, key=lambda item: item)
+    assert sorted(calls) == ["a", "b"]
+    assert sorted((index, value) for index, value, _ in results) == [(0, "A"), (1, "B"), (2, "A"), (3, "A")]
+
+
+def test_errors_are_reported_per_item():
+    async def worker(item):
+        if item == "bad":
+            raise ValueError(item)
+        return item
+
+    results = {index: (value, error) for index, value, error in collect(["ok", "bad"], worker)}
+    assert results[0] == ("ok", None)
+    assert isinstance(results[1][1], ValueError)
+
+
+def test_concurrency_is_bounded():
+    running = []
+    peak = []
+
+    async def worker(item):
+        running.append(item)
+        peak.append(len(running))
+        await asyncio.sleep(0.005)
+        running.remove(item)
+        return item
+
+    collect(list(range(10)), worker, max_concurrency=3)
+    assert max(peak) == 3
+
+
+def test_stopping_early_cancels_the_rest():
+    started = []
+
+    async def worker(item):
+        started.append(item)
+        await asyncio.sleep(0 if item == 0 else 10)
+        return item
+
+    async def run():
+        results = fan_out(list(range(5)), worker)
+        first = await results.__anext__()
+        await results.aclose()
+        return first
+
+    assert asyncio.run(asyncio.wait_for(run(), 2)) == (0, 0, None)
@@ -0,0 +1,81 @@
+import pytest
+
+from moodi_engine import budgets
+from moodi_engine.budgets import CHARS_PER_TOKEN, MIN_BUDGET, budget_table, stream_limits, token_budget
+from moodi_engine.metrics import COMPLETION_TOKEN_BUCKETS, UsageTracker
+from moodi_engine.prompts import RESPONSE_SCHEMA
+
+
+@pytest.fixture(autouse=True)
+def budgets_on(monkeypatch):
+    monkeypatch.setattr(budgets, "TOKEN_BUDGETS", True)
+    for endpoint in ("REFLECTION", "NOTIFICATION", "REFLECTION_REPAIR"):
+        monkeypatch.delenv(f"MOODI_MAX_TOKENS_{endpoint}", raising=False)
+
+
+def test_arabic_script_gets_a_larger_budget():
+    assert token_budget("reflection", "ar") > token_budget("reflection", "fr") > token_budget("reflection", "en")
+
+
+def test_unknown_locale_gets_the_most_expensive_budget():
+    assert token_budget("reflection", None) == token_budget("reflection", "ar")
+    assert token_budget("reflection", "xx") == token_budget("reflection", "ar")
+
+
+def test_budget_scales_with_headroom_and_stays_above_the_floor():
+    assert token_budget("reflection", "en", headroom=2.0) > token_budget("reflection", "en", headroom=1.0)
+    assert token_budget("notification", "en", headroom=0.01) == MIN_BUDGET
+
+
+def test_budgets_are_multiples_of_eight():
+    for locales in budget_table().values():
+        for budget in locales.values():
+            assert budget % 8 == 0
+
+
+def test_repair_reuses_the_reflection_schema():
+    assert token_budget("reflection_repair", "en") == token_budget("reflection", "en")
+
+
+def test_env_override_and_switch(monkeypatch):
+    monkeypatch.setenv("MOODI_MAX_TOKENS_REFLECTION", "123")
+    assert token_budget("reflection", "en") == 123
+    monkeypatch.setenv("MOODI_MAX_TOKENS_REFLECTION", "0")
+    assert token_budget("reflection", "en") is None
+    monkeypatch.delenv("MOODI_MAX_TOKENS_REFLECTION")
+    monkeypatch.setattr(budgets, "TOKEN_BUDGETS", False)
+    assert token_budget("reflection", "en") is None
+
+
+def test_endpoints_without_a_schema_have_no_budget():
+    assert token_budget("no_such_endpoint", "en") is None
+
+
+def test_stream_limits_follow_the_schema():
+    limits = stream_limits(RESPONSE_SCHEMA, ratio=1.0)
+    assert limits["reflection_text"] == 360
+    assert limits["safety_flag"] == len("elevate") + 2
+    assert limits["tags"] == 6 * (budgets.DEFAULT_ITEM_CHARS + 4)
+    assert limits["*"] > sum(value for field, value in limits.items() if field != "*")
+    assert stream_limits(RESPONSE_SCHEMA, ratio=2.0)["reflection_text"] == 720
+
+
+def test_budget_covers_a_maximal_reflection():
+    # A reflection filling every maxLength must fit in its budget at the locale's density
+    chars = sum(rule.get("maxLength", 0) for rule in RESPONSE_SCHEMA["properties"].values())
+    for locale, chars_per_token in CHARS_PER_TOKEN.items():
+        assert token_budget("reflection", locale) >= chars / chars_per_token
+
+
+def test_usage_tracker_histogram_and_stop_reasons():
+    tracker = UsageTracker()
+    for completion_tokens in (10, 100, 100, COMPLETION_TOKEN_BUCKETS[-1] + 1):
+        usage = {"prompt_tokens": 50, "cached_tokens": 0, "completion_tokens": completion_tokens}
+        tracker.record("reflection", usage, 10.0)
+    tracker.record("reflection", {"prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}, 1.0, "aborted")
+    tracker.record("reflection", {"prompt_tokens": 50, "cached_tokens": 0, "completion_tokens": 300}, 1.0, "length")
+
+    stats = tracker.snapshot()["reflection"]
+    assert stats["completion_tokens_histogram"] == {"<=16": 1, "<=128": 2, "<=384": 1, ">1024": 1}
+    assert (stats["streams_aborted"], stats["stopped_at_max_tokens"]) == (1, 1)
+    assert stats["completion_tokens_p50"] == 100
@@ -0,0 +1,78 @@
+import asyncio
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from moodi_engine.gamification import replay_moods
+from moodi_engine.persistence import InMemoryStore
+
+# NumPy is optional (only replay_moods needs it)
+np = pytest.importorskip("numpy")
+
+UNLOCKS = [("custom_gradient", 50), ("voice_reflection", 120), ("sticker_pack", 20)]
+START = date(2025, 1, 1)
+
+
+def random_history(seed, users=5, days=60):
+    rng = random.Random(seed)
+    user_ids, mood_dates = [], []
+    for user in range(users):
+        for day in range(days):
+            # Runs with gaps, and sometimes several posts on one day
+            if rng.random() < 0.7:
+                for _ in range(rng.choice((1, 1, 1, 2, 3))):
+                    user_ids.append(f"user-{user}")
+                    mood_dates.append(START + timedelta(days=day))
+    return user_ids, mood_dates
+
+
+def sequential(user_ids, mood_dates):
+    """Post the moods one by one, in time order, through the store that mirrors the SQL trigger"""
+    day = [START]
+    store = InMemoryStore(clock=lambda: day[0])
+    unlock_dates = {}
+    for mood_date, user_id in sorted(zip(mood_dates, user_ids)):
+        day[0] = mood_date
+        result = asyncio.run(store.submit(user_id, {}, unlocks=UNLOCKS))
+        for unlock_type in result["new_unlocks"]:
+            unlock_dates[(user_id, unlock_type)] = mood_date
+    return store, unlock_dates
+
+
+def test_replay_matches_the_sequential_rules():
+    for seed in range(5):
+        user_ids, mood_dates = random_history(seed)
+        store, unlock_dates = sequential(user_ids, mood_dates)
+        # Input order must not matter
+        shuffled = list(zip(user_ids, mood_dates))
+        random.Random(seed).shuffle(shuffled)
+        replay = replay_moods([u for u, _ in shuffled], [d for _, d in shuffled], unlocks=UNLOCKS)
+
+        for index, user_id in enumerate(replay["users"]):
+            user = store.users[user_id]
+            assert replay["final_streak"][index] == user["streak_days"]
+            assert replay["total_coins"][index] == user["moodcoins"]
+            assert replay["last_mood_date"][index] == np.datetime64(user["last_mood_date"])
+
+        replayed_unlocks = {
+            (replay["users"][user], unlock_type): unlock_date.astype(object)
+            for user, unlock_type, unlock_date in zip(
+                replay["unlock_user_index"], replay["unlock_type"], replay["unlock_date"]
+            )
+        }
+        assert replayed_unlocks == unlock_dates
+
+
+def test_streak_bonus_and_same_day_posts():
+    days = [START, START, START + timedelta(days=1), START + timedelta(days=2), START + timedelta(days=4)]
+    replay = replay_moods(["u"] * len(days), days)
+    assert list(replay["day_streak"]) == [1, 2, 3, 1]
+    assert list(replay["day_coins"]) == [5, 5, 10, 5]
+    assert list(replay["day_balance"]) == [5, 10, 20, 25]
+
+
+def test_unlocks_crossed_on_one_day_are_all_reported():
+    replay = replay_moods(["u"] * 3, [START + timedelta(days=d) for d in range(3)], daily_coins=100, unlocks=UNLOCKS)
+    assert list(replay["unlock_type"]) == ["sticker_pack", "custom_gradient", "voice_reflection"]
+    assert list(replay["unlock_date"].astype(object)) == [START, START, START + timedelta(days=1)]
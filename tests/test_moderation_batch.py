@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+from moodi_engine.moderation_batch import ModerationBatcher
+from moodi_engine.resilience import UpstreamUnavailable
+
+
+def test_concurrent_checks_share_one_request():
+    requests = []
+    started = threading.Barrier(3)
+
+    def create(texts):
+        requests.append(list(texts))
+        return [f"result:{text}" for text in texts]
+
+    batcher = ModerationBatcher(create, max_batch=3, max_wait_ms=500)
+    results = {}
+
+    def check(text):
+        started.wait()
+        results[text] = batcher.check(text)
+
+    threads = [threading.Thread(target=check, args=(text,)) for text in ("a", "b", "a")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {"a": "result:a", "b": "result:b"}
+    assert sorted(requests[0]) == ["a", "b"]
+    assert batcher.stats()["texts"] == 3
+
+
+def test_batch_errors_reach_every_caller():
+    def create(texts):
+        raise RuntimeError("boom")
+
+    batcher = ModerationBatcher(create, max_wait_ms=1)
+    with pytest.raises(RuntimeError):
+        batcher.check("a")
+
+
+def test_check_is_bounded_by_a_timeout():
+    release = threading.Event()
+
+    def create(texts):
+        release.wait(5)
+        return [None] * len(texts)
+
+    batcher = ModerationBatcher(create, max_wait_ms=1)
+    try:
+        with pytest.raises(UpstreamUnavailable):
+            batcher.check("a", timeout=0.05)
+        assert batcher.stats()["timeouts"] == 1
+    finally:
+        release.set()
@@ -0,0 +1,68 @@
+from moodi_engine.moderation_cache import CacheBackend, MemoryBackend, ModerationCache, text_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class BrokenBackend(CacheBackend):
+    """Stands in for a Redis that refuses every command"""
+
+    def get(self, key):
+        raise ConnectionError("redis down")
+
+    def set(self, key, value, ttl_seconds):
+        raise ConnectionError("redis down")
+
+    def clear(self):
+        raise ConnectionError("redis down")
+
+
+def test_hit_and_miss_are_counted():
+    cache = ModerationCache(MemoryBackend())
+    assert cache.get("moderation", "rough day") is None
+    cache.put("moderation", "rough day", {"flagged": False}, flagged=False)
+    assert cache.get("moderation", "rough day") == {"flagged": False}
+    stats = cache.stats()["moderation"]
+    assert (stats["hits"], stats["misses"], stats["stores"], stats["hit_rate"]) == (1, 1, 1, 0.5)
+
+
+def test_entries_expire_after_their_ttl():
+    clock = Clock()
+    cache = ModerationCache(MemoryBackend(clock=clock), ttl_seconds=100, flagged_ttl_seconds=10)
+    cache.put("moderation", "calm", {"flagged": False}, flagged=False)
+    cache.put("moderation", "not calm", {"flagged": True}, flagged=True)
+    clock.now = 11
+    assert cache.get("moderation", "not calm") is None
+    assert cache.get("moderation", "calm") == {"flagged": False}
+    clock.now = 101
+    assert cache.get("moderation", "calm") is None
+
+
+def test_backend_errors_count_as_misses():
+    cache = ModerationCache(BrokenBackend())
+    cache.put("moderation", "rough day", {"flagged": False}, flagged=False)
+    assert cache.get("moderation", "rough day") is None
+    stats = cache.stats()
+    assert stats["backend"] == "BrokenBackend"
+    assert (stats["moderation"]["errors"], stats["moderation"]["misses"], stats["moderation"]["stores"]) == (2, 1, 0)
+
+
+def test_only_encodings_of_the_same_text_share_a_key():
+    composed, decomposed = "j'\u00e9tais  l\u00e0\n", "j'e\u0301tais la\u0300"
+    assert text_key("moderation", composed) == text_key("moderation", decomposed)
+    for other in ["J'ÉTAIS LÀ", "j'etais la", "أريد أن أموت"]:
+        assert text_key("moderation", other) != text_key("moderation", composed)
+    assert text_key("moderation", "أريد أن أموت") != text_key("moderation", "اريد ان اموت")
+    assert text_key("moderation", "calm") != text_key("safety", "calm")
+
+
+def test_distinct_texts_do_not_share_a_verdict():
+    cache = ModerationCache(MemoryBackend())
+    cache.put("moderation", "I could kill for a coffee", {"flagged": False}, flagged=False)
+    assert cache.get("moderation", "I COULD KILL for a coffee") is None
+    assert cache.get("moderation", "I could kill for a  coffee ") == {"flagged": False}
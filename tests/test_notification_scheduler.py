@@ -0,0 +1,43 @@
+import moodi_notification_scheduler as scheduler
+from moodi_engine.notification_catalog import NotificationCatalog
+
+
+def row(streak, theme="streak_nudge", locale="en"):
+    return {"id": f"n{streak}", "user_id": "u", "notification_type": theme,
+            "title": "", "body": "", "locale": locale, "streak_days": streak}
+
+
+def variants(*_):
+    return [{"title": "Day {streak}", "body": f"Variant {i}"} for i in range(3)]
+
+
+def test_fill_missing_copy_substitutes_each_rows_streak():
+    calls = []
+    rows = [row(3), row(5), row(6)]
+    generated = scheduler.fill_missing_copy(rows, NotificationCatalog(), lambda *key: calls.append(key) or variants())
+
+    assert calls == [("en", "streak_nudge", "3-6")]
+    assert generated == 1
+    assert [r["title"] for r in rows] == ["Day 3", "Day 5", "Day 6"]
+    assert [r["body"] for r in rows] == ["Variant 0", "Variant 1", "Variant 2"]
+
+
+def test_fill_missing_copy_keeps_existing_copy():
+    rows = [dict(row(3), title="Set", body="Already")]
+    assert scheduler.fill_missing_copy(rows, NotificationCatalog(), variants) == 0
+    assert rows[0]["title"] == "Set"
+
+
+def test_fill_missing_copy_falls_back_per_exact_streak(monkeypatch):
+    def failing(*_):
+        raise RuntimeError("upstream down")
+
+    monkeypatch.setattr(
+        scheduler, "generate_notification",
+        lambda locale, theme, streak: {"title": f"{streak} days", "body": "Keep going"}
+    )
+    rows = [row(3), row(5), row(5)]
+    generated = scheduler.fill_missing_copy(rows, NotificationCatalog(), failing)
+
+    assert [r["title"] for r in rows] == ["3 days", "5 days", "5 days"]
+    assert generated == 3
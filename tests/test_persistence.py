@@ -0,0 +1,160 @@
+import asyncio
+import time
+import uuid
+from datetime import date, timedelta
+
+import httpx
+import pytest
+
+from moodi_engine.auth import encode_token
+from moodi_engine.persistence import InMemoryStore, UnknownUser
+
+MOOD = {"mood_emoji": "😌", "mood_color": "#7FD1AE", "intensity_0_10": 4, "time_bucket": "evening"}
+USER = "3f0c6a52-8d4e-4a7b-9c1e-2b5d7f9a0c11"
+
+
+class Clock:
+    def __init__(self, day: date = date(2025, 3, 1)):
+        self.day = day
+
+    def __call__(self) -> date:
+        return self.day
+
+
+def submit(store, user_id=USER, reflection=None, unlocks=(("custom_gradient", 10),)):
+    return asyncio.run(store.submit(user_id, MOOD, reflection, unlocks))
+
+
+def test_submit_increments_streak_on_consecutive_days():
+    clock = Clock()
+    store = InMemoryStore(clock=clock)
+
+    streaks = []
+    for _ in range(3):
+        streaks.append(submit(store)["streak_days"])
+        clock.day += timedelta(days=1)
+    assert streaks == [1, 2, 3]
+
+    clock.day += timedelta(days=1)  # a day without posting resets the streak
+    assert submit(store)["streak_days"] == 1
+
+
+def test_daily_coins_are_awarded_once_per_day():
+    clock = Clock()
+    store = InMemoryStore(clock=clock)
+
+    assert submit(store)["coins_awarded"] == 5
+    second = submit(store)
+    assert second["coins_awarded"] == 0
+    assert second["moodcoins"] == 5
+    assert len(store.moods) == 2  # the post itself is still stored
+
+
+def test_streak_bonus_every_third_consecutive_day():
+    clock = Clock()
+    store = InMemoryStore(clock=clock)
+
+    awarded = []
+    for _ in range(3):
+        awarded.append(submit(store)["coins_awarded"])
+        clock.day += timedelta(days=1)
+    assert awarded == [5, 5, 10]
+
+
+def test_unlocks_are_granted_once():
+    clock = Clock()
+    store = InMemoryStore(clock=clock)
+
+    assert submit(store)["new_unlocks"] == []
+    clock.day += timedelta(days=1)
+    assert submit(store)["new_unlocks"] == ["custom_gradient"]
+    clock.day += timedelta(days=1)
+    assert submit(store)["new_unlocks"] == []
+    assert asyncio.run(store.grant_unlocks(USER, ["custom_gradient"])) == []
+
+
+def test_back_dated_mood_changes_nothing():
+    clock = Clock()
+    store = InMemoryStore(clock=clock)
+    submit(store)
+    clock.day += timedelta(days=1)
+    before = submit(store)
+
+    clock.day -= timedelta(days=3)
+    back_dated = submit(store)
+    assert back_dated["coins_awarded"] == 0
+    assert back_dated["streak_days"] == before["streak_days"]
+    assert store.users[USER]["last_mood_date"] == date(2025, 3, 2)
+
+
+def test_unknown_user_is_rejected_without_auto_create():
+    store = InMemoryStore(auto_create_users=False)
+    with pytest.raises(UnknownUser):
+        submit(store)
+
+
+# ============================================================================
+# /api/reflection with a user_id
+# ============================================================================
+
+@pytest.fixture
+def api(monkeypatch):
+    import fastapi_endpoint
+    from moodi_engine import routes
+
+    store = InMemoryStore(auto_create_users=False)
+    store.add_user(USER)
+    monkeypatch.setattr(routes, "submission_store", store)
+    monkeypatch.setattr(routes, "reflection_writer", None)
+
+    def post(payload, token=None):
+        async def run():
+            headers = {"Authorization": f"Bearer {token}"} if token else {}
+            transport = httpx.ASGITransport(app=fastapi_endpoint.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post("/api/reflection", json=payload, headers=headers)
+        return asyncio.run(run())
+
+    post.store = store
+    return post
+
+
+def token_for(user_id: str, **claims) -> str:
+    return encode_token(
+        {"sub": user_id, "aud": "authenticated", "exp": time.time() + 300, **claims}, "test-jwt-secret"
+    )
+
+
+def reflection_request(user_id=USER):
+    return {**MOOD, "user_locale": "en", "user_age_bucket": "adult", "user_id": user_id}
+
+
+def test_reflection_with_user_id_returns_submission(api):
+    response = api(reflection_request(), token_for(USER))
+    assert response.status_code == 200
+    submission = response.json()["submission"]
+    assert submission["streak_days"] == 1
+    assert submission["coins_awarded"] == 5
+    assert len(api.store.moods) == 1
+    assert len(api.store.reflections) == 1
+
+
+def test_reflection_store_requires_token(api):
+    assert api(reflection_request()).status_code == 401
+    assert api(reflection_request(), "not.a.token").status_code == 401
+    assert not api.store.moods
+
+
+def test_reflection_store_rejects_other_users_token(api):
+    response = api(reflection_request(), token_for(str(uuid.uuid4())))
+    assert response.status_code == 403
+    assert not api.store.moods
+
+
+def test_reflection_unknown_user_is_404(api):
+    other = str(uuid.uuid4())
+    assert api(reflection_request(other), token_for(other)).status_code == 404
+
+
+def test_reflection_malformed_user_id_is_422(api):
+    assert api(reflection_request("42"), token_for("42")).status_code == 422
@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+import moodi_integration
+from moodi_engine import prescreen as prescreen_module
+from moodi_engine.prescreen import normalize_text, prescreen
+
+REFLECTION = {
+    "reflection_text": "Thank you for sharing this.",
+    "action_suggestion": "Reach out to someone you trust.",
+    "share_caption": "One step.",
+    "soundtrack_hint": "calm",
+    "tags": ["care", "support", "rest"],
+    "safety_flag": "ok",
+}
+
+
+def mood(context_text):
+    return {"mood_emoji": "😔", "intensity_0_10": 6, "context_text": context_text, "user_locale": "en"}
+
+
+@pytest.fixture
+def remote(monkeypatch):
+    """Fake reflection, moderation and classifier recording their calls"""
+    calls = {"moderation": [], "classifier": [], "classifier_before_moderation_returned": []}
+    classifier_started = threading.Event()
+    flagged = {"value": False}
+
+    def moderate(text):
+        calls["moderation"].append(text)
+        # Wait briefly for an early classifier; it only shows up if it was started in parallel
+        calls["classifier_before_moderation_returned"].append(classifier_started.wait(0.5))
+        return {"flagged": flagged["value"], "categories": {}}
+
+    def classify(text):
+        calls["classifier"].append(text)
+        classifier_started.set()
+        return "ok"
+
+    monkeypatch.setattr(moodi_integration, "PRESCREEN_ENABLED", True)
+    monkeypatch.setattr(moodi_integration, "generate_mood_reflection", lambda payload: dict(REFLECTION))
+    monkeypatch.setattr(moodi_integration, "check_content_safety", moderate)
+    monkeypatch.setattr(moodi_integration, "classify_safety_risk", classify)
+    calls["flag"] = lambda: flagged.update(value=True)
+    return calls
+
+
+@pytest.mark.parametrize("text", ["I want to kill myself", "je veux mourir", "أريد أن أموت"])
+def test_high_risk_texts_score_high(text):
+    assert prescreen(text)["verdict"] == "high"
+
+
+def test_normalization_folds_case_accents_and_arabic_variants():
+    assert normalize_text("J'ÉTAIS là") == normalize_text("j’etais la")
+    assert normalize_text("أريد أن أموت") == normalize_text("اريد ان اموت")
+
+
+def test_high_verdict_starts_the_classifier_with_moderation(remote):
+    stage = moodi_integration._run_reflection_stage(mood("I want to kill myself"), {})
+    assert stage["prescreen"]["verdict"] == "high"
+    assert remote["moderation"] == ["I want to kill myself"]
+    assert remote["classifier"] == ["I want to kill myself"]
+    assert remote["classifier_before_moderation_returned"] == [True]
+
+
+@pytest.mark.parametrize("text", ["I will hang myself", "kms", "had a nice lunch"])
+def test_clear_verdict_never_skips_moderation(remote, text):
+    stage = moodi_integration._run_reflection_stage(mood(text), {})
+    assert stage["prescreen"]["verdict"] == "clear"
+    assert remote["moderation"] == [text]
+    # Nothing to escalate early, and moderation did not flag it
+    assert remote["classifier"] == []
+    assert stage["reflection"] == REFLECTION
+
+
+def test_clear_verdict_flagged_by_moderation_is_classified(remote):
+    remote["flag"]()
+    moodi_integration._run_reflection_stage(mood("I will hang myself"), {})
+    assert remote["classifier"] == ["I will hang myself"]
+    assert remote["classifier_before_moderation_returned"] == [False]
+
+
+def test_stats_report_the_escalated_share(monkeypatch):
+    monkeypatch.setattr(prescreen_module, "_verdicts", prescreen_module.Counter())
+    prescreen("I want to kill myself")
+    prescreen("had a nice lunch")
+    stats = prescreen_module.stats()
+    assert (stats["high"], stats["clear"], stats["escalated_ratio"]) == (1, 1, 0.5)
+    assert "cleared_ratio" not in stats
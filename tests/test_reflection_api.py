@@ -0,0 +1,39 @@
+import pytest
+
+import moodi_reflection_api
+from moodi_engine import repair as repair_module
+from moodi_engine.validation import SchemaValidationError
+
+PAYLOAD = {
+    "mood_emoji": "😌", "mood_color": "#7FD1AE", "intensity_0_10": 5, "context_text": "long day, ok now",
+    "media_present": False, "time_bucket": "evening", "user_locale": "en", "user_age_bucket": "adult",
+}
+USAGE = {"prompt_tokens": 10, "cached_tokens": 0, "completion_tokens": 10}
+
+
+def returning(output):
+    return lambda *args, **kwargs: (output, USAGE)
+
+
+def test_unrepairable_reflection_raises(monkeypatch):
+    monkeypatch.setattr(repair_module, "REPAIR_REASK", False)
+    monkeypatch.setattr(moodi_reflection_api, "complete", returning({"tags": ["a"]}))
+    with pytest.raises(SchemaValidationError) as raised:
+        moodi_reflection_api.generate_mood_reflection(PAYLOAD, use_cache=False)
+    assert "Missing required field: reflection_text" in raised.value.errors
+
+
+def test_near_miss_reflection_is_repaired(monkeypatch):
+    output = {
+        "reflection_text": "You made it through a long day. " * 20,
+        "action_suggestion": "Stretch for a minute.",
+        "share_caption": "Made it.",
+        "soundtrack_hint": "ambient",
+        "tags": ["calm", "tired", "steady", "calm"],
+        "safety_flag": "OK",
+    }
+    monkeypatch.setattr(moodi_reflection_api, "complete", returning(output))
+    result = moodi_reflection_api.generate_mood_reflection(PAYLOAD, use_cache=False)
+    assert len(result["reflection_text"]) <= 360
+    assert result["tags"] == ["calm", "tired", "steady"]
+    assert result["safety_flag"] == "ok"
@@ -0,0 +1,90 @@
+import moodi_engine.repair as repair_module
+from moodi_engine.prompts import RESPONSE_SCHEMA
+from moodi_engine.repair import OutputRepairer, fix_reflection, reflection_repairer, repair, trim_to_words
+from moodi_engine.structured import structured_outputs
+
+VALID = {
+    "reflection_text": "You showed up today, and that counts.",
+    "action_suggestion": "Take a short walk.",
+    "share_caption": "Showing up.",
+    "soundtrack_hint": "lofi",
+    "tags": ["calm", "steady", "hopeful"],
+    "safety_flag": "ok",
+}
+
+
+def test_trim_to_words_cuts_at_a_word_boundary():
+    trimmed = trim_to_words("one two three four five six", 16)
+    assert len(trimmed) <= 16
+    assert trimmed == "one two three…"
+
+
+def test_repair_normalizes_enum_casing_aliases_and_fallbacks():
+    for raw, expected in (("OK", "ok"), ("safe", "ok"), ("Escalate", "elevate"), ("unsure", "elevate")):
+        repaired, fixes = repair(
+            {**VALID, "safety_flag": raw}, RESPONSE_SCHEMA,
+            repair_module.REFLECTION_ENUM_ALIASES, repair_module.REFLECTION_ENUM_FALLBACKS
+        )
+        assert repaired["safety_flag"] == expected
+        assert "normalized:safety_flag" in fixes
+
+
+def test_repair_renames_drops_dedupes_and_clamps():
+    data = {**VALID, "Reflection-Text": VALID["reflection_text"], "mood": "x", "tags": "#calm, calm, #rest, sleep"}
+    del data["reflection_text"]
+    repaired, fixes = repair(data, RESPONSE_SCHEMA)
+    assert repaired["reflection_text"] == VALID["reflection_text"]
+    assert "mood" not in repaired
+    assert repaired["tags"] == ["calm", "rest", "sleep"]
+    assert {"renamed:Reflection-Text", "dropped:mood", "deduped:tags"} <= set(fixes)
+
+
+def test_missing_safety_flag_defaults_to_elevate_without_a_reask():
+    data = {key: value for key, value in VALID.items() if key != "safety_flag"}
+    calls = []
+    fixed, errors = reflection_repairer.fix(data, lambda *prompts: calls.append(prompts) or {})
+    assert errors == []
+    assert fixed["safety_flag"] == "elevate"
+    assert calls == []
+
+
+def test_unusable_safety_flag_defaults_to_elevate():
+    fixed, errors = reflection_repairer.fix({**VALID, "safety_flag": None})
+    assert errors == []
+    assert fixed["safety_flag"] == "elevate"
+
+
+def test_reask_asks_only_for_broken_fields_on_the_routed_model(monkeypatch):
+    calls = []
+
+    def reask(system_prompt, user_prompt, model):
+        calls.append((user_prompt, model))
+        return {"action_suggestion": "Drink some water.", "safety_flag": "ok"}
+
+    monkeypatch.setattr(repair_module, "REPAIR_REASK", True)
+    monkeypatch.setattr(repair_module, "_reask_reflection", reask)
+    retries = []
+    monkeypatch.setattr(structured_outputs, "record_retry", lambda endpoint, model: retries.append(model))
+
+    data = {**VALID, "safety_flag": "elevate"}
+    del data["action_suggestion"]
+    fixed, errors = fix_reflection(data, "gpt-4.1-mini")
+
+    assert errors == []
+    assert fixed["action_suggestion"] == "Drink some water."
+    # The re-ask cannot downgrade a safety flag it was never asked about
+    assert fixed["safety_flag"] == "elevate"
+    assert [model for _, model in calls] == ["gpt-4.1-mini"]
+    assert "- action_suggestion:" in calls[0][0]
+    assert "- safety_flag:" not in calls[0][0]
+    assert retries == ["gpt-4.1-mini"]
+
+
+def test_repairer_counts_outcomes():
+    repairer = OutputRepairer(RESPONSE_SCHEMA, name="test")
+    repairer.fix(VALID)
+    repairer.fix({**VALID, "extra": 1})
+    repairer.fix({"tags": []})
+    stats = repairer.stats()
+    assert (stats["valid"], stats["repaired"], stats["unrepaired"]) == (1, 1, 1)
+    assert stats["regenerations_avoided"] == 1
@@ -0,0 +1,157 @@
+import threading
+import time
+
+import pytest
+
+from moodi_engine.resilience import CallPolicy, CircuitBreaker, CircuitOpen, Resilience, UpstreamUnavailable
+
+
+class Status(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def raising(status_code):
+    def fn(timeout):
+        raise Status(status_code)
+    return fn
+
+
+def make(**policy):
+    policy.setdefault("backoff_base_s", 0.0)
+    return Resilience({"default": CallPolicy(2.0, **policy)}, failure_threshold=2, reset_timeout_s=60)
+
+
+def test_retryable_errors_are_retried_then_reported_unavailable():
+    resilience = make(max_attempts=3, hedge=False)
+    with pytest.raises(UpstreamUnavailable):
+        resilience.call("test", raising(503))
+    # The breaker opens after two failures and stops the third attempt
+    assert resilience.stats()["test"]["retries"] == 1
+    with pytest.raises(CircuitOpen):
+        resilience.call("test", raising(503))
+
+
+def test_non_retryable_errors_do_not_close_the_breaker():
+    resilience = make(max_attempts=1, hedge=False)
+    with pytest.raises(UpstreamUnavailable):
+        resilience.call("test", raising(503))
+    with pytest.raises(Status):
+        resilience.call("test", raising(400))
+    assert resilience._state("test").breaker.failures == 1
+
+    with pytest.raises(UpstreamUnavailable):
+        resilience.call("test", raising(503))
+    assert resilience.stats()["test"]["breaker"] == "open"
+
+
+def test_neutral_outcome_frees_a_half_open_probe():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_s=1.0, clock=lambda: now[0])
+    breaker.record_failure()
+    now[0] = 2.0
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_neutral()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+def hedging():
+    resilience = Resilience(
+        {"default": CallPolicy(2.0, hedge_min_delay_s=0.01)}, hedge_ratio=1.0, hedge_min_samples=1, hedge_workers=4
+    )
+    resilience._state("test").record_latency(0.01)
+    return resilience
+
+
+def wait_for_no_abandoned(resilience):
+    for _ in range(100):
+        if not resilience.abandoned_in_flight():
+            break
+        time.sleep(0.01)
+    return resilience.abandoned_in_flight()
+
+
+def test_blocking_calls_run_on_the_caller_thread_without_the_pool():
+    resilience = hedging()
+    threads = []
+
+    def fast(timeout):
+        threads.append(threading.current_thread())
+        return "ok"
+
+    for _ in range(20):
+        assert resilience.call("test", fast) == "ok"
+    assert threads == [threading.current_thread()] * 20
+    assert resilience._executor is None
+    assert resilience.stats()["test"]["hedges"] == 0
+
+
+def test_hedge_takes_over_when_the_primary_times_out():
+    resilience = hedging()
+    hedge_started = threading.Event()
+    calls = []
+
+    def slow_then_fast(timeout):
+        calls.append(threading.current_thread())
+        if len(calls) == 1:
+            hedge_started.wait(timeout)
+            raise TimeoutError("primary timed out")
+        hedge_started.set()
+        return "hedge"
+
+    assert resilience.call("test", slow_then_fast) == "hedge"
+    assert calls[0] is threading.current_thread() and calls[1] is not calls[0]
+    stats = resilience.stats()["test"]
+    assert (stats["hedges"], stats["hedge_wins"], stats["timeouts"]) == (1, 1, 0)
+
+
+def test_losing_blocking_hedge_is_counted_until_it_finishes():
+    resilience = hedging()
+    hedge_started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fast_once_hedged(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            hedge_started.wait(timeout)
+            return "primary"
+        hedge_started.set()
+        release.wait(timeout)
+        return "hedge"
+
+    assert resilience.call("test", fast_once_hedged) == "primary"
+    stats = resilience.stats()["test"]
+    assert (stats["hedges"], stats["hedge_wins"], stats["hedge_abandoned"]) == (1, 0, 1)
+    assert resilience.abandoned_in_flight() == 1
+
+    release.set()
+    assert wait_for_no_abandoned(resilience) == 0
+
+
+def test_no_hedge_while_half_the_pool_is_abandoned():
+    resilience = Resilience({"default": CallPolicy(2.0)}, hedge_ratio=1.0, hedge_workers=2)
+    state = resilience._state("test")
+    state.counters["calls"] = 10
+    resilience._abandoned_in_flight = 1
+    assert not resilience._take_hedge(state)
+    resilience._abandoned_in_flight = 0
+    assert resilience._take_hedge(state)
+
+
+def test_failures_while_open_do_not_extend_the_open_period():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_s=10.0, clock=lambda: now[0])
+    breaker.record_failure()
+    assert breaker.state == "open"
+    # Attempts that were already in flight keep failing after it opened
+    now[0] = 8.0
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.retry_after() == 2.0
+    now[0] = 10.0
+    assert breaker.allow()
+    assert breaker.opened == 1
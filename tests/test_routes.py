@@ -0,0 +1,29 @@
+import asyncio
+
+import httpx
+
+import fastapi_endpoint
+from api import main as vercel_main
+
+
+def paths(app):
+    return {path: sorted(methods) for path, methods in app.openapi()["paths"].items()}
+
+
+def get(app, path):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path)
+    return asyncio.run(run())
+
+
+def test_both_entrypoints_serve_the_shared_routes():
+    assert paths(fastapi_endpoint.app) == paths(vercel_main.app)
+    assert paths(fastapi_endpoint.app)["/api/reflection/stream"] == ["post"]
+
+
+def test_metrics_come_from_the_shared_module():
+    assert get(fastapi_endpoint.app, "/api/metrics").json().keys() == get(vercel_main.app, "/api/metrics").json().keys()
+    assert get(vercel_main.app, "/").json()["deployment"] == "Vercel"
+    assert "deployment" not in get(fastapi_endpoint.app, "/").json()
@@ -0,0 +1,48 @@
+import pytest
+
+from moodi_engine import routing
+from moodi_engine.routing import FULL_MODEL, ROUTINE_MAX_INTENSITY, ROUTINE_MODEL, TRIVIAL_MAX_INTENSITY, classify
+
+
+def payload(intensity, context_text="", locale="en"):
+    return {"intensity_0_10": intensity, "context_text": context_text, "user_locale": locale}
+
+
+@pytest.fixture(autouse=True)
+def router_on(monkeypatch):
+    monkeypatch.setattr(routing, "ROUTER_ENABLED", True)
+
+
+def test_no_context_low_intensity_is_trivial():
+    route = classify(payload(TRIVIAL_MAX_INTENSITY))
+    assert (route.tier, route.model) == ("trivial", ROUTINE_MODEL)
+
+
+def test_no_context_mid_intensity_is_routine():
+    route = classify(payload(ROUTINE_MAX_INTENSITY))
+    assert (route.tier, route.model) == ("routine", ROUTINE_MODEL)
+
+
+def test_high_intensity_without_context_goes_to_the_full_model():
+    route = classify(payload(ROUTINE_MAX_INTENSITY + 1))
+    assert (route.tier, route.model) == ("full", FULL_MODEL)
+    assert f"intensity {ROUTINE_MAX_INTENSITY + 1}" in route.reasons
+
+
+@pytest.mark.parametrize("context_text", [
+    "I will hang myself",
+    "i wanna die",
+    "kms",
+    "je vais sauter du pont",
+    "nobody will miss me when I am gone",
+    "quiet day at work",
+])
+@pytest.mark.parametrize("locale", ["en", "fr", "ar"])
+def test_any_context_text_goes_to_the_full_model(context_text, locale):
+    for intensity in range(0, 11):
+        route = classify(payload(intensity, context_text, locale))
+        assert (route.tier, route.model) == ("full", FULL_MODEL)
+
+
+def test_full_tier_has_the_larger_budget():
+    assert classify(payload(10)).max_tokens > classify(payload(5)).max_tokens
@@ -0,0 +1,100 @@
+import json
+
+from moodi_engine.streaming import IncrementalJSONObjectParser
+
+REFLECTION = {
+    "safety_flag": "ok",
+    "reflection_text": "A \"quiet\" day, and that's fine.\nRest.",
+    "tags": ["calm", "rest", "home"],
+    "score": 3,
+    "meta": {"nested": [1, {"deep": "}"}]},
+}
+
+
+def feed_in_chunks(text, size):
+    parser = IncrementalJSONObjectParser()
+    fields = []
+    for start in range(0, len(text), size):
+        fields.extend(parser.feed(text[start:start + size]))
+    return parser, fields
+
+
+def test_fields_are_reported_as_they_close():
+    parser = IncrementalJSONObjectParser()
+    assert parser.feed('{"a": "x", "b"') == [("a", "x")]
+    assert parser.feed(": [1, 2]") == [("b", [1, 2])]
+    assert parser.feed(', "c": 4}') == [("c", 4)]
+    assert parser.done
+
+
+def test_any_chunking_gives_the_same_fields():
+    text = json.dumps(REFLECTION, ensure_ascii=False)
+    for size in (1, 2, 3, 7, len(text)):
+        parser, fields = feed_in_chunks(text, size)
+        assert dict(fields) == REFLECTION
+        assert [field for field, _ in fields] == list(REFLECTION)
+        assert parser.done
+        assert parser.text == text
+
+
+def test_braces_and_escapes_inside_strings_are_not_structure():
+    parser, fields = feed_in_chunks('{"a": "}{][,:\\"\\\\", "b": true}', 1)
+    assert fields == [("a", '}{][,:"\\'), ("b", True)]
+    assert parser.done
+
+
+def test_incomplete_object_is_not_done():
+    parser = IncrementalJSONObjectParser()
+    parser.feed('{"a": "x", "b": "still go')
+    assert not parser.done
+
+
+def test_limits_flag_a_runaway_field():
+    parser = IncrementalJSONObjectParser({"reflection_text": 20, "*": 200})
+    parser.feed('{"safety_flag": "ok", "reflection_text": "')
+    assert parser.exceeded is None
+    parser.feed("x" * 30)
+    assert parser.exceeded is not None
+    assert (parser.exceeded.field, parser.exceeded.limit) == ("reflection_text", 20)
+
+
+def test_completed_fields_do_not_count_against_their_limit():
+    parser = IncrementalJSONObjectParser({"a": 5, "*": 200})
+    parser.feed('{"a": "abc", "b": "' + "y" * 50)
+    assert parser.exceeded is None
+
+
+def test_whole_object_limit_bounds_unknown_keys():
+    parser = IncrementalJSONObjectParser({"a": 5, "*": 30})
+    parser.feed('{"unknown": "' + "z" * 40)
+    assert parser.exceeded.field == "*"
+
+
+def test_no_limit_check_once_the_object_is_done():
+    parser = IncrementalJSONObjectParser({"*": 10})
+    parser.feed('{"a": "abcdefghijkl"}')
+    assert parser.done
+    assert parser.exceeded is None
+
+
+def test_pending_closes_the_streaming_string():
+    parser = IncrementalJSONObjectParser()
+    parser.feed('{"a": "done", "b": "half a sen')
+    assert parser.pending() == ("b", "half a sen")
+
+
+def test_pending_drops_a_half_received_escape():
+    parser = IncrementalJSONObjectParser()
+    parser.feed('{"b": "caf\\u00')
+    assert parser.pending() == ("b", "caf")
+    parser = IncrementalJSONObjectParser()
+    parser.feed('{"b": "line\\')
+    assert parser.pending() == ("b", "line")
+
+
+def test_pending_is_none_outside_a_string_value():
+    parser = IncrementalJSONObjectParser()
+    parser.feed('{"a": "x", "b')
+    assert parser.pending() is None
+    parser.feed('": [1, 2')
+    assert parser.pending() is None
@@ -0,0 +1,159 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from moodi_engine import engine
+from moodi_engine.prompts import NOTIFICATION_CATALOG_SCHEMA, RESPONSE_SCHEMA
+from moodi_engine.structured import (
+    JSON_OBJECT_FORMAT,
+    OUTPUT_SCHEMAS,
+    StructuredOutputs,
+    is_unsupported_error,
+    strict_schema,
+)
+
+_LIMITS = {"maxLength", "minLength", "minItems", "maxItems"}
+
+
+def keywords(schema):
+    found = set(schema)
+    for subschema in schema.get("properties", {}).values():
+        found |= keywords(subschema)
+    if "items" in schema:
+        found |= keywords(schema["items"])
+    return found
+
+
+def test_strict_schema_strips_limits_into_descriptions():
+    converted = strict_schema(RESPONSE_SCHEMA)
+    assert not keywords(converted) & _LIMITS
+    assert converted["properties"]["reflection_text"]["description"] == "at most 360 characters"
+    assert converted["properties"]["tags"]["description"] == "3-6 items"
+    assert converted["properties"]["safety_flag"]["enum"] == ["ok", "elevate"]
+
+
+def test_strict_schema_requires_everything_and_closes_objects():
+    converted = strict_schema(NOTIFICATION_CATALOG_SCHEMA)
+    item = converted["properties"]["variants"]["items"]
+    assert item["required"] == ["title", "body"]
+    assert item["additionalProperties"] is False
+    assert converted["additionalProperties"] is False
+
+
+def test_strict_schema_orders_first_fields_and_leaves_the_input_alone():
+    converted = strict_schema(RESPONSE_SCHEMA, first=("safety_flag",))
+    assert list(converted["properties"])[0] == "safety_flag"
+    assert converted["required"][0] == "safety_flag"
+    assert "maxLength" in RESPONSE_SCHEMA["properties"]["reflection_text"]
+
+
+def test_strict_mode_falls_back_per_model():
+    outputs = StructuredOutputs("strict")
+    assert outputs.response_format("reflection", "m1") is OUTPUT_SCHEMAS["reflection"].response_format
+    assert outputs.response_format("unknown_endpoint", "m1") == JSON_OBJECT_FORMAT
+
+    outputs.mark_unsupported("m1", Exception("json_schema not supported"))
+    outputs.mark_unsupported("m1", Exception("again"))
+    assert outputs.mode_for("reflection", "m1") == "json_object"
+    assert outputs.mode_for("reflection", "m2") == "strict"
+    assert outputs.stats()["downgrades"] == 1
+
+
+def test_json_object_mode_never_sends_a_schema():
+    assert StructuredOutputs("json_object").response_format("reflection", "m1") == JSON_OBJECT_FORMAT
+
+
+def test_output_counters_per_mode():
+    outputs = StructuredOutputs("strict")
+    outputs.record_output("notification", "strict", {"title": "Hi", "body": "There"})
+    outputs.record_output("notification", "strict", {"title": "Hi"})
+    outputs.record_unparseable("notification", "json_object")
+    outputs.record_retry("notification", "m1")
+    modes = outputs.stats()["modes"]
+    assert (modes["strict"]["outputs"], modes["strict"]["invalid"], modes["strict"]["retries"]) == (2, 1, 1)
+    assert modes["json_object"]["unparseable"] == 1
+
+
+class Status(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def test_unsupported_errors_are_400s_about_the_response_format():
+    assert is_unsupported_error(Status(400, "Invalid parameter: response_format json_schema"))
+    assert not is_unsupported_error(Status(400, "max_tokens too large"))
+    assert not is_unsupported_error(Status(500, "response_format"))
+
+
+# ============================================================================
+# Downgrade on the engine's call paths
+# ============================================================================
+
+class RejectsStrict:
+    """Fake chat.completions client that refuses json_schema response formats"""
+
+    def __init__(self):
+        self.formats = []
+        self.chat = SimpleNamespace(completions=self)
+
+    def _check(self, kwargs):
+        self.formats.append(kwargs["response_format"]["type"])
+        if kwargs["response_format"]["type"] == "json_schema":
+            raise Status(400, "Invalid parameter: response_format json_schema is not supported")
+
+    def _response(self):
+        message = SimpleNamespace(content='{"caption": "Hi"}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=None)
+
+
+class SyncClient(RejectsStrict):
+    def create(self, **kwargs):
+        self._check(kwargs)
+        return self._response()
+
+
+class AsyncClient(RejectsStrict):
+    async def create(self, **kwargs):
+        self._check(kwargs)
+        if kwargs.get("stream"):
+            return self._stream()
+        return self._response()
+
+    async def _stream(self):
+        delta = SimpleNamespace(content='{"caption": "Hi"}')
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason="stop")], usage=None)
+
+
+@pytest.fixture
+def strict_engine(monkeypatch):
+    fakes = SimpleNamespace(client=SyncClient(), async_client=AsyncClient(), outputs=StructuredOutputs("strict"))
+    backend = SimpleNamespace(client=lambda: fakes.client, async_client=lambda: fakes.async_client)
+    monkeypatch.setattr(engine, "structured_outputs", fakes.outputs)
+    monkeypatch.setattr(engine, "backend_for", lambda endpoint: backend)
+    return fakes
+
+
+def collect(stream):
+    async def run():
+        return [delta async for delta in stream]
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("call", ["complete", "acomplete", "astream_completion"])
+def test_rejected_strict_schema_is_resent_as_json_object(strict_engine, call):
+    if call == "complete":
+        result = engine.complete("s", "u", model="m1", endpoint="referral_caption")[0]
+        client = strict_engine.client
+    elif call == "acomplete":
+        result = asyncio.run(engine.acomplete("s", "u", model="m1", endpoint="referral_caption"))[0]
+        client = strict_engine.async_client
+    else:
+        result = json.loads("".join(collect(engine.astream_completion("s", "u", model="m1", endpoint="referral_caption"))))
+        client = strict_engine.async_client
+    assert result == {"caption": "Hi"}
+    assert client.formats == ["json_schema", "json_object"]
+    assert strict_engine.outputs.mode_for("referral_caption", "m1") == "json_object"
+    assert strict_engine.outputs.stats()["modes"]["json_object"]["outputs"] == 1
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from moodi_engine.gamification import UnlockCatalog
+
+UNLOCKS = [("voice_reflection", 120), ("custom_gradient", 50), ("sticker_pack", 50), ("theme_night", 0)]
+
+
+def sql_reached(unlocks, coins):
+    """submit_mood(): every catalog entry WHERE threshold <= v_coins"""
+    return {unlock_type for unlock_type, threshold in unlocks if threshold <= coins}
+
+
+def test_catalog_is_sorted_by_threshold_then_type():
+    catalog = UnlockCatalog(UNLOCKS)
+    assert catalog.items() == [
+        ("theme_night", 0), ("custom_gradient", 50), ("sticker_pack", 50), ("voice_reflection", 120)
+    ]
+    assert len(catalog) == 4
+
+
+def test_reached_matches_the_sql_rule():
+    catalog = UnlockCatalog(UNLOCKS)
+    for coins in range(-5, 200):
+        assert set(catalog.reached(coins)) == sql_reached(UNLOCKS, coins)
+
+
+def test_crossed_reports_thresholds_in_the_half_open_interval():
+    catalog = UnlockCatalog(UNLOCKS)
+    assert catalog.crossed(45, 50) == ["custom_gradient", "sticker_pack"]
+    assert catalog.crossed(50, 55) == []
+    assert catalog.crossed(-1, 200) == ["theme_night", "custom_gradient", "sticker_pack", "voice_reflection"]
+    # A falling balance crosses nothing
+    assert catalog.crossed(130, 40) == []
+
+
+def test_crossed_over_a_history_adds_up_to_reached():
+    catalog = UnlockCatalog(UNLOCKS)
+    balances = [0, 5, 10, 20, 45, 55, 60, 115, 125]
+    granted = []
+    for previous, coins in zip(balances, balances[1:]):
+        granted.extend(catalog.crossed(previous, coins))
+    assert set(granted) | set(catalog.reached(balances[0])) == set(catalog.reached(balances[-1]))
+
+
+def test_duplicate_types_are_rejected():
+    with pytest.raises(ValueError):
+        UnlockCatalog([("a", 1), ("a", 2)])
+
+
+def test_from_file(tmp_path):
+    path = tmp_path / "unlocks.json"
+    path.write_text(json.dumps([{"unlock_type": "b", "threshold": 20}, {"unlock_type": "a", "threshold": 10}]))
+    assert UnlockCatalog.from_file(str(path)).items() == [("a", 10), ("b", 20)]
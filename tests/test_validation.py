@@ -0,0 +1,113 @@
+import json
+
+import pytest
+
+from moodi_engine.prompts import RESPONSE_SCHEMA
+from moodi_engine.validation import compile_validator, decode_reflection, validate_reflection
+
+VALID = {
+    "reflection_text": "You showed up today, and that counts.",
+    "action_suggestion": "Take a short walk.",
+    "share_caption": "Showing up.",
+    "soundtrack_hint": "lofi",
+    "tags": ["calm", "steady", "hopeful"],
+    "safety_flag": "ok",
+}
+
+NESTED = {
+    "type": "object",
+    "properties": {
+        "items": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"name": {"type": "string", "minLength": 2}, "count": {"type": "integer"}},
+                "required": ["name"],
+                "additionalProperties": False,
+            },
+        },
+        "ratio": {"type": "number"},
+        "on": {"type": "boolean"},
+    },
+    "required": ["items"],
+}
+
+
+def test_valid_reflection_has_no_errors():
+    assert validate_reflection(VALID) == []
+
+
+@pytest.mark.parametrize("change, error", [
+    ({"reflection_text": "x" * 361}, "reflection_text too long: 361 chars (max 360)"),
+    ({"tags": ["a", "b"]}, "tags must have 3-6 items, got 2"),
+    ({"tags": ["a", "b", 3]}, "tags[2] must be a string"),
+    ({"safety_flag": "OK"}, "safety_flag must be 'ok' or 'elevate', got 'OK'"),
+    ({"soundtrack_hint": None}, "soundtrack_hint must be a string"),
+    ({"extra": 1}, "Unexpected field: extra"),
+])
+def test_reflection_errors(change, error):
+    assert validate_reflection({**VALID, **change}) == [error]
+
+
+def test_missing_fields_and_non_objects():
+    assert validate_reflection({key: value for key, value in VALID.items() if key != "tags"}) == [
+        "Missing required field: tags"
+    ]
+    assert validate_reflection([]) == ["response must be an object"]
+
+
+def test_nested_objects_are_labelled_by_path():
+    validate = compile_validator(NESTED, "validate_nested")
+    errors = validate({"items": [{"name": "ok", "count": 1}, {"name": "x", "count": True, "extra": 0}], "on": 1})
+    assert errors == [
+        "Unexpected field: items[1].extra",
+        "items[1].name too short: 1 chars (min 2)",
+        "items[1].count must be an integer",
+        "on must be a boolean",
+    ]
+    assert validate({"items": [], "ratio": 0.5}) == []
+
+
+def test_compiled_validator_matches_a_reference_on_random_mutations():
+    import random
+
+    rng = random.Random(0)
+    mutations = [
+        lambda d: d.pop(rng.choice(list(d))),
+        lambda d: d.update(reflection_text="y" * rng.randint(300, 400)),
+        lambda d: d.update(tags=["t"] * rng.randint(0, 8)),
+        lambda d: d.update(safety_flag=rng.choice(["ok", "elevate", "Ok", ""])),
+        lambda d: d.update(share_caption=rng.choice([1, None, "fine"])),
+    ]
+    for _ in range(200):
+        data = json.loads(json.dumps(VALID))
+        for mutation in rng.sample(mutations, rng.randint(1, 3)):
+            mutation(data)
+        assert (validate_reflection(data) == []) == reference_valid(data)
+
+
+def reference_valid(data):
+    properties = RESPONSE_SCHEMA["properties"]
+    if set(data) != set(properties):
+        return False
+    for field, rule in properties.items():
+        value = data[field]
+        if rule["type"] == "string":
+            if not isinstance(value, str) or len(value) > rule.get("maxLength", len(value)):
+                return False
+            if "enum" in rule and value not in rule["enum"]:
+                return False
+        elif not (isinstance(value, list) and rule["minItems"] <= len(value) <= rule["maxItems"]
+                  and all(isinstance(item, str) for item in value)):
+            return False
+    return True
+
+
+def test_decode_reflection_accepts_text_and_bytes():
+    raw = json.dumps(VALID)
+    assert decode_reflection(raw) == (VALID, [])
+    assert decode_reflection(raw.encode()) == (VALID, [])
+
+
+def test_validator_keeps_its_source():
+    assert validate_reflection.source.startswith("def validate_reflection(data):")
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import os
+
+from moodi_engine.write_behind import WriteBehindBuffer
+
+
+class Sink:
+    def __init__(self, fail_after=None):
+        self.rows = []
+        self.fail_after = fail_after
+
+    async def __call__(self, rows):
+        if self.fail_after is not None and len(self.rows) >= self.fail_after:
+            raise ConnectionError("database down")
+        self.rows.extend(rows)
+
+
+def spill_files(spill_dir):
+    return sorted(name for name in os.listdir(spill_dir) if name.startswith("rows-") and name.endswith(".jsonl"))
+
+
+def spilled_rows(spill_dir):
+    rows = []
+    for name in spill_files(spill_dir):
+        with open(os.path.join(spill_dir, name), encoding="utf-8") as handle:
+            rows.extend(json.loads(line) for line in handle if line.strip())
+    return rows
+
+
+async def fill(buffer, rows):
+    await buffer.start()
+    for row in rows:
+        await buffer.put(row)
+    await buffer.close(timeout_s=1.0)
+
+
+def test_rows_flush_and_spill_files_are_removed(tmp_path):
+    sink = Sink()
+    rows = [{"n": n} for n in range(7)]
+    asyncio.run(fill(WriteBehindBuffer(sink, max_rows=3, spill_dir=str(tmp_path)), rows))
+    assert sink.rows == rows
+    assert spill_files(tmp_path) == []
+
+
+def test_unflushed_rows_are_replayed_by_the_next_start(tmp_path):
+    rows = [{"n": n} for n in range(5)]
+    asyncio.run(fill(WriteBehindBuffer(Sink(fail_after=0), spill_dir=str(tmp_path)), rows))
+    assert spilled_rows(tmp_path) == rows
+
+    sink = Sink()
+    buffer = WriteBehindBuffer(sink, max_delay_ms=1, spill_dir=str(tmp_path))
+    asyncio.run(fill(buffer, []))
+    assert sink.rows == rows
+    assert buffer.metrics["replayed"] == 5
+    assert spill_files(tmp_path) == []
+
+
+def test_partly_flushed_segment_keeps_only_the_rest(tmp_path):
+    rows = [{"n": n} for n in range(5)]
+    sink = Sink(fail_after=2)
+    asyncio.run(fill(WriteBehindBuffer(sink, max_rows=2, max_delay_ms=10_000, spill_dir=str(tmp_path)), rows))
+    assert sink.rows == rows[:2]
+    # The segment is never rewritten; the flushed prefix is recorded next to it
+    assert spilled_rows(tmp_path) == rows
+    (segment,) = spill_files(tmp_path)
+    assert (tmp_path / f"{segment}.offset").read_text() == "2"
+    assert not (tmp_path / f"{segment}.offset.tmp").exists()
+
+    sink = Sink()
+    asyncio.run(fill(WriteBehindBuffer(sink, spill_dir=str(tmp_path)), []))
+    assert sink.rows == rows[2:]
+    assert os.listdir(tmp_path) == []
+
+
+def test_segments_left_by_a_crashed_worker_are_replayed(tmp_path):
+    with open(tmp_path / "rows-999-dead.jsonl", "w", encoding="utf-8") as handle:
+        handle.write('{"n": 1}\n{"n": 2}\n\n')
+    sink = Sink()
+    asyncio.run(fill(WriteBehindBuffer(sink, spill_dir=str(tmp_path)), []))
+    assert sink.rows == [{"n": 1}, {"n": 2}]
+
+
+def test_live_segments_of_another_writer_are_left_alone(tmp_path):
+    async def scenario():
+        live = WriteBehindBuffer(Sink(), max_delay_ms=10_000, spill_dir=str(tmp_path))
+        await live.start()
+        await live.put({"n": 1})
+
+        other_sink = Sink()
+        other = WriteBehindBuffer(other_sink, spill_dir=str(tmp_path))
+        await other.start()
+        await other.close()
+        await live.close()
+        return live, other, other_sink
+
+    live, other, other_sink = asyncio.run(scenario())
+    assert other.metrics["replayed"] == 0
+    assert other_sink.rows == []
+    assert live.metrics["flushed"] == 1
+
+
+def test_torn_last_line_is_quarantined_not_fatal(tmp_path):
+    segment = tmp_path / "rows-999-dead.jsonl"
+    # The crash cut the last row inside a multi-byte character
+    segment.write_bytes(b'{"n": 1}\n{"n": 2}\n' + '{"n": 3, "text": "café'.encode("utf-8")[:-1])
+    sink = Sink()
+    buffer = WriteBehindBuffer(sink, spill_dir=str(tmp_path))
+    asyncio.run(fill(buffer, []))
+    assert sink.rows == [{"n": 1}, {"n": 2}]
+    assert buffer.metrics["corrupt"] == 1
+    assert spill_files(tmp_path) == []
+    assert (tmp_path / "rows-999-dead.jsonl.corrupt").read_bytes().startswith(b'{"n": 3')
+
+
+class RejectingSink(Sink):
+    """Rejects any batch holding a row with bad=True, like a foreign key violation"""
+
+    def __init__(self, error=ValueError):
+        super().__init__()
+        self.error = error
+
+    async def __call__(self, rows):
+        if any(row.get("bad") for row in rows):
+            raise self.error("violates foreign key constraint")
+        self.rows.extend(rows)
+
+
+async def run_until(buffer, rows, done, timeout_s=2.0):
+    await buffer.start()
+    for row in rows:
+        await buffer.put(row)
+    deadline = asyncio.get_running_loop().time() + timeout_s
+    while not done() and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(0.005)
+    await buffer.close(timeout_s=1.0)
+
+
+def test_permanently_failing_rows_are_dead_lettered(tmp_path):
+    sink = RejectingSink()
+    buffer = WriteBehindBuffer(sink, max_rows=3, max_delay_ms=1, max_attempts=2, spill_dir=str(tmp_path))
+    first = [{"n": 0}, {"n": 1, "bad": True}, {"n": 2}]
+    later = [{"n": 3}, {"n": 4}]
+
+    async def scenario():
+        await buffer.start()
+        for row in first:
+            await buffer.put(row)
+        # A later segment queued behind the failing one
+        await asyncio.sleep(0.01)
+        for row in later:
+            await buffer.put(row)
+        for _ in range(400):
+            if len(sink.rows) == 4:
+                break
+            await asyncio.sleep(0.005)
+        await buffer.close()
+
+    asyncio.run(scenario())
+    assert sink.rows == [{"n": 0}, {"n": 2}, {"n": 3}, {"n": 4}]
+    assert buffer.metrics["dead_lettered"] == 1
+    dead = [json.loads(line) for line in (tmp_path / "rows.dead.jsonl").read_text().splitlines()]
+    assert [entry["row"] for entry in dead] == [{"n": 1, "bad": True}]
+    assert "foreign key" in dead[0]["error"]
+    assert spill_files(tmp_path) == []
+
+
+def test_transient_failures_are_never_dead_lettered(tmp_path):
+    sink = RejectingSink(ConnectionError)
+    buffer = WriteBehindBuffer(sink, max_delay_ms=1, max_attempts=1, spill_dir=str(tmp_path))
+    rows = [{"n": 0, "bad": True}]
+    asyncio.run(run_until(buffer, rows, lambda: buffer.metrics["failures"] >= 3))
+    assert buffer.metrics["failures"] >= 3
+    assert buffer.metrics["dead_lettered"] == 0
+    assert spilled_rows(tmp_path) == rows